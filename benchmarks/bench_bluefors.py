@@ -0,0 +1,90 @@
+"""
+Per-call cost of BlueFors.get_temperature / get_pressure on synthetic day
+logs (newinstruments/simInstruments.SimBlueForsLogs), for the previous
+implementation (directory scan + whole-day pandas parse per call) and the
+tail-following reader: first call, repeated calls and calls after new lines
+were appended, and a full status refresh (get_status_all parsed 10 logs,
+snapshot reads each log once).
+
+    python benchmarks/bench_bluefors.py [lines_per_day]
+
+86400 lines (one per second) give ~3 MB per temperature log and ~15 MB of
+maxigauge log. Logs are written to a temporary directory.
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.BlueFors import BlueFors
+from newinstruments.simInstruments import SimBlueForsLogs
+
+
+def pandas_temperature(fridge, channel):
+    # what get_temperature did before: latest folder by mtime, whole file through pandas
+    folder_name = os.path.basename(fridge.get_latest_subdir())
+    file_path = os.path.join(fridge.folder_path, folder_name, 'CH' + str(channel) + ' T ' + folder_name + '.log')
+    df = pd.read_csv(file_path, delimiter=',', names=['date', 'time', 'temperature'], header=None)
+    df.index = pd.to_datetime(df['date'] + '-' + df['time'], format=' %d-%m-%y-%H:%M:%S')
+    return df.iloc[-1]['temperature']
+
+
+def pandas_pressure(fridge, channel):
+    folder_name = os.path.basename(fridge.get_latest_subdir())
+    file_path = os.path.join(fridge.folder_path, folder_name, 'maxigauge ' + folder_name + '.log')
+    names = ['date', 'time']
+    for ch in range(1, 7):
+        names += ['ch%d_%s' % (ch, field) for field in ['name', 'void1', 'status', 'pressure', 'void2', 'void3']]
+    df = pd.read_csv(file_path, delimiter=',', names=names + ['void'], header=None)
+    df.index = pd.to_datetime(df['date'] + '-' + df['time'], format='%d-%m-%y-%H:%M:%S')
+    return df.iloc[-1]['ch' + str(channel) + '_pressure']
+
+
+def per_call(func, *args, repeat=20):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - t0) / repeat, result
+
+
+if __name__ == '__main__':
+    lines_per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 86400
+    workdir = tempfile.mkdtemp()
+    logs = SimBlueForsLogs(workdir)
+    start = datetime.combine(datetime.now().date(), datetime.min.time())
+    logs.write_history(start - timedelta(days=1), lines_per_day, interval=86400 / lines_per_day)
+    logs.write_history(start, lines_per_day, interval=86400 / lines_per_day)
+    day = start.strftime('%y-%m-%d')
+    sizes = [os.path.getsize(os.path.join(workdir, day, name)) for name in os.listdir(os.path.join(workdir, day))]
+    print(f'{lines_per_day} lines per log, {sum(sizes) / 2**20:.1f} MB of logs per day in {workdir}')
+
+    fridge = BlueFors(workdir)
+    t_pd_temp, _ = per_call(pandas_temperature, fridge, 6, repeat=3)
+    t_pd_press, _ = per_call(pandas_pressure, fridge, 1, repeat=3)
+
+    t0 = time.perf_counter()
+    fridge.get_temperature(6)
+    t_first = time.perf_counter() - t0
+    t_temp, value = per_call(fridge.get_temperature, 6, repeat=1000)
+    t_press, _ = per_call(fridge.get_pressure, 1, repeat=1000)
+    assert value == pandas_temperature(fridge, 6)
+
+    def append_and_read():
+        logs.append(start + timedelta(hours=23, minutes=59, seconds=59))
+        return fridge.get_temperature(6)
+    t_append, _ = per_call(append_and_read, repeat=100)
+    t_write, _ = per_call(logs.append, start + timedelta(hours=23, minutes=59, seconds=59), repeat=100)
+    t_snapshot, _ = per_call(fridge.snapshot, 0, repeat=1000)
+
+    print(f'get_temperature  pandas {t_pd_temp * 1e3:8.1f} ms   tail first call {t_first * 1e3:.2f} ms, '
+          f'then {t_temp * 1e6:.0f} us   (x{t_pd_temp / t_temp:.0f})')
+    print(f'get_pressure     pandas {t_pd_press * 1e3:8.1f} ms   tail {t_press * 1e6:.0f} us   (x{t_pd_press / t_press:.0f})')
+    print(f'status refresh   pandas {4 * t_pd_temp + 6 * t_pd_press:8.2f} s    '
+          f'snapshot {t_snapshot * 1e6:.0f} us (4 thermometers + maxigauge, each log read once)')
+    print(f'after a new line        tail {max(t_append - t_write, 0) * 1e6:.0f} us (writing the line excluded)')
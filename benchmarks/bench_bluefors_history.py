@@ -0,0 +1,81 @@
+"""
+Time range queries over a week of synthetic BlueFors logs
+(newinstruments/simInstruments.SimBlueForsLogs): building the binary cache,
+appending to it, and querying temperature / pressure history, compared with
+loading the day CSVs with pandas.
+
+    python benchmarks/bench_bluefors_history.py [interval_s]
+
+One line every 10 s by default (~60k samples per log over the week). Logs and
+cache are written to a temporary directory.
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.BlueFors import BlueFors
+from newinstruments.simInstruments import SimBlueForsLogs
+
+
+def pandas_week(fridge, channel, start, stop):
+    # loading the day files by hand
+    frames = []
+    for subdir in fridge.get_subdirs_multiple(start.strftime('%y-%m-%d'), stop.strftime('%y-%m-%d')):
+        name = os.path.basename(subdir)
+        df = pd.read_csv(os.path.join(subdir, 'CH%d T %s.log' % (channel, name)), delimiter=',',
+                         names=['date', 'time', 'temperature'], header=None)
+        df.index = pd.to_datetime(df['date'] + '-' + df['time'], format=' %d-%m-%y-%H:%M:%S')
+        frames.append(df)
+    df = pd.concat(frames)
+    return df[(df.index >= start) & (df.index < stop)]['temperature']
+
+
+def timed(func, *args, repeat=1):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - t0) / repeat, result
+
+
+if __name__ == '__main__':
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    workdir = tempfile.mkdtemp()
+    log_path = os.path.join(workdir, 'logs')
+    logs = SimBlueForsLogs(log_path)
+    stop = datetime.combine(datetime.now().date(), datetime.min.time())
+    start = stop - timedelta(days=7)
+    num_lines = int(7 * 86400 / interval)
+    logs.write_history(start, num_lines, interval=interval)
+    print(f'{num_lines} lines per log over 7 days in {workdir}')
+
+    fridge = BlueFors(log_path)
+    history = fridge.get_history(os.path.join(workdir, 'cache'))
+    t_build = 0.0
+    for log_name in ['CH1 T', 'CH2 T', 'CH5 T', 'CH6 T', 'maxigauge']:
+        t, _ = timed(history.update, log_name)
+        t_build += t
+
+    t_pandas, ref = timed(pandas_week, fridge, 6, start, stop)
+    t_week, (times, values) = timed(fridge.get_temperature_in_timeframe, 6, start, stop, repeat=20)
+    t_hour, _ = timed(fridge.get_temperature_in_timeframe, 6, start + timedelta(days=3),
+                      start + timedelta(days=3, hours=1), repeat=100)
+    t_press, _ = timed(fridge.get_pressure_in_timeframe, 4, start, stop, repeat=20)
+    assert np.array_equal(values, ref.to_numpy()) and len(times) == len(ref)
+
+    logs.append(stop - timedelta(seconds=1))
+    t_append, _ = timed(history.update, 'CH6 T')
+
+    print(f'cache build (5 logs)       {t_build * 1e3:8.1f} ms')
+    print(f'week of CH6, pandas        {t_pandas * 1e3:8.1f} ms')
+    print(f'week of CH6, cache         {t_week * 1e3:8.2f} ms  ({len(times)} samples, x{t_pandas / t_week:.0f})')
+    print(f'one hour of CH6, cache     {t_hour * 1e3:8.2f} ms')
+    print(f'week of P4, cache          {t_press * 1e3:8.2f} ms')
+    print(f'update after one new line  {t_append * 1e3:8.2f} ms')
@@ -0,0 +1,49 @@
+"""
+Per-point latency of setting sweep controls and reading readouts serially vs
+with instrument_io.BusExecutor, using demoInstrument stand-ins with injected
+latency spread over two GPIB boards and a serial port.
+
+    python benchmarks/bench_bus_io.py [latency_s]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instrument_io import BusExecutor
+from newinstruments.demoInstrument import demoInstrument
+
+
+def make_bench(latency):
+    yoko_ch = demoInstrument('GPIB1::7::INSTR', printMessages=False, latency=latency)
+    yoko_gt = demoInstrument('GPIB1::1::INSTR', printMessages=False, latency=latency)
+    generator = demoInstrument('GPIB0::19::INSTR', printMessages=False, latency=latency)
+    lockin = demoInstrument('GPIB0::11::INSTR', printMessages=False, latency=latency)
+    gauge = demoInstrument('ASRL3::INSTR', printMessages=False, latency=latency)
+    controls = [(yoko_ch, 'voltage'), (yoko_gt, 'voltage'), (generator, 'voltage')]
+    readouts = [(lockin, 'read'), (lockin, 'read'), (gauge, 'read')]
+    return controls, readouts
+
+
+def run_points(io, controls, readouts, num_points):
+    t0 = time.perf_counter()
+    for j in range(num_points):
+        io.set_all([(instr, attr, 0.01 * j) for instr, attr in controls])
+        io.get_all(readouts)
+    return (time.perf_counter() - t0) / num_points
+
+
+if __name__ == '__main__':
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    controls, readouts = make_bench(latency)
+    num_points = 20
+
+    serial = run_points(BusExecutor(concurrent=False), controls, readouts, num_points)
+    with BusExecutor() as io:
+        concurrent = run_points(io, controls, readouts, num_points)
+        print(io.report())
+    print(f'{latency * 1e3:.0f} ms per operation, 3 sets + 3 reads per point on GPIB0 / GPIB1 / ASRL3')
+    print(f'serial     {serial * 1e3:7.1f} ms per point')
+    print(f'concurrent {concurrent * 1e3:7.1f} ms per point (gained {(serial - concurrent) * 1e3:.1f} ms)')
@@ -0,0 +1,79 @@
+"""
+Conversion time of an mcc_daq scan buffer to volts: the per-sample
+ul.to_eng_units loop the scans used to run against the vectorized
+buffer_as_array + counts_to_volts path, on a fake 16-bit buffer.
+
+    python benchmarks/bench_daq_convert.py [points_per_channel] [num_chans]
+
+No DAQ is needed (mcculw must be importable). Without a board the loop calls a
+python copy of to_eng_units (ideal transfer function, single precision result),
+the vectorized result is checked to be identical to it.
+"""
+
+import os
+import sys
+import time
+from ctypes import c_float, c_ushort
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.mcc_daq import buffer_as_array, counts_to_volts
+
+RANGE_MIN = -10.0
+RANGE_MAX = 10.0
+RESOLUTION = 16
+
+
+def to_eng_units(count):
+    # what cbToEngUnits returns for an ideal 16 bit converter (a c_float)
+    return c_float(RANGE_MIN + count * ((RANGE_MAX - RANGE_MIN) / 2 ** RESOLUTION)).value
+
+
+def fake_buffer(points_per_channel, num_chans):
+    counts = np.random.randint(0, 2 ** RESOLUTION, points_per_channel * num_chans)
+    buffer = (c_ushort * len(counts))()
+    buffer_as_array(buffer, len(counts))[:] = counts
+    return buffer
+
+
+def convert_loop(ctypes_array, points_per_channel, num_chans):
+    data = np.zeros((points_per_channel, num_chans))
+    data_index = 0
+    for i in range(points_per_channel):
+        for j in range(num_chans):
+            data[i, j] = to_eng_units(ctypes_array[data_index])
+            data_index += 1
+    return data
+
+
+def convert_vectorized(ctypes_array, points_per_channel, num_chans):
+    raw = buffer_as_array(ctypes_array, points_per_channel * num_chans).reshape((points_per_channel, num_chans))
+    return counts_to_volts(raw, RANGE_MIN, RANGE_MAX, RESOLUTION)
+
+
+def bench(func, *args, min_time=0.5):
+    num = 0
+    t0 = time.perf_counter()
+    while True:
+        result = func(*args)
+        num += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed > min_time:
+            return result, elapsed / num
+
+
+if __name__ == '__main__':
+    points_per_channel = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    num_chans = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    buffer = fake_buffer(points_per_channel, num_chans)
+
+    loop, t_loop = bench(convert_loop, buffer, points_per_channel, num_chans)
+    vectorized, t_vec = bench(convert_vectorized, buffer, points_per_channel, num_chans)
+
+    num_samples = points_per_channel * num_chans
+    print(f'{points_per_channel} points x {num_chans} channels ({num_samples:,} samples)')
+    print(f'  to_eng_units loop  {t_loop * 1e3:9.2f} ms  ({num_samples / t_loop / 1e6:.2f} Msamples/s)')
+    print(f'  vectorized         {t_vec * 1e3:9.2f} ms  ({num_samples / t_vec / 1e6:.2f} Msamples/s)  x{t_loop / t_vec:.0f}')
+    print(f'  identical: {np.array_equal(loop, vectorized)}, shape {vectorized.shape}')
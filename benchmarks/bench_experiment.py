@@ -0,0 +1,223 @@
+"""
+End-to-end throughput of experiment.run (1D with vna + lock-in, 2D lock-in,
+VNAonly) on the simulated bench of newinstruments/simInstruments.py, no
+cryostat or GPIB needed.
+
+Reports loop points/s, database rows/s, where the wall time went (set,
+settle, vna sweep, read, store, other) and memory (peak python allocations
+and max rss). Data is written to a temporary directory.
+
+    python benchmarks/bench_experiment.py [latency_s] [vna_points] [sweep_time_s]
+
+latency is added to every instrument command (default 5 ms). Settling is
+adaptive on Vx (experiment.settle_params), pass --fixed-settle for the fixed
+3*tconst / 5 s waits.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+os.environ['LHQS_SIMULATE'] = '1'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import experiment_CM3
+from experiment_CM3 import experiment
+from newinstruments.simInstruments import SimSource, SimLockin
+
+BUCKETS = ['set', 'settle', 'vna sweep', 'read', 'store']
+
+
+class Timings():
+    """
+    Wall time per bucket. A timed call inside another timed call (e.g. a vna read
+    inside io.run) only counts for the outer one.
+    """
+
+    def __init__(self):
+        self.totals = {bucket: 0.0 for bucket in BUCKETS}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def wrap(self, obj, name, bucket):
+        func = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            with self._lock:
+                outer = self._active == 0
+                self._active += 1
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                dt = time.perf_counter() - t0
+                with self._lock:
+                    self._active -= 1
+                    if outer:
+                        self.totals[bucket] += dt
+
+        setattr(obj, name, timed)
+        return timed
+
+
+def make_bench(latency, vna_points, sweep_time, tconst):
+    vna = experiment_CM3.vna
+    sim = vna.instrument
+    sim.latency = latency
+    sim.sweep_time = sweep_time
+
+    yoko_ch = SimSource('GPIB1::7::INSTR', latency=latency, ramp_scale=0)
+    yoko_gt = SimSource('GPIB1::1::INSTR', latency=latency, ramp_scale=0)
+    lockin = SimLockin('GPIB1::11::INSTR', sources=[yoko_ch, yoko_gt], time_constant=tconst / 3, latency=latency)
+
+    control_instr_dict = {
+        'Vch': [0, yoko_ch, 'source_voltage', 'ramp_to_voltage', 'V'],
+        'VgtAll': [0, yoko_gt, 'source_voltage', 'ramp_to_voltage', 'V']
+    }
+    vna_control_dict = {
+        'set_full': [('bench', 'S21', 1), vna, 'set_full_measure'],
+        'format': [('MLOG',), vna, 'set_format'],
+        'avg': [('OFF',), vna, 'set_average_state'],
+        'num_avg': [(1,), vna, 'set_averages'],
+        'output': [(False,), vna, 'set_output'],
+        'sweep_pts': [(vna_points,), vna, 'set_sweep_points'],
+        'start_freq': [(4e9,), vna, 'set_start_frequency'],
+        'stop_freq': [(6e9,), vna, 'set_stop_frequency']
+    }
+    readout_instr_dict = {
+        'Vx': [lockin, 'x', 'V'],
+        'Vy': [lockin, 'y', 'V'],
+        'vna_freq': [vna, 'read_data_freq', 'Hz'],
+        'vna_y1': [vna, 'read_data_y1', 'dB']
+    }
+    return control_instr_dict, vna_control_dict, readout_instr_dict, [yoko_ch, yoko_gt]
+
+
+def instrument(exp, sources, timings, writers):
+    # timing wrappers on the instances, the run loop itself is not modified
+    vna = experiment_CM3.vna
+    timings.wrap(exp, 'settle', 'settle')
+    timings.wrap(exp, 'reset_vna', 'set')
+    timings.wrap(vna, 'set_output', 'set')
+    timings.wrap(vna, 'acquire_sweep', 'vna sweep')
+    for name in ['read_data_freq', 'read_data_y1', 'read_data_y2']:
+        timings.wrap(vna, name, 'read')
+    for source in sources:
+        timings.wrap(source, 'ramp_to_voltage', 'set')
+    timings.wrap(exp, 'create_sqldb', 'store')
+    timings.wrap(exp, 'close_sqlwriter', 'store')
+
+    create_io_executor = exp.create_io_executor
+    create_sqlwriter = exp.create_sqlwriter
+
+    def io_executor():
+        io = create_io_executor()
+        timings.wrap(io, 'set_all', 'set')
+        timings.wrap(io, 'get_all', 'read')
+        timings.wrap(io, 'run', 'read')
+        return io
+
+    def sqlwriter():
+        writer = create_sqlwriter()
+        timings.wrap(writer, 'write', 'store')
+        timings.wrap(writer, 'write_many', 'store')
+        writers.append(writer)
+        return writer
+
+    exp.create_io_executor = io_executor
+    exp.create_sqlwriter = sqlwriter
+
+
+def bench_run(mode, latency=0.005, vna_points=201, sweep_time=0.05, num_sweep=20, num_step=5,
+              tconst=0.03, adaptive=True):
+    """
+    :param mode: '1D' (vna + lock-in), '2D' (lock-in) or 'VNAonly'
+    :return: dict of results
+    """
+    controls, vna_controls, readouts, sources = make_bench(latency, vna_points, sweep_time, tconst)
+    exp = experiment(controls, vna_controls, readouts)
+    exp.tconst = tconst
+    if adaptive:
+        exp.settle_params(readout='Vx', rel_tol=0.02, abs_tol=1e-6)
+    exp.instr_init(ramp_time=0)
+
+    exp.sweep_params(var='Vch', s1=0, s2=1, num=num_sweep)
+    if mode == '2D':
+        exp.step_params(var='VgtAll', s1=0, s2=0.5, num=num_step)
+        num_points = num_sweep * num_step
+    else:
+        exp.step_params()
+        num_points = 1 if mode == 'VNAonly' else num_sweep
+
+    timings = Timings()
+    writers = []
+    instrument(exp, sources, timings, writers)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if mode == '2D':
+        exp.run('bench_2D', exp_type='2D', vna_type=False, lockin_type=True, savedata=True)
+    elif mode == 'VNAonly':
+        exp.run('bench_VNAonly', exp_type='VNAonly', vna_type=True, lockin_type=False, savedata=True)
+    else:
+        exp.run('bench_1D', exp_type='1D', vna_type=True, lockin_type=True, savedata=True)
+    wall = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = writers[-1].get_stats() if writers else {'rows': 0, 'write time': 0.0}
+    split = dict(timings.totals)
+    split['other'] = max(wall - sum(split.values()), 0.0)
+    return {
+        'mode': mode,
+        'wall': wall,
+        'points': num_points,
+        'points/s': num_points / wall,
+        'rows': stats['rows'],
+        'rows/s': stats['rows'] / wall,
+        'commit time': stats['write time'],
+        'split': split,
+        'peak alloc': peak,
+        'max rss': None if resource is None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+
+def print_result(res):
+    print(f"{res['mode']:8s} {res['points']} points in {res['wall']:.2f} s: {res['points/s']:.2f} points/s, "
+          f"{res['rows']:,} rows ({res['rows/s']:,.0f} rows/s, {res['commit time']:.3f} s committing in background)")
+    split = '  '.join(f'{bucket} {100 * t / res["wall"]:4.1f}%' for bucket, t in res['split'].items())
+    print('         ' + split)
+    memory = f"peak python alloc {res['peak alloc'] / 2**20:.1f} MB"
+    if res['max rss'] is not None:
+        memory += f", max rss {res['max rss'] / 2**10:.0f} MB"
+    print('         ' + memory)
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    latency = float(args[0]) if len(args) > 0 else 0.005
+    vna_points = int(args[1]) if len(args) > 1 else 201
+    sweep_time = float(args[2]) if len(args) > 2 else 0.05
+    adaptive = '--fixed-settle' not in sys.argv
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.mkdir('data')
+
+    results = []
+    for mode in ['1D', '2D', 'VNAonly']:
+        results.append(bench_run(mode, latency=latency, vna_points=vna_points, sweep_time=sweep_time,
+                                 adaptive=adaptive))
+    print()
+    print(f'{latency * 1e3:.0f} ms per command, {vna_points} vna points, {sweep_time} s per sweep, '
+          f"{'adaptive' if adaptive else 'fixed'} settling, data in {workdir}")
+    for res in results:
+        print_result(res)
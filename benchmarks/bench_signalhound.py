@@ -0,0 +1,119 @@
+"""
+Repeated spectrum captures at a fixed configuration (power vs parameter maps)
+with SignalHound.SignalHoundSA124B on the simulated analyzer
+(newinstruments/simInstruments.SimSA124B): the previous get_spectrum
+(reconfigure + sa_initiate + python frequency list + fresh arrays every call)
+against the SweepReader path, compared with the native sweep rate. Then
+power-at-frequency stepping (ramp_to_frequency + set_freq_for_power +
+get_power_at_freq per point, as in a 2D map) with the full reconfiguration
+and 0.5 s ramp sleep against the configuration shadow.
+
+    python benchmarks/bench_signalhound.py [sweep_points] [latency_s]
+
+latency is added to every api call (default 0.5 ms, USB).
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.SignalHound import SignalHoundSA124B
+from newinstruments.simInstruments import SimSA124B
+
+
+def old_get_spectrum(sa, center_freq, span, level=0):
+    # get_spectrum before the SweepReader
+    sad = sa.api
+    sad.sa_config_center_span(sa.handle, center_freq, span)
+    sad.sa_config_level(sa.handle, level)
+    sad.sa_config_sweep_coupling(sa.handle, sa.rbw, sa.vbw, "reject")
+    sad.sa_config_acquisition(sa.handle, sad.SA_MIN_MAX, sad.SA_LOG_SCALE)
+    sad.sa_initiate(sa.handle, sad.SA_SWEEPING, 0)
+    query = sad.sa_query_sweep_info(sa.handle)
+    freqs = [query["start_freq"] + i * query["bin_size"] for i in range(query["sweep_length"])]
+    spectrum = sad.sa_get_sweep_64f(sa.handle)["max"]
+    return freqs, spectrum
+
+
+def old_set_freq_for_power(sa, center_freq):
+    sad = sa.api
+    sad.sa_config_center_span(sa.handle, center_freq, 250e3)
+    sad.sa_config_level(sa.handle, 0)
+    sad.sa_config_sweep_coupling(sa.handle, sa.rbw, sa.vbw, "reject")
+    sad.sa_config_acquisition(sa.handle, sad.SA_MIN_MAX, sad.SA_LOG_SCALE)
+    sad.sa_initiate(sa.handle, sad.SA_SWEEPING, 0)
+
+
+def old_step(sa, freqs):
+    old_set_freq_for_power(sa, freqs[0])   # ramp_to_frequency
+    time.sleep(0.5)
+    for freq in freqs:
+        old_set_freq_for_power(sa, freq)
+        max(sad_sweep(sa))
+
+
+def sad_sweep(sa):
+    return sa.api.sa_get_sweep_64f(sa.handle)["max"]
+
+
+def new_step(sa, freqs):
+    sa.ramp_to_frequency(freqs[0])
+    for freq in freqs:
+        sa.set_freq_for_power = freq
+        sa.get_power_at_freq
+
+
+def sweeps_per_sec(func, *args, min_time=1.0):
+    num = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < min_time:
+        func(*args)
+        num += 1
+    return num / (time.perf_counter() - t0)
+
+
+if __name__ == '__main__':
+    sweep_points = int(sys.argv[1]) if len(sys.argv) > 1 else 20001
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5e-3
+    rbw = 30e3
+    span = (sweep_points - 1) * rbw / 3
+    sim = SimSA124B(tones=[(4e9, -30.0)], latency=latency)
+    sa = SignalHoundSA124B(RBW=rbw, VBW=rbw, api=sim)
+    sweep_time = max(span / sim.sweep_rate, sim.min_sweep_time)
+
+    old = sweeps_per_sec(old_get_spectrum, sa, 4e9, span)
+    sa.get_spectrum(4e9, span)
+    new = sweeps_per_sec(sa.get_spectrum, 4e9, span)
+    no_copy = sweeps_per_sec(sa.get_spectrum, 4e9, span, 0, False)
+
+    print(f'{sweep_points} points ({span / 1e6:.0f} MHz at {rbw / 1e3:.0f} kHz RBW), '
+          f'native {1 / sweep_time:.1f} sweeps/s')
+    print(f'  reconfigure every call  {old:6.1f} sweeps/s')
+    print(f'  SweepReader             {new:6.1f} sweeps/s   (x{new / old:.1f})')
+    print(f'  SweepReader, no copy    {no_copy:6.1f} sweeps/s')
+    freqs, spectrum = sa.get_spectrum(4e9, span)
+    assert np.allclose(freqs, old_get_spectrum(sa, 4e9, span)[0])
+
+    # a 10 x 10 map: the frequency is stepped along the sweep axis, the same list on every step
+    step_freqs = np.linspace(3.99e9, 4.01e9, 10)
+    sa.reset_config()
+    t0 = time.perf_counter()
+    for _ in range(10):
+        old_step(sa, step_freqs)
+    t_old = time.perf_counter() - t0
+    sa.reset_config()
+    initiates = sa.num_initiates
+    calls = dict(sim.calls)
+    t0 = time.perf_counter()
+    for _ in range(10):
+        new_step(sa, step_freqs)
+    t_new = time.perf_counter() - t0
+    configs = sum(n - calls.get(name, 0) for name, n in sim.calls.items() if name.startswith('sa_config'))
+    print(f'10 x 10 power map, {sim.min_sweep_time * 1e3:.0f} ms per 250 kHz sweep')
+    print(f'  full reconfiguration + 0.5 s ramp  {t_old:6.2f} s')
+    print(f'  configuration shadow               {t_new:6.2f} s   (x{t_old / t_new:.1f}, '
+          f'{sa.num_initiates - initiates} initiates, {configs} config calls)')
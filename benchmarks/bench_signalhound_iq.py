@@ -0,0 +1,101 @@
+"""
+Streaming IQ capture with SignalHound.IQStream on the simulated analyzer
+(newinstruments/simInstruments.SimSA124B): a loop calling
+sa_get_IQ_data_unpacked (new array every block) and processing in the same
+thread, against the reader thread + preallocated ring + consumer thread.
+One consumer stalls for 0.8 s once a second (a plot update, a file flush),
+longer than the 0.5 s the simulated device buffers. Reports the sustained
+sample rate, samples lost by the device and the demodulated tone amplitude /
+band power against the simulated tone.
+
+    python benchmarks/bench_signalhound_iq.py [duration_s] [decimation]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.SignalHound import SignalHoundSA124B, BandPower, Demodulator, IQDecimator
+from newinstruments.simInstruments import SimSA124B
+
+CENTER = 4e9
+OFFSET = 20e3
+TONE_DBM = -40.0
+
+
+def single_thread(sa, duration, consumers, decimation, block_size=4096):
+    # read and process in one loop, a fresh array per block
+    api = sa.api
+    api.sa_config_center_span(sa.handle, CENTER, 250e3)
+    api.sa_config_IQ(sa.handle, decimation, 250e3)
+    api.sa_initiate(sa.handle, api.SA_IQ, 0)
+    rate = api.sa_query_stream_info(sa.handle)['samples_per_second']
+    for consumer in consumers:
+        consumer.start(rate)
+    lost = 0
+    num = 0
+    purge = 1
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < duration:
+        result = api.sa_get_IQ_data_unpacked(sa.handle, block_size, purge)
+        purge = 0
+        lost += result['sample_loss']
+        for consumer in consumers:
+            consumer.process(result['iq_data'], num * block_size / rate)
+        num += 1
+    api.sa_abort(sa.handle)
+    return num * block_size / (time.perf_counter() - t0), lost
+
+
+class Stall():
+
+    def __init__(self, every=1.0, stall=0.8):
+        self.every = every
+        self.stall = stall
+
+    def start(self, sample_rate):
+        self.next = self.every
+
+    def process(self, block, t0):
+        if t0 >= self.next:
+            self.next += self.every
+            time.sleep(self.stall)
+
+
+def consumers():
+    return [BandPower(OFFSET, 10e3), Demodulator(OFFSET, 64), IQDecimator(100), Stall()]
+
+
+if __name__ == '__main__':
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    decimation = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    sim = SimSA124B(tones=[(CENTER + OFFSET, TONE_DBM)], noise_floor=-110.0, latency=0.5e-3)
+    sa = SignalHoundSA124B(api=sim)
+    device_rate = sim.SA_IQ_SAMPLE_RATE / decimation
+
+    rate_old, lost_old = single_thread(sa, duration, consumers(), decimation)
+
+    consumers = consumers()
+    stream = sa.iq_stream(CENTER, consumers, decimation=decimation, block_size=4096, ring_blocks=256)
+    t0 = time.perf_counter()
+    with stream:
+        time.sleep(duration)
+    elapsed = time.perf_counter() - t0
+    rate_new = stream.blocks_read * stream.block_size / elapsed
+
+    print(f'device rate {device_rate / 1e3:.1f} kS/s, 4096 sample blocks, '
+          f'ring of {stream.ring_blocks * stream.block_size / device_rate:.1f} s')
+    print(f'  read + process in one loop   {rate_old / 1e3:7.1f} kS/s, sample loss reported {lost_old} times')
+    print(f'  reader thread + ring         {rate_new / 1e3:7.1f} kS/s, sample loss reported '
+          f'{stream.sample_loss} times, {stream.ring_overruns} ring overruns')
+
+    times, amplitude, phase = consumers[1].get_data()
+    _, power = consumers[0].get_data()
+    print(f'  tone {TONE_DBM:.1f} dBm: demodulated {20 * np.log10(np.median(amplitude)):.2f} dBm, '
+          f'band power {np.median(power):.2f} dBm, phase drift {np.ptp(np.unwrap(phase)):.3f} rad')
+    _, waveform = consumers[2].get_data()
+    print(f'  decimated waveform {len(waveform)} points')
@@ -0,0 +1,67 @@
+"""
+Wide survey sweeps with SignalHound.SignalHoundSA124B on the simulated
+analyzer (newinstruments/simInstruments.SimSA124B): get_spectrum (blocks for
+the whole sweep) against sweep_progressive, time to the first data, a
+complete progressive sweep, and early termination on a peak above threshold
+and on a covered region of interest.
+
+    python benchmarks/bench_signalhound_partial.py [span_GHz] [rbw_Hz]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.SignalHound import SignalHoundSA124B, peak_above, roi_covered
+from newinstruments.simInstruments import SimSA124B
+
+START = 1e9
+TONE = 2.2e9
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - t0, result
+
+
+def first_data(sa, center, span):
+    t0 = time.perf_counter()
+    for start, stop, freqs, spectrum in sa.sweep_progressive(center, span):
+        return time.perf_counter() - t0, stop
+
+
+if __name__ == '__main__':
+    span = float(sys.argv[1]) * 1e9 if len(sys.argv) > 1 else 6e9
+    rbw = float(sys.argv[2]) if len(sys.argv) > 2 else 300e3
+    center = START + span / 2
+    sim = SimSA124B(tones=[(TONE, -40.0)], noise_floor=-100.0, latency=0.5e-3, initiate_time=0.05)
+    sa = SignalHoundSA124B(RBW=rbw, VBW=rbw, api=sim)
+
+    # every measurement starts from another configuration, so all of them pay the initiate
+    sa.get_spectrum(4e9, 1e6)
+    t_full, (freqs, spectrum) = timed(sa.get_spectrum, center, span)
+    length = len(freqs)
+    sa.get_spectrum(4e9, 1e6)
+    t_first, stop_first = first_data(sa, center, span)
+    sa.get_spectrum(4e9, 1e6)
+    t_prog, (_, progressive, stop) = timed(sa.get_spectrum_until, center, span, 0, None)
+    sa.get_spectrum(4e9, 1e6)
+    t_peak, (_, partial, stop_peak) = timed(sa.get_spectrum_until, center, span, 0, peak_above(-60))
+    sa.get_spectrum(4e9, 1e6)
+    t_roi, (_, _, stop_roi) = timed(sa.get_spectrum_until, center, span, 0, roi_covered(START + span / 3))
+    t_after, (_, after) = timed(sa.get_spectrum, center, span)
+
+    print(f'{span / 1e9:.1f} GHz survey at {rbw / 1e3:.0f} kHz RBW, {length} bins')
+    print(f'  get_spectrum                  {t_full * 1e3:7.1f} ms')
+    print(f'  progressive, first segment    {t_first * 1e3:7.1f} ms  ({stop_first} bins)')
+    print(f'  progressive, complete         {t_prog * 1e3:7.1f} ms  ({stop} bins, '
+          f'peak {freqs[np.argmax(progressive)] / 1e9:.4f} GHz {np.max(progressive):.1f} dBm)')
+    print(f'  stop on peak above -60 dBm    {t_peak * 1e3:7.1f} ms  ({stop_peak} bins, '
+          f'peak {freqs[np.nanargmax(partial)] / 1e9:.4f} GHz)')
+    print(f'  stop when first third covered {t_roi * 1e3:7.1f} ms  ({stop_roi} bins)')
+    print(f'  get_spectrum after early stop {t_after * 1e3:7.1f} ms  (re-initiated, {np.sum(np.isnan(after))} nan)')
@@ -0,0 +1,96 @@
+"""
+Tracking generator S21 with SignalHound.SignalHoundSA124B on the simulated
+analyzer + TG (newinstruments/simInstruments.SimSA124B, a 20 dB notch at
+4.5 GHz): through normalization, notch depth / frequency against the
+simulated DUT, read_data per sweep with the configuration shadow against a
+reconfiguration per read, and a 1D experiment run with the TG trace as a
+readout next to the simulated E5071 (experiment.add_tg_readouts).
+
+    python benchmarks/bench_signalhound_tg.py [tg_points] [latency_s]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+from contextlib import redirect_stdout
+
+import numpy as np
+
+os.environ['LHQS_SIMULATE'] = '1'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from newinstruments.SignalHound import SignalHoundSA124B
+from newinstruments.simInstruments import SimSA124B
+from experiment_CM3 import experiment
+from bench_experiment import make_bench
+
+F0 = 4.5e9
+
+
+def reconfigure_read(sa, points):
+    # every read from scratch: configuration and initiate (warning, if any, not printed)
+    sa.reset_config()
+    sa.configure_tg(F0 - 50e6, F0 + 50e6, points)
+    with redirect_stdout(open(os.devnull, 'w')):
+        return sa.read_data()
+
+
+def timed(func, *args, repeat=5):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - t0) / repeat, result
+
+
+if __name__ == '__main__':
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 201
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5e-3
+    sim = SimSA124B(resonators=[(F0, 1e4, 20.0)], latency=latency, tg_point_time=0.2e-3)
+    sa = SignalHoundSA124B(api=sim)
+
+    sa.configure_tg(F0 - 50e6, F0 + 50e6, points)
+    raw = sa.read_data()
+    sim.tg_dut = False
+    sa.store_tg_thru()
+    sim.tg_dut = True
+    t_read, data = timed(sa.read_data)
+    freqs, s21 = data
+    sim_s21 = sim.get_s21(freqs)
+
+    print(f'TG sweep {F0 / 1e9 - 0.05:.2f} - {F0 / 1e9 + 0.05:.2f} GHz, {points} points')
+    print(f'  raw sweep {raw[1].max():.1f} dBm off resonance, normalized {np.median(s21):.2f} dB')
+    print(f'  notch {s21.min():.2f} dB at {freqs[np.argmin(s21)] / 1e9:.5f} GHz, simulated DUT '
+          f'{sim_s21.min():.2f} dB, rms error {np.sqrt(np.mean((s21 - sim_s21) ** 2)):.3f} dB')
+    t_reconf, _ = timed(reconfigure_read, sa, points)
+    print(f'  read_data {t_read * 1e3:.1f} ms per sweep, reconfigured per read {t_reconf * 1e3:.1f} ms')
+
+    # 1D run, E5071 trace and TG trace of a second line per sweep point
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.mkdir('data')
+    sa.configure_tg(F0 - 50e6, F0 + 50e6, 201)
+    sim.tg_dut = False
+    sa.store_tg_thru()
+    sim.tg_dut = True
+    controls, vna_controls, readouts, sources = make_bench(0.005, 201, 0.05, 0.03)
+    exp = experiment(controls, vna_controls, readouts)
+    exp.tconst = 0.03
+    exp.add_tg_readouts(sa)
+    exp.instr_init(ramp_time=0)
+    exp.sweep_params(var='Vch', s1=0, s2=1, num=5)
+    exp.step_params()
+    t0 = time.perf_counter()
+    exp.run('bench_tg', exp_type='1D', vna_type=True, lockin_type=True, savedata=True)
+    wall = time.perf_counter() - t0
+
+    db = [os.path.join(root, name) for root, _, names in os.walk(workdir) for name in names if name.endswith('.db')][0]
+    con = sqlite3.connect(db)
+    table = con.execute("select name from sqlite_master where type='table'").fetchall()[0][0]
+    columns = [row[1] for row in con.execute(f'pragma table_info("{table}")')]
+    rows = con.execute(f'select * from "{table}"').fetchall()
+    tg = np.array([row[columns.index('vna_tg_y1')] for row in rows])
+    print(f'1D run, 5 points: {wall:.2f} s, {len(rows)} rows, columns {columns}')
+    print(f'  vna_tg_y1 min {tg.min():.2f} dB, {np.sum(tg < -10)} points below -10 dB')
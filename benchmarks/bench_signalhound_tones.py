@@ -0,0 +1,67 @@
+"""
+Power at several known frequencies (a drive, its sidebands and harmonics)
+with SignalHound.SignalHoundSA124B on the simulated analyzer
+(newinstruments/simInstruments.SimSA124B): set_freq_for_power +
+get_power_at_freq per tone (a 250 kHz sweep and a re-initiate each) against
+get_power_at_freqs (fewest wide sweeps, vectorized peak lookup).
+
+    python benchmarks/bench_signalhound_tones.py [rbw_Hz] [latency_s]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.SignalHound import SignalHoundSA124B, plan_sweeps
+from newinstruments.simInstruments import SimSA124B
+
+DRIVE = 4.0e9
+# drive, +- 1 and 2 MHz sidebands, second and third harmonic with sidebands
+TONES = [f + n * 1e6 for f in (DRIVE, 2 * DRIVE, 3 * DRIVE) for n in (-2, -1, 0, 1, 2)]
+LEVELS = [-30.0 - 5 * abs(n) - 20 * h for h in range(3) for n in (-2, -1, 0, 1, 2)]
+
+
+def per_tone(sa, freqs):
+    powers = []
+    for freq in freqs:
+        sa.set_freq_for_power = freq
+        powers.append(sa.get_power_at_freq)
+    return np.array(powers)
+
+
+def timed(func, *args, repeat=3):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - t0) / repeat, result
+
+
+if __name__ == '__main__':
+    rbw = float(sys.argv[1]) if len(sys.argv) > 1 else 30e3
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5e-3
+    sim = SimSA124B(tones=list(zip(TONES, LEVELS)), noise_floor=-110.0, latency=latency)
+    sa = SignalHoundSA124B(RBW=rbw, VBW=rbw, api=sim)
+
+    t_old, old = timed(per_tone, sa, TONES)
+    initiates = sa.num_initiates
+    t_new, new = timed(sa.get_power_at_freqs, TONES)
+    initiates = (sa.num_initiates - initiates) / 3
+    sweeps = len(plan_sweeps(TONES, rbw, 200e6))
+
+    print(f'{len(TONES)} tones around {DRIVE / 1e9:.0f}, {2 * DRIVE / 1e9:.0f} and {3 * DRIVE / 1e9:.0f} GHz, '
+          f'RBW {rbw / 1e3:.0f} kHz')
+    print(f'  set_freq_for_power per tone   {t_old * 1e3:7.1f} ms')
+    print(f'  get_power_at_freqs            {t_new * 1e3:7.1f} ms   (x{t_old / t_new:.1f}, '
+          f'{sweeps} sweeps, {initiates:.0f} initiates per call)')
+    print(f'  max difference {np.max(np.abs(new - old)):.2f} dB, to the simulated levels '
+          f'{np.max(np.abs(new - np.array(LEVELS))):.2f} dB')
+
+    # the same tones read repeatedly from one sweep (sidebands of the drive only)
+    t_one, _ = timed(sa.get_power_at_freqs, TONES[:5], repeat=20)
+    t_old_one, _ = timed(per_tone, sa, TONES[:5])
+    print(f'  5 tones in one sweep, repeated: per tone {t_old_one * 1e3:.1f} ms, '
+          f'get_power_at_freqs {t_one * 1e3:.1f} ms (no reconfiguration)')
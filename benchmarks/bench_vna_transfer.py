@@ -0,0 +1,44 @@
+"""
+Traces per second of E5071_2.read_data for ascii vs binary block transfers,
+measured against the simulated VISA resource (newinstruments/simInstruments.py).
+
+    python benchmarks/bench_vna_transfer.py [bytes_per_sec]
+
+The emulated bus throughput defaults to 1 MB/s (GPIB). query_sleep is set to 0
+so that only transfer and parsing time are measured.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newinstruments.nwa2 import E5071_2
+from newinstruments.simInstruments import SimE5071Resource, attach_resource
+
+
+def bench_read_data(sweep_points, data_format, trace_format='SMIT', bytes_per_sec=1e6, min_time=1.0):
+    vna = E5071_2(address='GPIB0::2::INSTR', enabled=False)
+    sim = SimE5071Resource(sweep_points=sweep_points, trace_format=trace_format, bytes_per_sec=bytes_per_sec)
+    attach_resource(vna, sim)
+    vna.query_sleep = 0
+    vna.set_data_format(data_format)
+
+    num = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < min_time:
+        vna.read_data()
+        num += 1
+    elapsed = time.perf_counter() - t0
+    return num / elapsed, sim.bytes_read / num
+
+
+if __name__ == '__main__':
+    bytes_per_sec = float(sys.argv[1]) if len(sys.argv) > 1 else 1e6
+    print(f'emulated bus: {bytes_per_sec:,.0f} bytes/s, SMIT format (2 values per point)')
+    print(f"{'points':>8} {'format':>8} {'traces/s':>10} {'bytes/trace':>12}")
+    for sweep_points in [201, 1601, 16001]:
+        for data_format in ['ASC', 'REAL,32', 'REAL,64']:
+            rate, nbytes = bench_read_data(sweep_points, data_format, bytes_per_sec=bytes_per_sec)
+            print(f'{sweep_points:>8} {data_format:>8} {rate:>10.2f} {nbytes:>12,.0f}')
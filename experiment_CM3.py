@@ -15,15 +15,27 @@ import warnings
 import os.path
 import os
 
-from time import sleep, strftime
+from time import sleep, strftime, perf_counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from tabulate import tabulate
 from tqdm import tqdm
 from IPython.display import clear_output
 
 from helpers.database2 import Create_DB
+from sqlwriter import SQLBufferedWriter
+from tracestore import TraceBlobWriter
+from instrument_io import BusExecutor, bus_of
+from settling import Settler
+from runprofile import RunProfile, RunTimer, combine, format_duration
 from newinstruments.nwa2 import *
 
-vna = E5071_2('GPIB0::2::INSTR')
+if os.environ.get('LHQS_SIMULATE'):
+    # offline runs (benchmarks/bench_experiment.py): simulated vna, see newinstruments/simInstruments.py
+    from newinstruments.simInstruments import SimE5071Resource, attach_resource
+    vna = attach_resource(E5071_2('GPIB0::2::INSTR', enabled=False), SimE5071Resource())
+else:
+    vna = E5071_2('GPIB0::2::INSTR')
 
 
 def create_sweep_list(s1=0, s2=1, num=10, scale='linear'):
@@ -55,12 +67,36 @@ class experiment():
     tconst = 0.1
     comment = 'None'
     comment2 = 'None'
+
+    # buffered database writer: rows per transaction / max seconds before commit
+    _sql_flush_rows = 1000
+    _sql_flush_time = 2.0
+
+    # max seconds to wait for one (averaged) vna sweep to complete
+    _vna_sweep_timeout = 600
+
+    # 'rows': one table_data row per vna frequency point
+    # 'blob': one vna_traces row per sweep, traces as float blobs (see tracestore.read_traces)
+    _vna_storage = 'rows'
+    _vna_blob_dtype = 'float64'
+
+    # set controls / read readouts on different buses (GPIB0, GPIB1, COM, USB) at the same time
+    _concurrent_io = True
+
+    # operation timings of past runs, used by estimate_run_time
+    # (None: run_profile.json in the data directory, made absolute when the experiment is created)
+    _profile_path = None
     
     def __init__(self, ctrl_instrument: dict, vna_control: dict, read_instrument: dict):
 
         self.__reads = read_instrument
         self.__ctrls = ctrl_instrument
         self.__vnas = vna_control
+        self.__settle = None
+        self.__timer = None
+        self.__pollers = []     # fridge pollers run by the experiment itself, see add_fridge_readouts
+        if self._profile_path is None:
+            self._profile_path = os.path.abspath(os.path.join('data', 'run_profile.json'))
         for key in ctrl_instrument:
             # create class attributes to store all control parameters
             setattr(self, key, ctrl_instrument[key][0])
@@ -185,6 +221,7 @@ class experiment():
         filename = create_path_filename(exp_name)
         if os.path.exists(filename):
             os.remove(filename)
+        self.__db_filename = filename
 
         sqldb = Create_DB(
                         filename, 
@@ -198,6 +235,145 @@ class experiment():
     def close_sqldb(self, sqldb: Create_DB) -> None:
         sqldb.sql_close()
 
+    def create_sqlwriter(self) -> SQLBufferedWriter:
+        """
+        background writer appending rows to the database made by the last create_sqldb call,
+        rows are committed in batches so the acquisition loop never waits on the disk
+        """
+        writer = SQLBufferedWriter(self.__db_filename, 'table_data', self._sql_flush_rows, self._sql_flush_time)
+        return writer.start()
+
+    def close_sqlwriter(self, writer: SQLBufferedWriter) -> None:
+        writer.close()
+        stats = writer.get_stats()
+        print(f"wrote {stats['rows']:,} rows in {stats['transactions']} transactions ({stats['rows/s']:,.0f} rows/s)")
+
+    def create_trace_writer(self, writer: SQLBufferedWriter, readouts: dict) -> TraceBlobWriter:
+        """
+        blob storage of the vna traces (only if _vna_storage == 'blob'), the non-vna
+        readouts of the sweep point are stored as scalar columns of the same row
+        """
+        if self._vna_storage != 'blob':
+            return None
+        scalar_keys = [key for key in readouts if 'vna' not in key]
+        trace_keys = [key for key in readouts if 'vna' in key and key != 'vna_freq']
+        return TraceBlobWriter(writer, scalar_keys, trace_keys, dtype=self._vna_blob_dtype)
+
+    def create_io_executor(self) -> BusExecutor:
+        """
+        executor running instrument operations of one loop step concurrently across buses,
+        operations on the same bus keep their order
+        """
+        return BusExecutor(concurrent=self._concurrent_io)
+
+    def close_io_executor(self, io: BusExecutor) -> None:
+        io.close()
+        print(io.report())
+        if self.__timer is not None:
+            self.__timer.add_io(io)
+
+    @contextmanager
+    def time_op(self, op):
+        # records the duration of an operation of the current run, see runprofile
+        if self.__timer is None:
+            yield
+        else:
+            with self.__timer.time(op):
+                yield
+
+    def add_fridge_readouts(self, poller, names=('T_mxc', 'P_still'), age=True) -> None:
+        """
+        adds fridge telemetry columns to the readouts, every data row gets the latest value polled
+        in the background (no log file access in the loop)
+        :param poller: newinstruments.BlueFors.FridgePoller. A running poller (with FridgePoller(...)
+            as poller:) belongs to the caller, one that is not running is started by every run and
+            stopped when the run ends
+        :param names: BlueFors.TELEMETRY quantities, e.g. 'T_mxc', 'T_still', 'P_still'
+        :param age: also store the age of each sample in seconds (column name + '_age')
+        """
+        if not poller.running and poller not in self.__pollers:
+            self.__pollers.append(poller)
+        # scalar readouts go before the vna ones (column order of the vna rows)
+        vna_reads = {key: self.__reads.pop(key) for key in list(self.__reads) if 'vna' in key}
+        for name in names:
+            self.__reads[name] = [poller, name, 'K' if name.startswith('T') else 'mbar']
+            if age:
+                self.__reads[name + '_age'] = [poller, name + '_age', 's']
+        self.__reads.update(vna_reads)
+
+    def add_tg_readouts(self, sa, name='vna_tg') -> None:
+        """
+        adds the S21 trace of a SignalHound tracking generator sweep next to the vna readouts
+        (columns name + '_freq' and name + '_y1'), a second transmission measurement on its own bus
+        :param sa: newinstruments.SignalHound.SignalHoundSA124B after configure_tg and store_tg_thru,
+                   for 'rows' storage with num_points equal to the vna sweep points
+        """
+        if sa.tg_freqs is not None and len(sa.tg_freqs) != self.get_vna_sweep_points():
+            print('TG sweep points differ from the vna sweep points, configure_tg(num_points=...)')
+        self.__reads[name + '_freq'] = [sa, 'read_data_freq', 'Hz']
+        self.__reads[name + '_y1'] = [sa, 'read_data_y1', 'dB']
+
+    def settle_params(self, readout='Vx', method='consecutive', rel_tol=0.01, abs_tol=0.0, num_consecutive=3) -> None:
+        """
+        enables adaptive settling: after setting a point (max 3*tconst) and after ramps (max 5 s)
+        the readout is polled and the loop moves on once it has settled, see settling.Settler.
+        settle_params(readout=None) goes back to the fixed sleeps.
+        """
+        if readout is None:
+            self.__settle = None
+            return
+        self.__settle = {
+            'instr': self.__reads[readout],
+            'method': method,
+            'rel_tol': rel_tol,
+            'abs_tol': abs_tol,
+            'num_consecutive': num_consecutive
+        }
+
+    def create_settlers(self) -> tuple:
+        """
+        settlers for single points and for ramps, (None, None) if adaptive settling is off
+        """
+        if self.__settle is None:
+            return None, None
+        instr = self.__settle['instr']
+        kwargs = {key: self.__settle[key] for key in ['method', 'rel_tol', 'abs_tol', 'num_consecutive']}
+        read = lambda: getattr(instr[0], instr[1])
+        point = Settler(read, max_wait=3 * self.tconst, poll_interval=self.tconst / 2, min_wait=self.tconst, **kwargs)
+        ramp = Settler(read, max_wait=5, poll_interval=max(self.tconst, 0.05), min_wait=self.tconst, **kwargs)
+        return point, ramp
+
+    def settle(self, settler, max_wait, label=None, op='settle point') -> None:
+        # fixed sleep without a settler, adaptive wait capped at max_wait otherwise
+        with self.time_op(op):
+            if settler is None:
+                sleep(max_wait)
+            else:
+                settler.wait(label=label, max_wait=max_wait)
+
+    def close_settlers(self, settlers, savedata) -> None:
+        # prints the settle time summary and stores the per-point log next to the database
+        for name, settler in zip(['point', 'ramp'], settlers):
+            if settler is None:
+                continue
+            print(name + ' ' + settler.summary())
+            if savedata:
+                settler.save_log(self.__db_filename[:-3] + '_settle_' + name + '.csv')
+
+    def load_list_sweeps(self, sweep_controls, sweep_lists) -> None:
+        """
+        controls with hardware list sweeps (e.g. SignalCore.SignalCoreListSweep) get the whole
+        sweep list once, setting them in the loop then only steps the list
+        """
+        for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists):
+            if hasattr(instr[1], 'load_list'):
+                instr[1].load_list(sweep_list)
+
+    def release_list_sweeps(self, sweep_controls) -> None:
+        for instr in list(sweep_controls.values()):
+            if hasattr(instr[1], 'release_list'):
+                instr[1].release_list()
+
     def find_keys_with_val(self, dictionary, word):
         keys_with_val = []
         for key, values in dictionary.items():
@@ -230,9 +406,24 @@ class experiment():
         else:
             pass
 
+    def get_vna_segments(self):
+        """
+        segment table of the vna controls, e.g. 'segments': [(segments_around(centers, span, points),), vna, 'set_segments'],
+        None for a linear sweep
+        """
+        keys = self.find_keys_with_val(self.__vnas, 'set_segments')
+        return list(self.__vnas[keys[0]][0][0]) if keys else None
+
+    def get_vna_sweep_points(self) -> int:
+        # total points of the segment table, sweep_pts otherwise
+        segments = self.get_vna_segments()
+        if segments is not None:
+            return sum(int(seg[2]) for seg in segments)
+        return int(self.__vnas.get('sweep_pts')[0][0])
+
     def vna_sleep_time(self):
         vna_controls = self.__vnas
-        vna_sweep_points = int(vna_controls.get('sweep_pts')[0][0])
+        vna_sweep_points = self.get_vna_sweep_points()
         vna_num_avgs = int(vna_controls.get('num_avg')[0][0])
 
         if vna_sweep_points < 6000:
@@ -258,7 +449,8 @@ class experiment():
         form = vna_controls.get('format')[0][0]
         readouts = self.__reads
         rkeys = list(readouts.keys())
-        r_vnakeys = [key for key in rkeys if 'vna' in key]
+        # only the E5071 keys, not other traces (add_tg_readouts)
+        r_vnakeys = [key for key in rkeys if 'vna' in key and isinstance(readouts[key][0], E5071_2)]
 
         if form in ['SMIT', 'POL', 'SADM']:
             if len(r_vnakeys) == 3:
@@ -276,8 +468,12 @@ class experiment():
             else:
                 print('please add correct vna readout keys in the readout dictionary')
         
+        # the frequency axis is served from the same per-sweep snapshot as vna_y1 / vna_y2
+        if 'vna_freq' in readouts and readouts['vna_freq'][1] == 'get_fpoints':
+            readouts['vna_freq'] = [readouts['vna_freq'][0], 'read_data_freq'] + readouts['vna_freq'][2:]
+
         rkeys = list(readouts.keys())
-        r_vnakeys = [key for key in rkeys if 'vna' in key]
+        r_vnakeys = [key for key in rkeys if 'vna' in key and isinstance(readouts[key][0], E5071_2)]
 
         return r_vnakeys
     
@@ -317,24 +513,40 @@ class experiment():
 
         if savedata:
             sqldb = self.create_sqldb(exp_name)  
+            writer = self.create_sqlwriter()
+
+            traces = self.create_trace_writer(writer, reads)
 
             try:
+                vna.new_sweep()
                 vna_arr = []
+                vna_data = {}
                 for key, instr in reads.items():
                     if 'vna' in key:
-                        data = getattr(instr[0], instr[1])()
+                        with self.time_op('read:' + key):
+                            data = getattr(instr[0], instr[1])()
                         vna_arr.append([data])
+                        vna_data[key] = data
                     else:
                         pass
                 vna_arr = np.array(vna_arr).transpose()
 
+                if traces is not None:
+                    freq = vna_data['vna_freq'] if 'vna_freq' in vna_data else vna.read_data_freq()
+                    with self.time_op('db write'):
+                        traces.write(0, 0, freq, [vna_data[key] for key in traces.trace_keys])
+                    vna_arr = []
+
                 for i in range(len(vna_arr)):
                     v = vna_arr[i]
+                    rows = []
                     for k in range(len(v)):
                         sub_arr = [i, 0] + v[k].tolist()
-                        # write data into sql_db
-                        if savedata:
-                            sqldb.sql_sweep_write('table_data', tuple(sub_arr))
+                        rows.append(sub_arr)
+                    # write data into sql_db
+                    if savedata:
+                        with self.time_op('db write'):
+                            writer.write_many(rows)
                 
                 if savedata:
                     print('experiment is successfully finished')
@@ -353,6 +565,7 @@ class experiment():
 
             finally:
                 if savedata:
+                    self.close_sqlwriter(writer)
                     sqldb.sql_close()
                     print('closed db')      
 
@@ -360,6 +573,7 @@ class experiment():
     def noVNA_run_init(self):
         reads = self.__reads
         rem_keys = [key for key in reads if 'vna' in key]
+        vals = []
 
         if len(rem_keys) > 0:
             vals = [self.__reads.get(rem_keys[i]) for i in range(len(rem_keys))]
@@ -395,9 +609,15 @@ class experiment():
 
         if savedata:
             sqldb = self.create_sqldb(exp_name)
+            writer = self.create_sqlwriter()
 
+        io = self.create_io_executor()
+        point_settler, ramp_settler = self.create_settlers()
 
         try:
+            # inside the try, the writer and io executor are closed if loading fails
+            self.load_list_sweeps(sweep_controls, sweep_lists)
+
             for i in range(num_step_points):
                 if exp_type == '2D':
                     clear_output(wait=True)
@@ -406,45 +626,50 @@ class experiment():
 
                     # set experiment controls for 2D depending on if Vac will be the parameter swept
 
-                    if 'Vac' in self.sweep_params['variable']:
+                    if 'Vac' in self.__sweep['variable']:
                         #set step control instruments
-                        for instr, step_list in zip(list(step_controls.values()), step_lists):
-                            setattr(instr[1], instr[2], step_list[i])
+                        io.set_all([(instr[1], instr[2], step_list[i])
+                                    for instr, step_list in zip(list(step_controls.values()), step_lists)],
+                                   labels=['set:' + key for key in step_controls])
 
-                        #ramp sweep control instruments to initial sweep point and wait 5 seconds
-                        for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists):
+                        #ramp sweep control instruments to initial sweep point and wait (max 5 seconds)
+                        for key, instr, sweep_list in zip(sweep_controls.keys(), sweep_controls.values(), sweep_lists):
                             instr_ramp = getattr(instr[1], instr[3])
-                            instr_ramp(sweep_list[0])
-                        sleep(5)
+                            with self.time_op('ramp:' + key):
+                                instr_ramp(sweep_list[0])
+                        self.settle(ramp_settler, 5, label=(i, 'ramp'), op='settle ramp')
 
                     else:
                         #set step control instruments
-                        for instr, step_list in zip(list(step_controls.values()), step_lists):
-                            setattr(instr[1], instr[2], step_list[i])
+                        io.set_all([(instr[1], instr[2], step_list[i])
+                                    for instr, step_list in zip(list(step_controls.values()), step_lists)],
+                                   labels=['set:' + key for key in step_controls])
 
-                        #ramp sweep control instruments to initial sweep point and wait 5 seconds
-                        for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists):
+                        #ramp sweep control instruments to initial sweep point and wait (max 5 seconds)
+                        for key, instr, sweep_list in zip(sweep_controls.keys(), sweep_controls.values(), sweep_lists):
                             instr_ramp = getattr(instr[1], instr[3])
-                            instr_ramp(sweep_list[0])
-                        sleep(5)
+                            with self.time_op('ramp:' + key):
+                                instr_ramp(sweep_list[0])
+                        self.settle(ramp_settler, 5, label=(i, 'ramp'), op='settle ramp')
 
                 #set inner sweep loop        
                 for j in tqdm(range(num_sweep_points), ncols = 100, desc = progress_step):
 
                     #set sweep control instruments
-                    for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists):
-                        setattr(instr[1], instr[2], sweep_list[j])
-                    sleep(3 * self.tconst)
+                    io.set_all([(instr[1], instr[2], sweep_list[j])
+                                for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists)],
+                               labels=['set:' + key for key in sweep_controls])
+                    self.settle(point_settler, 3 * self.tconst, label=(i, j))
 
                     #measure readout instruments
                     data_instance = [j, i]
-                    for instr in list(readouts.values()):
-                        data = getattr(instr[0], instr[1])
-                        data_instance.append(data)
+                    data_instance += io.get_all([(instr[0], instr[1]) for instr in list(readouts.values())],
+                                                labels=['read:' + key for key in readouts])
                     
                     #write into sql database
                     if savedata:
-                        sqldb.sql_sweep_write('table_data', tuple(data_instance))
+                        with self.time_op('db write'):
+                            writer.write(data_instance)
 
                 if savedata:
                     print('experiment is successfully finished')
@@ -453,7 +678,11 @@ class experiment():
             print ('KeyboardInterrupt exception is caught / data aqcuisiotion is stopped by user')
 
         finally:
+            self.release_list_sweeps(sweep_controls)
+            self.close_io_executor(io)
+            self.close_settlers((point_settler, ramp_settler), savedata)
             if savedata:
+                self.close_sqlwriter(writer)
                 sqldb.sql_close()
                 print('closed db')                    
 
@@ -467,7 +696,7 @@ class experiment():
         self.vna_readout_adjust()
 
         #check vna sweep points
-        vna_sweep_points = vna_controls.get('sweep_pts')[0][0]
+        vna_sweep_points = self.get_vna_sweep_points()
 
         sweep_controls  = {key: self.__ctrls.get(key) for key in self.__sweep['variable']}
         readouts        = self.__reads
@@ -476,6 +705,9 @@ class experiment():
 
         num_sweep_points = self.__sweep.get('num points')
         vna_sleep = self.vna_sleep_time()
+        vna_avg = vna_controls.get('avg')[0][0] in ['ON', True]
+        vna_sweep_time = 0
+        num_vna_sweeps = 0
 
         reads = self.__reads
 
@@ -491,44 +723,78 @@ class experiment():
 
         if savedata:
             sqldb = self.create_sqldb(exp_name)
+            writer = self.create_sqlwriter()
+
+            traces = self.create_trace_writer(writer, readouts)
+
+        io = self.create_io_executor()
+        point_settler, ramp_settler = self.create_settlers()
 
         progress_step = None
         counter  = 0
 
         if exp_type == '1D':
             try:
+                # one trigger = one complete (averaged) sweep, completion is read from the vna
+                vna.setup_single_sweep(average=vna_avg)
+                self.load_list_sweeps(sweep_controls, sweep_lists)
+
                 for i in range(num_sweep_points):
 
                     clear_output(wait=True)
 
                     progress_step = 'loop ' + str(i + 1)+'/'+str(num_sweep_points)
 
-                    # ramp sweep control instruments to initial sweep point and wait 5 seconds
-                    for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists):
+                    # ramp sweep control instruments to initial sweep point and wait (max 5 seconds)
+                    for key, instr, sweep_list in zip(sweep_controls.keys(), sweep_controls.values(), sweep_lists):
                         instr_ramp = getattr(instr[1], instr[3])
-                        instr_ramp(sweep_list[i]) 
-                    sleep(5)
+                        with self.time_op('ramp:' + key):
+                            instr_ramp(sweep_list[i])
+                    self.settle(ramp_settler, 5, label=(i, 'ramp'), op='settle ramp')
 
-                    self.reset_vna()
+                    with self.time_op('vna reset'):
+                        self.reset_vna()
 
                     # set sweep instrument to ith value in sweep list
-                    for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists):
-                        setattr(instr[1], instr[2], sweep_list[i])
-                    sleep(3 * self.tconst)
-
-                    vna.set_output('ON')
-                    sleep(vna_sleep)
+                    io.set_all([(instr[1], instr[2], sweep_list[i])
+                                for instr, sweep_list in zip(list(sweep_controls.values()), sweep_lists)],
+                               labels=['set:' + key for key in sweep_controls])
+                    self.settle(point_settler, 3 * self.tconst, label=(i, 0))
+
+                    with self.time_op('vna output'):
+                        vna.set_output('ON')   # arms a new sweep, readouts below share one transfer
+                    sweep_time = vna.acquire_sweep(timeout=self._vna_sweep_timeout)
+                    vna_sweep_time += sweep_time
+                    num_vna_sweeps += 1
+                    if self.__timer is not None:
+                        self.__timer.add_vna_sweep(sweep_time, *self.vna_sweep_config())
+
+                    # vna readouts are method calls, the others are attributes
+                    ops = []
+                    for key, instr in readouts.items():
+                        if 'vna' in key:
+                            ops.append((instr[0], getattr(instr[0], instr[1])))
+                        else:
+                            ops.append((instr[0], lambda instr=instr: getattr(instr[0], instr[1])))
+                    results = io.run(ops, labels=['read:' + key for key in readouts])
 
                     vna_arr = []
                     lockin_arr = []
-                    for key, instr in readouts.items():
+                    vna_data = {}
+                    for key, data in zip(readouts.keys(), results):
                         if 'vna' in key:
-                            data = getattr(instr[0], instr[1])()
                             vna_arr.append([data])
+                            vna_data[key] = data
                         else:
-                            data = getattr(instr[0], instr[1])
                             lockin_arr.append(data)
 
+                    if savedata and traces is not None:
+                        # one row per sweep, no per-frequency-point rows
+                        freq = vna_data['vna_freq'] if 'vna_freq' in vna_data else vna.read_data_freq()
+                        with self.time_op('db write'):
+                            traces.write(i, 0, freq, [vna_data[key] for key in traces.trace_keys], lockin_arr)
+                        continue
+
                     lockin_arr = list(lockin_arr)
                     lockin_arr = np.array(lockin_arr).transpose()
                     vna_arr = np.array(vna_arr).transpose()
@@ -541,17 +807,19 @@ class experiment():
                                 counter += 1
                                 # write data into sql_db
                                 if savedata:
-                                    sqldb.sql_sweep_write('table_data', tuple(sub_arr))
+                                    with self.time_op('db write'):
+                                        writer.write(sub_arr)
 
                     else:
                         for j in tqdm(range(len(list(vna_arr))), ncols = 100, desc = progress_step):
                             v = vna_arr[j]
                             for k in range(len(v)):
-                                sub_arr = [counter, i, lockin_arr[0], lockin_arr[1]] + v[k].tolist()
+                                sub_arr = [counter, i] + list(lockin_arr) + v[k].tolist()
                                 counter += 1   
                                 # write data into sql_db
                                 if savedata:
-                                    sqldb.sql_sweep_write('table_data', tuple(sub_arr))
+                                    with self.time_op('db write'):
+                                        writer.write(sub_arr)
                     
                     counter = counter
 
@@ -559,10 +827,19 @@ class experiment():
                 print ('KeyboardInterrupt exception is caught / data aqcuisiotion is stopped by user')
 
             finally:
+                vna.release_single_sweep()
+                self.release_list_sweeps(sweep_controls)
+                self.close_io_executor(io)
+                self.close_settlers((point_settler, ramp_settler), savedata)
                 if savedata:
+                    self.close_sqlwriter(writer)
                     sqldb.sql_close()
                     print('closed db')
 
+            fixed_sleep_time = vna_sleep * num_vna_sweeps
+            print(f'vna sweeps took {vna_sweep_time:.1f} s, fixed sleeps would have taken '
+                  f'{fixed_sleep_time:.1f} s (saved {fixed_sleep_time - vna_sweep_time:.1f} s)')
+
             if not lockin_type:
                 for i in range(len(rem_keys)):
                     self.add_read_instr(rem_keys[i], vals[i])
@@ -591,46 +868,184 @@ class experiment():
         num_sweep_points = self.__sweep.get('num points')
         num_step_points  = self.__step.get('num points')
 
-        if lockin_type and not vna_type:
-            # run experiment without VNA either 1D or 2D
-            self.noVNA_run_main(exp_n, exp_t, num_sweep_points, num_step_points, savedata)
+        predicted, sigma = self.predict_run_time(exp_t, vna_type, lockin_type, savedata)
+        self.__timer = RunTimer()
 
+        try:
+            for poller in self.__pollers:
+                poller.start()
 
-        elif vna_type and exp_t != 'VNAonly':
-            # run experiment with VNA
-            self.vna_run_main(exp_n, exp_t, num_sweep_points, lockin_type, savedata)
-        
-        elif exp_type == 'VNAonly':
-            self.VNA_run_only(exp_n, exp_t, savedata)
+            if lockin_type and not vna_type:
+                # run experiment without VNA either 1D or 2D
+                self.noVNA_run_main(exp_n, exp_t, num_sweep_points, num_step_points, savedata)
 
-        vna.set_output('OFF')
+
+            elif vna_type and exp_t != 'VNAonly':
+                # run experiment with VNA
+                self.vna_run_main(exp_n, exp_t, num_sweep_points, lockin_type, savedata)
             
-    def estimate_run_time(self, exp_type='1D', vna_type = False):
-        vna_controls    = {key: self.__vnas.get(key) for key in self.__vnas.keys()}
+            elif exp_type == 'VNAonly':
+                self.VNA_run_only(exp_n, exp_t, savedata)
 
-        if exp_type=='1D' and not vna_type:
-            self.step_params()
-            num_sweep_points = self.__sweep.get('num points')
-            num_step_points  = self.__step.get('num points')
-            exp_time_sec = (3 * self.tconst * num_sweep_points * num_step_points + (4 + 2) * (num_step_points - 1)) * 1.2
-        if exp_type=='1D' and vna_type:
-            steps = self.step_params()
-            num_sweep_points = self.__sweep.get('num points')
-            num_step_points  = self.__step.get('num points')
-            vna_sweep_points = vna_controls.get('sweep_pts')[0][0]
-            loop_times = 5.5
-            num_sweep_points = self.__sweep.get('num points')
-            exp_time_sec = (num_sweep_points*loop_times) + (vna_sweep_points*loop_times)/10
-
-        # factor 1.2 is empirical (due to some execution time of the code)
-        if exp_time_sec > 3600:
-            exp_time = [round(exp_time_sec/3600, 1), 'hours']
-        elif exp_time_sec > 60:
-            exp_time = [round(exp_time_sec/60, 1), 'mins']
+            vna.set_output('OFF')
+
+        finally:
+            timer, self.__timer = self.__timer, None
+            for poller in self.__pollers:
+                poller.stop()
+        # aborted runs would feed truncated timings to the prediction, only complete ones count
+        self.finish_run_timer(timer, exp_n, exp_t, predicted, sigma, record=savedata)
+
+    def finish_run_timer(self, timer, exp_name, exp_type, predicted, sigma, record=True) -> float:
+        """
+        stores the operation timings of the run in the profile (if record) and prints predicted
+        vs actual time
+        """
+        actual = timer.elapsed()
+        timer.finish(len(timer.samples.get('settle point', [])))
+
+        if record:
+            profile = RunProfile(self._profile_path)
+            profile.record_timer(timer)
+            profile.record_run(exp_name, exp_type, predicted, sigma, actual)
+            profile.save()
+        print(f'run time {format_duration(actual)}, predicted {format_duration(predicted)} '
+              f'+/- {format_duration(2 * sigma)}')
+        return actual
+
+    def vna_sweep_config(self) -> tuple:
+        """
+        (sweep points, averages per trigger, IF bandwidth or None) of the vna controls
+        """
+        vna_controls = self.__vnas
+        points = self.get_vna_sweep_points()
+        averages = 1
+        if vna_controls.get('avg', [('OFF',)])[0][0] in ['ON', True]:
+            averages = int(vna_controls.get('num_avg', [(1,)])[0][0])
+        ifbw_keys = self.find_keys_with_val(vna_controls, 'set_ifbw')
+        ifbw = float(vna_controls[ifbw_keys[0]][0][0]) if ifbw_keys else None
+        segments = self.get_vna_segments()
+        if segments is not None and all(len(seg) > 3 and seg[3] for seg in segments):
+            # same total points / IFBW as the segments
+            ifbw = points / sum(seg[2] / seg[3] for seg in segments)
+        return points, averages, ifbw
+
+    def predict_run_time(self, exp_type='1D', vna_type=False, lockin_type=True, savedata=True) -> tuple:
+        """
+        predicts the run time from the operation timings of past runs (_profile_path),
+        operation counts follow the loops of noVNA_run_main / vna_run_main / VNA_run_only
+        :return: seconds, 1 sigma in seconds
+        """
+        profile = RunProfile(self._profile_path)
+        sweep_keys = [key for key in self.__sweep['variable'] if key in self.__ctrls]
+        step_keys = [key for key in self.__step['variable'] if key in self.__ctrls]
+        num_sweep = self.__sweep.get('num points')
+        num_step = self.__step.get('num points') if exp_type == '2D' else 1
+        settle_on = self.__settle is not None
+
+        def settle_term(op, count, max_wait):
+            # the fixed sleeps are exact, adaptive settling is capped at max_wait
+            if not settle_on:
+                return count, max_wait, 0.0, 1
+            count, mean, std, num = profile.term(op, count, default=max_wait)
+            return count, min(mean, max_wait), std, num
+
+        def batch(prefix, keys, instruments, count):
+            ops = [(prefix + key, bus_of(instruments[key][1 if prefix == 'set:' else 0])) for key in keys]
+            return profile.batch_term(ops, count, self._concurrent_io)
+
+        if exp_type == 'VNAonly':
+            readout_keys = [key for key in self.__reads if 'vna' in key]
+        elif not vna_type:
+            readout_keys = [key for key in self.__reads if 'vna' not in key]
+        elif lockin_type:
+            readout_keys = list(self.__reads)
         else:
-            exp_time = [round(exp_time_sec), 'sec']
-        
-        return f"experiment time is approx {exp_time[0]} {exp_time[1]}"
+            readout_keys = [key for key in self.__reads if 'vna' in key]
+
+        terms = []
+        if exp_type == 'VNAonly':
+            points, averages, ifbw = self.vna_sweep_config()
+            if self.__ctrls:
+                terms += [profile.term('vna output', 1), (1, 1.0, 0.0, 1)]
+            terms.append(profile.batch_term([('read:' + key, 'vna') for key in readout_keys], 1, False))
+            if savedata:
+                terms.append(profile.term('db write', 1 if self._vna_storage == 'blob' else points))
+
+        elif not vna_type:
+            num_points = num_sweep * num_step
+            if exp_type == '2D':
+                terms.append(batch('set:', step_keys, self.__ctrls, num_step))
+                terms += [profile.term('ramp:' + key, num_step) for key in sweep_keys]
+                terms.append(settle_term('settle ramp', num_step, 5))
+            terms.append(batch('set:', sweep_keys, self.__ctrls, num_points))
+            terms.append(settle_term('settle point', num_points, 3 * self.tconst))
+            terms.append(batch('read:', readout_keys, self.__reads, num_points))
+            if savedata:
+                terms.append(profile.term('db write', num_points))
+            terms.append(profile.term('overhead', num_points))
+
+        else:
+            if exp_type == '2D':
+                print('vna_run_main only runs 1D sweeps, the estimate is for num step points 1D sweeps')
+            num_points = num_sweep * num_step
+            points, averages, ifbw = self.vna_sweep_config()
+            terms += [profile.term('ramp:' + key, num_points) for key in sweep_keys]
+            terms.append(settle_term('settle ramp', num_points, 5))
+            terms.append(profile.term('vna reset', num_points))
+            terms.append(batch('set:', sweep_keys, self.__ctrls, num_points))
+            terms.append(settle_term('settle point', num_points, 3 * self.tconst))
+            terms.append(profile.term('vna output', num_points))
+            terms.append(profile.vna_term(num_points, points, averages, ifbw))
+            terms.append(batch('read:', readout_keys, self.__reads, num_points))
+            if savedata:
+                terms.append(profile.term('db write', num_points * (1 if self._vna_storage == 'blob' else points)))
+            terms.append(profile.term('overhead', num_points))
+
+        return combine(terms)
+
+    def estimate_run_time(self, exp_type='1D', vna_type = False, lockin_type = True):
+        if exp_type == '1D':
+            self.step_params()
+        exp_time_sec, sigma = self.predict_run_time(exp_type, vna_type, lockin_type)
+        return f"experiment time is approx {format_duration(exp_time_sec)} (+/- {format_duration(2 * sigma)})"
+
+    def run_queue(self, queue) -> list:
+        """
+        runs several experiments one after another (e.g. overnight), prints the predicted
+        end time before starting and predicted vs actual time of every run at the end
+        :param queue: list of dicts {'sweep': sweep_params kwargs, 'step': step_params kwargs (optional),
+                      'run': run kwargs}
+        """
+        def prepare(entry):
+            self.sweep_params(**entry['sweep'])
+            self.step_params(**entry.get('step', {}))
+            kwargs = dict(exp_type='1D', vna_type=True, lockin_type=True, savedata=True)
+            kwargs.update(entry['run'])
+            return kwargs
+
+        predictions = []
+        for entry in queue:
+            kwargs = prepare(entry)
+            predictions.append(self.predict_run_time(kwargs['exp_type'], kwargs['vna_type'],
+                                                     kwargs['lockin_type'], kwargs['savedata']))
+        total = sum(p[0] for p in predictions)
+        total_sigma = np.sqrt(sum(p[1]**2 for p in predictions))
+        print(f'{len(queue)} runs, predicted {format_duration(total)} +/- {format_duration(2 * total_sigma)}, '
+              f"done around {(datetime.now() + timedelta(seconds=total)).strftime('%H:%M')}")
+
+        results = []
+        for entry, (predicted, sigma) in zip(queue, predictions):
+            kwargs = prepare(entry)
+            t0 = perf_counter()
+            self.run(**kwargs)
+            actual = perf_counter() - t0
+            results.append([kwargs.get('exp_name', 'sweep_0'), kwargs['exp_type'],
+                            format_duration(predicted) + ' +/- ' + format_duration(2 * sigma),
+                            format_duration(actual), f'{100 * (actual - predicted) / max(predicted, 1e-9):+.0f} %'])
+
+        print(tabulate(results, headers=['run', 'type', 'predicted', 'actual', 'error']))
+        return results
 
 if __name__ == "__main__":
 
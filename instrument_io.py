@@ -0,0 +1,148 @@
+"""
+Concurrent instrument I/O grouped by physical bus.
+
+Instruments on the same interface (GPIB board, serial port, USB device) must
+talk one at a time, instruments on different interfaces don't have to.
+BusExecutor groups a batch of operations by bus, runs the groups in a
+thread pool and keeps the operations inside each group in their original
+order. Results come back in the order the operations were given, so a
+batch behaves like the plain serial loop, only faster when the instruments
+are spread over GPIB0 / GPIB1 / COM ports / USB DLLs.
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def bus_of(instrument) -> str:
+    """
+    Returns the name of the interface an instrument sits on, e.g. 'GPIB0', 'GPIB1', 'ASRL3::INSTR'.
+    GPIB instruments share their board, everything else (serial, USB, DLL devices) gets its own bus.
+    """
+    address = None
+    for path in [('adapter', 'connection', 'resource_name'), ('adapter', 'resource_name'),
+                 ('address',), ('resource_name',)]:
+        obj = instrument
+        try:
+            for name in path:
+                obj = getattr(obj, name)
+        except AttributeError:
+            continue
+        if isinstance(obj, str) and obj:
+            address = obj
+            break
+
+    if address is None:
+        return 'instr%d' % id(instrument)
+
+    address = address.upper()
+    match = re.match(r'(GPIB\d*)::', address)
+    if match:
+        board = match.group(1)
+        return 'GPIB0' if board == 'GPIB' else board
+    return address
+
+
+class BusExecutor():
+
+    def __init__(self, max_workers=8, bus_map=None, concurrent=True):
+        """
+        :param max_workers: threads in the pool, at most one bus is served per thread
+        :param bus_map: optional {instrument: bus name} overriding bus_of
+        :param concurrent: False runs every batch serially in the calling thread
+        """
+        self.max_workers = max_workers
+        self.bus_map = {} if bus_map is None else {id(k): v for k, v in bus_map.items()}
+        self.concurrent = concurrent
+        self._pool = None
+        self.reset_stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def reset_stats(self):
+        self.num_batches = 0
+        self.serial_time = 0.0   # sum of the individual operation times
+        self.wall_time = 0.0     # time the batches actually took
+        self.op_times = {}       # {label: [seconds, ...]} for operations run with labels
+
+    def get_bus(self, instrument) -> str:
+        return self.bus_map.get(id(instrument)) or bus_of(instrument)
+
+    def run(self, ops, labels=None) -> list:
+        """
+        Runs a batch of operations and returns their results in order
+        :param ops: list of (instrument, callable without arguments)
+        :param labels: optional name per operation, the duration of each operation is kept in op_times
+        :return: list of results
+        """
+        t0 = time.perf_counter()
+        results = [None] * len(ops)
+        durations = [None] * len(ops)
+        groups = {}
+        for index, (instrument, func) in enumerate(ops):
+            groups.setdefault(self.get_bus(instrument), []).append((index, func))
+
+        if not self.concurrent or len(groups) < 2:
+            busy = self._run_group(list(enumerate(func for _, func in ops)), results, durations)
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bus')
+            futures = [self._pool.submit(self._run_group, group, results, durations) for group in groups.values()]
+            # result() re-raises the first exception of a group in the calling thread
+            busy = sum(future.result() for future in futures)
+
+        self.num_batches += 1
+        self.serial_time += busy
+        self.wall_time += time.perf_counter() - t0
+        if labels is not None:
+            for label, duration in zip(labels, durations):
+                self.op_times.setdefault(label, []).append(duration)
+        return results
+
+    def _run_group(self, group, results, durations) -> float:
+        busy = 0.0
+        for index, func in group:
+            t0 = time.perf_counter()
+            results[index] = func()
+            durations[index] = time.perf_counter() - t0
+            busy += durations[index]
+        return busy
+
+    def set_all(self, controls, labels=None) -> None:
+        """
+        :param controls: list of (instrument, attribute, value), same as setattr(instrument, attribute, value)
+        """
+        self.run([(instr, lambda instr=instr, attr=attr, val=val: setattr(instr, attr, val))
+                  for instr, attr, val in controls], labels)
+
+    def get_all(self, readouts, labels=None) -> list:
+        """
+        :param readouts: list of (instrument, attribute), same as getattr(instrument, attribute)
+        :return: list of values
+        """
+        return self.run([(instr, lambda instr=instr, attr=attr: getattr(instr, attr))
+                         for instr, attr in readouts], labels)
+
+    def get_gain_per_batch(self) -> float:
+        """ mean time per batch saved against running the same operations one after another """
+        if self.num_batches == 0:
+            return 0.0
+        return (self.serial_time - self.wall_time) / self.num_batches
+
+    def report(self) -> str:
+        if self.num_batches == 0:
+            return 'concurrent io: no operations'
+        wall = 1e3 * self.wall_time / self.num_batches
+        serial = 1e3 * self.serial_time / self.num_batches
+        return (f'concurrent io: {wall:.1f} ms per batch vs {serial:.1f} ms serial '
+                f'(gained {1e3 * self.get_gain_per_batch():.1f} ms over {self.num_batches} batches)')
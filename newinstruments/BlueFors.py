@@ -1,17 +1,269 @@
+import io
 import os
-import pandas as pd
+import json
+import hashlib
+import time
+import threading
 import numpy as np
-from datetime import datetime
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+# day folders and log file names, e.g. 23-05-17/CH6 T 23-05-17.log, 23-05-17/maxigauge 23-05-17.log
+FOLDER_FORMAT = '%y-%m-%d'
+
+
+# thermometer channels and maxigauges of the status strings
+STATUS_CHANNELS = [1, 2, 5, 6]
+GAUGES = [1, 2, 3, 4, 5, 6]
+
+# FridgePoller quantities: ('T', thermometer channel) or ('P', maxigauge), standard BlueFors layout
+TELEMETRY = {
+    'T_50K': ('T', 1),
+    'T_4K': ('T', 2),
+    'T_still': ('T', 5),
+    'T_mxc': ('T', 6),
+    'P_ovc': ('P', 1),
+    'P_still': ('P', 2),
+    'P_condense': ('P', 3),
+    'P_backing': ('P', 4),
+    'P_tank': ('P', 5),
+    'P_service': ('P', 6)
+}
+
+
+class FridgeSnapshot(NamedTuple):
+    time: datetime              # time of the last CH1 line (None if unreadable)
+    folder_name: str            # day folder the values come from
+    temperatures: dict          # {channel: K}, nan if unreadable
+    temperature_times: dict     # {channel: time of its last line} (None if unreadable)
+    pressures: list             # P1 ... P6 in mbar, nan if unreadable
+    pressure_time: datetime     # time of the last maxigauge line
+    read_at: float              # time.monotonic() when the logs were read
+
+    def temperature(self, channel: int) -> float:
+        return self.temperatures.get(channel, np.nan)
+
+    def temperature_time(self, channel: int) -> datetime:
+        return self.temperature_times.get(channel)
+
+    def pressure(self, channel: int) -> float:
+        return self.pressures[channel - 1]
+
+
+def temperature_log(channel: int) -> str:
+    return 'CH%d T' % channel
+
+
+def parse_temperature_line(line: str) -> tuple:
+    """
+    ' 17-05-23,14:03:12,1.234560E-02' -> (datetime, temperature)
+    """
+    date, time, value = line.split(',')[:3]
+    return datetime.strptime(date.strip() + ' ' + time, '%d-%m-%y %H:%M:%S'), float(value)
+
+
+def parse_pressure_line(line: str) -> tuple:
+    """
+    maxigauge line (date, time, then name, void, status, pressure, void, void per gauge) ->
+    (datetime, [pressure of CH1 ... CH6])
+    """
+    fields = line.split(',')
+    when = datetime.strptime(fields[0].strip() + ' ' + fields[1], '%d-%m-%y %H:%M:%S')
+    return when, [float(fields[5 + 6 * k]) for k in range(6)]
+
+
+class LogTail():
+
+    def __init__(self, file_path, tail_bytes=4096):
+        """
+        Follows the end of one log file: remembers the read offset, only the bytes appended since
+        the last call are read. The first read only looks at the last tail_bytes of the file.
+        """
+        self.file_path = file_path
+        self.tail_bytes = tail_bytes
+        self.offset = None
+        self.last_line = None
+        self._rest = b''
+
+    def read_new(self) -> list:
+        """
+        :return: complete lines appended since the last call (the last line(s) of the file on the first call)
+        """
+        with open(self.file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.offset is None or size < self.offset:
+                # first read (or file rewritten): start close to the end, drop the cut line
+                self.offset = max(size - self.tail_bytes, 0)
+                self._rest = b''
+                skip_first = self.offset > 0
+            else:
+                skip_first = False
+            if size == self.offset:
+                return []
+            f.seek(self.offset)
+            new = f.read(size - self.offset)
+        self.offset += len(new)
+
+        lines = (self._rest + new).split(b'\n')
+        self._rest = lines.pop()
+        if skip_first and lines:
+            lines = lines[1:]
+        lines = [line.decode().rstrip('\r') for line in lines if line.strip()]
+        if lines:
+            self.last_line = lines[-1]
+        return lines
+
+
+def parse_log_block(data: bytes, log_name: str) -> tuple:
+    """
+    Parses complete lines of a temperature ('CH6 T') or maxigauge log in one go
+    :return: timestamps (int64 seconds, local time as written in the log), values (n, 1) or (n, 6)
+    """
+    if log_name == 'maxigauge':
+        columns = [0, 1] + [5 + 6 * k for k in range(6)]
+    else:
+        columns = [0, 1, 2]
+    df = pd.read_csv(io.BytesIO(data), delimiter=',', header=None, usecols=columns, dtype={0: str, 1: str})
+    times = pd.to_datetime(df[0].str.strip() + ' ' + df[1], format='%d-%m-%y %H:%M:%S')
+    values = df[columns[2:]].to_numpy(dtype=np.float64)
+    return times.to_numpy().astype('datetime64[s]').astype(np.int64), values
+
+
+def to_datetime64(when) -> np.datetime64:
+    # datetime, np.datetime64 or an ISO string ('2023-05-17 14:00')
+    return np.datetime64(when, 's')
+
+
+class LogHistory():
+
+    def __init__(self, folder_path, cache_path=None):
+        """
+        Binary cache of the BlueFors logs for time range queries. Per log ('CH6 T', 'maxigauge')
+        there is a sorted int64 timestamp file, a float64 value file (1 or 6 columns) and a json
+        with the byte offset read in each day file. update() only parses what was appended since.
+        :param cache_path: root directory of the caches (not inside folder_path, that one only
+                           holds day folders), ~/.bluefors_history by default. Every log folder
+                           gets its own subdirectory named by a hash of its resolved path.
+        """
+        self.folder_path = folder_path
+        if cache_path is None:
+            cache_path = os.path.join(os.path.expanduser('~'), '.bluefors_history')
+        self.cache_root = cache_path
+        folder = os.path.realpath(folder_path)
+        self.cache_path = os.path.join(cache_path, hashlib.sha1(folder.encode()).hexdigest()[:16])
+        os.makedirs(self.cache_path, exist_ok=True)
+        with open(os.path.join(self.cache_path, 'folder_path.txt'), 'w') as f:
+            f.write(folder)
+
+    def get_paths(self, log_name) -> tuple:
+        base = os.path.join(self.cache_path, log_name.replace(' ', '_'))
+        return base + '.times', base + '.values', base + '.json'
+
+    def load_state(self, log_name) -> dict:
+        times_path, values_path, state_path = self.get_paths(log_name)
+        state = {'days': {}, 'num': 0, 'columns': 6 if log_name == 'maxigauge' else 1}
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+        # drop whatever an interrupted update wrote after the last saved state
+        for path, size in [(times_path, 8 * state['num']), (values_path, 8 * state['num'] * state['columns'])]:
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+        return state
+
+    def update(self, log_name) -> int:
+        """
+        Appends the lines written since the last update to the cache. Day folders before the last
+        one read are taken as complete.
+        :return: number of new samples
+        """
+        times_path, values_path, state_path = self.get_paths(log_name)
+        state = self.load_state(log_name)
+        days = []
+        for name in os.listdir(self.folder_path):
+            try:
+                days.append((datetime.strptime(name, FOLDER_FORMAT), name))
+            except ValueError:
+                continue
+        last_day = max(state['days'], key=lambda d: datetime.strptime(d, FOLDER_FORMAT), default=None)
+        if last_day is not None:
+            days = [day for day in days if day[0] >= datetime.strptime(last_day, FOLDER_FORMAT)]
+
+        num_new = 0
+        for _, name in sorted(days):
+            file_path = os.path.join(self.folder_path, name, log_name + ' ' + name + '.log')
+            if not os.path.exists(file_path):
+                continue
+            offset = state['days'].get(name, 0)
+            with open(file_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                continue
+            times, values = parse_log_block(data[:end], log_name)
+            with open(times_path, 'ab') as f:
+                times.tofile(f)
+            with open(values_path, 'ab') as f:
+                np.ascontiguousarray(values).tofile(f)
+            state['days'][name] = offset + end
+            state['num'] += len(times)
+            num_new += len(times)
+
+        if num_new:
+            tmp = state_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, state_path)
+        return num_new
+
+    def query(self, log_name, start=None, stop=None, update=True) -> tuple:
+        """
+        Samples with start <= time < stop (binary search on the memory mapped timestamps)
+        :return: times (datetime64[s] array), values (n,) for temperatures or (n, 6) for the maxigauge
+        """
+        if update:
+            self.update(log_name)
+        times_path, values_path, _ = self.get_paths(log_name)
+        state = self.load_state(log_name)
+        columns = state['columns']
+        if state['num'] == 0:
+            return np.zeros(0, dtype='datetime64[s]'), np.zeros((0, columns) if columns > 1 else 0)
+
+        times = np.memmap(times_path, dtype=np.int64, mode='r', shape=(state['num'],))
+        i = 0 if start is None else np.searchsorted(times, to_datetime64(start).astype(np.int64), 'left')
+        j = len(times) if stop is None else np.searchsorted(times, to_datetime64(stop).astype(np.int64), 'left')
+        values = np.memmap(values_path, dtype=np.float64, mode='r', shape=(state['num'], columns))
+        # copies, so that the files are not held open (they are appended to on the next update)
+        selected_times = np.array(times[i:j]).view('datetime64[s]')
+        selected_values = np.array(values[i:j])
+        del times, values
+        return selected_times, selected_values[:, 0] if columns == 1 else selected_values
+
 
 class BlueFors():
 
-    def __init__(self):
+    # seconds a snapshot is reused for (the logs are written about once per minute)
+    snapshot_ttl = 1.0
+
+    def __init__(self, folder_path=r'C:\Users\LHQS3\Documents\BlueForsLogs\logs'):
         
-        self.folder_path = r'C:\Users\LHQS3\Documents\BlueForsLogs\logs'
+        self.folder_path = folder_path
         current_date_time = datetime.now()
         self.date = current_date_time.date().strftime(r"%y-%m-%d")
         self.time = current_date_time.time().strftime(r'%H:%M:%S')
         self.folder_name = os.path.basename(self.get_latest_subdir())
+        self._tails = {}       # log name ('CH6 T', 'maxigauge'): LogTail of the current day file
+        self._history = None   # LogHistory, created by the first time range query
+        self._snapshot = None
+
+    def get_history(self, cache_path=None) -> LogHistory:
+        if self._history is None or (cache_path is not None and cache_path != self._history.cache_root):
+            self._history = LogHistory(self.folder_path, cache_path)
+        return self._history
 
     def get_latest_subdir(self):
         b = self.folder_path
@@ -22,117 +274,139 @@ class BlueFors():
         latest_subdir = max(all_subdirs, key=os.path.getmtime)
         return latest_subdir
 
-    #def get_subdirs_multiple(self, date1, date2):
-    #    b = self.folder_path
-    #    d1 = int(date1[6:])
-    #    d2 = int(date2[6:])
-    #    num_folders = d2-d1
-    #    subdirs_list =[]
-    #    for i in range(num_folders):
-    #        subdirs_list[i] = f'{b}\{date1[:5]}-{int(date1[6:])+i}'
-    #        return subdirs_list
+    def get_current_folder(self) -> str:
+        """
+        Name of the latest day folder. Only checks for the folders of the days after the last one
+        found (day rollover), the full directory scan is only done when folder names are not dates.
+        """
+        try:
+            day = datetime.strptime(self.folder_name, FOLDER_FORMAT).date()
+        except (TypeError, ValueError):
+            self.folder_name = os.path.basename(self.get_latest_subdir())
+            return self.folder_name
+        today = datetime.now().date()
+        while day < today:
+            day += timedelta(days=1)
+            name = day.strftime(FOLDER_FORMAT)
+            if os.path.isdir(os.path.join(self.folder_path, name)):
+                self.folder_name = name
+        return self.folder_name
 
-    
-    def get_last_measured_time(self):
-        self.folder_name = os.path.basename(self.get_latest_subdir())
-        file_path = os.path.join(self.folder_path, self.folder_name, 'CH1 T '+self.folder_name+'.log')
+    def get_log_path(self, log_name, folder_name=None) -> str:
+        folder_name = self.get_current_folder() if folder_name is None else folder_name
+        return os.path.join(self.folder_path, folder_name, log_name + ' ' + folder_name + '.log')
+
+    def get_last_line(self, log_name) -> str:
+        """
+        Last line of a log of the current day, reading only what was appended since the last call.
+        After midnight the previous day's log is used until the new one exists.
+        """
+        file_path = self.get_log_path(log_name)
+        tail = self._tails.get(log_name)
+        if tail is None or (tail.file_path != file_path and os.path.exists(file_path)):
+            tail = LogTail(file_path)
+            self._tails[log_name] = tail
+        tail.read_new()
+        if tail.last_line is None:
+            raise IndexError('no data in ' + tail.file_path)
+        return tail.last_line
+
+    def get_subdirs_multiple(self, date1, date2) -> list:
+        """
+        day folders from date1 to date2 (included), dates as 'yy-mm-dd' folder names
+        """
+        d1 = datetime.strptime(date1, FOLDER_FORMAT)
+        d2 = datetime.strptime(date2, FOLDER_FORMAT)
+        subdirs_list = []
+        for i in range((d2 - d1).days + 1):
+            subdir = os.path.join(self.folder_path, (d1 + timedelta(days=i)).strftime(FOLDER_FORMAT))
+            if os.path.isdir(subdir):
+                subdirs_list.append(subdir)
+        return subdirs_list
+
+    def read_temperature(self, channel: int) -> tuple:
+        """
+        :return: time, temperature of the last line of the channel log ((None, nan) if unreadable)
+        """
         try:
-            df = pd.read_csv(file_path,
-                            delimiter = ',',
-                            names     = ['date', 'time', 'temperature'],
-                            header    = None
-            )
-            
-            # There is a space before the day
-            df.index = pd.to_datetime(df['date']+'-'+df['time'], format=' %d-%m-%y-%H:%M:%S')
-            return df.iloc[-1]['time']
+            return parse_temperature_line(self.get_last_line(temperature_log(channel)))
         except (PermissionError, OSError) as err:
-            self.log.warn('Cannot access log file: {}. Returning np.nan instead of temperature value.'.format(err))
-            return np.nan
-        except IndexError as err:
-            self.log.warn('Cannot parse log file: {}. Returning np.nan instead of temperature value.'.format(err))
-            return np.nan
-    
-    #def get_temperature_in_timeframe(self, date1, date2, time1, time2, channel: int) -> tuple:
-    #    self.folder_name = os.path.basename(self.get_latest_subdir())
-    #    file_path = os.path.join(self.folder_path, self.folder_name, 'CH1 T '+self.folder_name+'.log')
-    #    try:
-    #        df = pd.read_csv(file_path,
-    #                        delimiter = ',',
-    #                        names     = ['date', 'time', 'temperature'],
-    #                        header    = None
-    #        )
-    #        
-    #        # There is a space before the day
-    #        df.index = pd.to_datetime(df['date']+'-'+df['time'], format=' %d-%m-%y-%H:%M:%S')
-    #        return df.iloc[-1]['time']
-    #    except (PermissionError, OSError) as err:
-    #        self.log.warn('Cannot access log file: {}. Returning np.nan instead of temperature value.'.format(err))
-    #        return np.nan
-    #    except IndexError as err:
-    #        self.log.warn('Cannot parse log file: {}. Returning np.nan instead of temperature value.'.format(err))
-    #        return np.nan
+            print('Cannot access log file: {}. Returning np.nan instead of temperature value.'.format(err))
+        except (IndexError, ValueError) as err:
+            print('Cannot parse log file: {}. Returning np.nan instead of temperature value.'.format(err))
+        return None, np.nan
 
-
-    def get_temperature(self, channel: int) -> float:
-        self.folder_name = os.path.basename(self.get_latest_subdir())
-        file_path = os.path.join(self.folder_path, self.folder_name, 'CH'+str(channel)+' T '+self.folder_name+'.log')
+    def read_pressures(self) -> tuple:
+        """
+        :return: time, [P1 ... P6] of the last maxigauge line ((None, nans) if unreadable)
+        """
         try:
-            df = pd.read_csv(file_path,
-                            delimiter = ',',
-                            names     = ['date', 'time', 'temperature'],
-                            header    = None
-            )
-            
-            # There is a space before the day
-            df.index = pd.to_datetime(df['date']+'-'+df['time'], format=' %d-%m-%y-%H:%M:%S')
-            return df.iloc[-1]['temperature']
+            return parse_pressure_line(self.get_last_line('maxigauge'))
         except (PermissionError, OSError) as err:
-            self.log.warn('Cannot access log file: {}. Returning np.nan instead of temperature value.'.format(err))
-            return np.nan
-        except IndexError as err:
-            self.log.warn('Cannot parse log file: {}. Returning np.nan instead of temperature value.'.format(err))
-            return np.nan
+            print('Cannot access log file: {}. Returning np.nan instead of the pressure value.'.format(err))
+        except (IndexError, ValueError) as err:
+            print('Cannot parse log file: {}. Returning np.nan instead of the pressure value.'.format(err))
+        return None, [np.nan] * len(GAUGES)
 
+    def snapshot(self, max_age=None) -> FridgeSnapshot:
+        """
+        All status temperatures, the pressures and the time, each log read once (only the lines
+        appended since the last read). Reused if it is not older than max_age seconds
+        (snapshot_ttl by default).
+        """
+        max_age = self.snapshot_ttl if max_age is None else max_age
+        if self._snapshot is not None and time.monotonic() - self._snapshot.read_at <= max_age:
+            return self._snapshot
 
+        self.get_current_folder()
+        temperatures = {}
+        temperature_times = {}
+        for channel in STATUS_CHANNELS:
+            temperature_times[channel], temperatures[channel] = self.read_temperature(channel)
+        pressure_time, pressures = self.read_pressures()
+        self._snapshot = FridgeSnapshot(temperature_times.get(1), self.folder_name, temperatures,
+                                        temperature_times, pressures, pressure_time, time.monotonic())
+        return self._snapshot
+
+    def get_last_measured_time(self):
+        when, _ = self.read_temperature(1)
+        return np.nan if when is None else when.strftime('%H:%M:%S')
     
+    def get_temperature_in_timeframe(self, channel: int, start=None, stop=None) -> tuple:
+        """
+        temperature history across day folders, from the binary cache (see LogHistory)
+        :param start, stop: datetime, np.datetime64 or ISO string, None for no limit
+        :return: times (datetime64[s]), temperatures in K
+        """
+        return self.get_history().query(temperature_log(channel), start, stop)
+
+    def get_pressure_in_timeframe(self, channel: int, start=None, stop=None) -> tuple:
+        """
+        maxigauge history of one gauge (1 - 6), see get_temperature_in_timeframe
+        """
+        times, values = self.get_history().query('maxigauge', start, stop)
+        return times, values[:, channel - 1]
+
+    def get_temperature(self, channel: int) -> float:
+        return self.read_temperature(channel)[1]
+
     def get_pressure(self, channel: int) -> float:
-        self.folder_name = os.path.basename(self.get_latest_subdir())
-        file_path = os.path.join(self.folder_path, self.folder_name, 'maxigauge '+self.folder_name+'.log')
-        try:
-            df = pd.read_csv(file_path,
-                            delimiter=',',
-                            names=['date', 'time',
-                                    'ch1_name', 'ch1_void1', 'ch1_status', 'ch1_pressure', 'ch1_void2', 'ch1_void3',
-                                    'ch2_name', 'ch2_void1', 'ch2_status', 'ch2_pressure', 'ch2_void2', 'ch2_void3',
-                                    'ch3_name', 'ch3_void1', 'ch3_status', 'ch3_pressure', 'ch3_void2', 'ch3_void3',
-                                    'ch4_name', 'ch4_void1', 'ch4_status', 'ch4_pressure', 'ch4_void2', 'ch4_void3',
-                                    'ch5_name', 'ch5_void1', 'ch5_status', 'ch5_pressure', 'ch5_void2', 'ch5_void3',
-                                    'ch6_name', 'ch6_void1', 'ch6_status', 'ch6_pressure', 'ch6_void2', 'ch6_void3',
-                                    'void'],
-                            header=None)
-
-            df.index = pd.to_datetime(df['date']+'-'+df['time'], format='%d-%m-%y-%H:%M:%S')
-
-            return df.iloc[-1]['ch'+str(channel)+'_pressure']
-        except (PermissionError, OSError) as err:
-            self.log.warn('Cannot access log file: {}. Returning np.nan instead of the pressure value.'.format(err))
-            return np.nan
-        except IndexError as err:
-            self.log.warn('Cannot parse log file: {}. Returning np.nan instead of the pressure value.'.format(err))
-            return np.nan
+        return self.read_pressures()[1][channel - 1]
 
-    def get_time_stamp(self):
-        self.folder_name = os.path.basename(self.get_latest_subdir())
-        output_text = f'<strong>TIME</strong> \n {self.folder_name} \n {self.get_last_measured_time()} \n'
+    def get_time_stamp(self, snapshot=None):
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        last_time = np.nan if snapshot.time is None else snapshot.time.strftime('%H:%M:%S')
+        output_text = f'<strong>TIME</strong> \n {snapshot.folder_name} \n {last_time} \n'
         return output_text
 
-    def get_temperature_status(self):
+    def get_temperature_status(self, snapshot=None):
+        snapshot = self.snapshot() if snapshot is None else snapshot
         output_text = '<strong>TEMPERATURE</strong> \n'
-        channels = [1, 2, 5, 6]
-        for ch in channels:
-            temperature = self.get_temperature(ch)
-            if temperature > 100:
+        for ch in STATUS_CHANNELS:
+            temperature = snapshot.temperature(ch)
+            if np.isnan(temperature):
+                output_text = output_text + f' CH{ch}  nan \n'
+            elif temperature > 100:
                 output_text = output_text + f' CH{ch}  {round(temperature)} K \n'
             elif temperature > 10:
                 output_text = output_text + f' CH{ch}  {round(temperature, 1)} K \n'
@@ -142,12 +416,14 @@ class BlueFors():
                 output_text = output_text + f' CH{ch}  {round(temperature * 1e3)} mK \n'
         return output_text
     
-    def get_pressure_status(self):
+    def get_pressure_status(self, snapshot=None):
+        snapshot = self.snapshot() if snapshot is None else snapshot
         output_text = '<strong>PRESSURE</strong> \n'
-        channels = [1, 2, 3, 4, 5, 6]
-        for ch in channels:
-            pressure = self.get_pressure(ch)
-            if abs(pressure) < 1:
+        for ch in GAUGES:
+            pressure = snapshot.pressure(ch)
+            if np.isnan(pressure):
+                output_text = output_text + f' P{ch}  nan \n'
+            elif abs(pressure) < 1:
                 output_text = output_text + f' P{ch}  {pressure:.2e} mbar \n'
             elif abs(pressure) < 10:
                 output_text = output_text + f' P{ch}  {round(pressure, 1)} mbar \n'
@@ -156,7 +432,88 @@ class BlueFors():
         return output_text
     
     def get_status_all(self):
-        return self.get_time_stamp() + '\n' + self.get_temperature_status() + '\n' + self.get_pressure_status()
+        snapshot = self.snapshot()
+        return (self.get_time_stamp(snapshot) + '\n' + self.get_temperature_status(snapshot) + '\n'
+                + self.get_pressure_status(snapshot))
+
+
+class FridgePoller():
+
+    def __init__(self, fridge: BlueFors, interval=10.0):
+        """
+        Follows the BlueFors logs in a background thread, every interval seconds a new snapshot
+        replaces `latest` (a single reference swap, readers never wait on the log files).
+        The TELEMETRY quantities are attributes, e.g. poller.T_mxc, with their sample age in
+        seconds as poller.T_mxc_age, so they can be experiment readouts:
+
+            readout_instr_dict['T_mxc'] = [poller, 'T_mxc', 'K']
+
+        :param fridge: BlueFors of the log folder, the poller reads with its own instance
+        """
+        self.fridge = BlueFors(fridge.folder_path)
+        self.interval = interval
+        self.latest = None
+        self.num_polls = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self.poll()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='FridgePoller', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def poll(self) -> None:
+        self.latest = self.fridge.snapshot(max_age=0)
+        self.num_polls += 1
+
+    def get(self, name) -> tuple:
+        """
+        :return: latest value of a TELEMETRY quantity, age of the logged sample in seconds
+        """
+        kind, channel = TELEMETRY[name]
+        snapshot = self.latest
+        if snapshot is None:
+            return np.nan, np.nan
+        if kind == 'T':
+            # the scanner logs the channels on their own cadence, each has its own last line
+            value, when = snapshot.temperature(channel), snapshot.temperature_time(channel)
+        else:
+            value, when = snapshot.pressure(channel), snapshot.pressure_time
+        age = np.nan if when is None else (datetime.now() - when).total_seconds()
+        return value, age
+
+    def __getattr__(self, name):
+        if name in TELEMETRY:
+            return self.get(name)[0]
+        if name.endswith('_age') and name[:-4] in TELEMETRY:
+            return self.get(name[:-4])[1]
+        raise AttributeError(name)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as err:
+                print('FridgePoller: {}'.format(err))
 
 
 if __name__ == '__main__':
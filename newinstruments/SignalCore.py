@@ -17,6 +17,7 @@ from ctypes import c_char_p, c_void_p, c_int, c_ulonglong, c_float, c_ubyte, c_c
     Structure
 
 from time import sleep
+import numpy as np
 
 class ListMode(Structure):
     """Structure represnting the list mode.
@@ -238,7 +239,7 @@ class SignalCore():
             print(self.name + self.address + ' : Failed to set list cycle count, please check the device status!')
         return done
 
-    def set_list_cycle_count(self, acknowledge = True):
+    def list_soft_trigger(self, acknowledge = True):
         """ triggers the device when it is configured for list mode and soft trigger is selected as the trigger source.
         """
         done = self._dll.sc5511a_list_soft_trigger(self._handle)
@@ -289,6 +290,10 @@ class SignalCore():
             print(self.name + self.address + ' : Failed to set RF2 standby mode, please check the device status!')
         return done
 
+    def list_mode_running(self):
+        """ True while the device runs a list / sweep (operate status from get_device_status) """
+        return bool(self.get_device_status(acknowledge=False).operate_status.list_mode_running)
+
     def set_list_mode(self, sss_mode=1, sweep_dir=0, tri_waveform=0, hw_trigger=0, step_on_hw_trig=0,
                         return_to_start=0, trig_out_enable=1, trig_out_on_cycle=0):
         """ Configures list mode
@@ -313,14 +318,15 @@ class SignalCore():
             print(self.name + self.address + ' : Failed to set RF2 standby mode, please check the device status!')
         return done
 
-    def get_device_status(self):
+    def get_device_status(self, acknowledge = True):
         """
         """
         ds = DeviceStatus()
 
         done = self._dll.sc5511a_get_device_status(self._handle, ds)
         if done == 0:
-            print(self.name + self.address + ' : Successfully obtained device status')
+            if acknowledge:
+                print(self.name + self.address + ' : Successfully obtained device status')
         else:
             print(self.name + self.address + ' : Failed to get device status, please check the device status!')
         return ds
@@ -366,6 +372,9 @@ class SignalCore():
         self._dll.sc5511a_list_cycle_count.argtypes = [c_void_p, c_uint]
         self._dll.sc5511a_list_cycle_count.restype = c_int
 
+        self._dll.sc5511a_list_soft_trigger.argtypes = [c_void_p]
+        self._dll.sc5511a_list_soft_trigger.restype = c_int
+
         self._dll.sc5511a_set_auto_level_disable.argtypes = [c_void_p, c_ubyte]
         self._dll.sc5511a_set_auto_level_disable.restype = c_int
 
@@ -390,6 +399,110 @@ class SignalCore():
         self._dll.sc5511a_list_mode_config.restype = c_int
 
 
+class SignalCoreListSweep():
+    """
+    List-sweep control of a SignalCore for the experiment loops. The frequency plan (the sweep
+    list) is loaded into the SC5511A once by load_list, afterwards every point is one trigger
+    and the PLL dwell time instead of a set_frequency call and a 0.5 s ramp sleep.
+
+        hf = SignalCoreListSweep(sc, trigger='sw', dwell_units=2)
+        control_instr_dict = {'hf_freq': [5e9, hf, 'frequency', 'ramp_to_frequency', 'Hz'], ...}
+
+    trigger = 'sw': every point sends list_soft_trigger
+    trigger = 'hw': the device steps on its trigger input (pin #21), e.g. from the daq or the
+                    lock-in reference, setting frequency only follows the plan
+    Uniform plans run in sweep mode (start / stop / step). Other plans, and values that are not
+    the next point of the plan, are set with set_frequency.
+    """
+    DWELL_UNIT = 500e-6   # seconds, see set_list_dwell_time
+
+    def __init__(self, sc, trigger='sw', dwell_units=1):
+        self.sc = sc
+        self.address = sc.address
+        self.trigger = trigger
+        self.dwell_units = int(dwell_units)
+        self.plan = None
+        self.index = 0
+        self._freq = None
+
+    def get_dwell_time(self):
+        return self.dwell_units * self.DWELL_UNIT
+
+    def load_list(self, freqs):
+        """
+        Loads the frequency plan, returns True if the device runs it in list mode
+        """
+        freqs = np.asarray(freqs, dtype=float)
+        steps = np.diff(freqs)
+        if len(freqs) < 2 or steps[0] == 0 or not np.allclose(steps, steps[0], rtol=1e-9, atol=1):
+            print(self.sc.name + self.sc.address + ' : frequency plan is not uniform, using set_frequency per point')
+            self.plan = None
+            return False
+        # the list registers take whole Hz, a truncated step would drift the device off the plan
+        step, start = abs(steps[0]), freqs.min()
+        if abs(step - round(step)) > 1e-3 or abs(start - round(start)) > 1e-3:
+            print(self.sc.name + self.sc.address + ' : frequency step is not a whole number of Hz, using set_frequency per point')
+            self.plan = None
+            return False
+
+        self.sc.set_list_start_freq(round(start), acknowledge=False)
+        self.sc.set_list_stop_freq(round(freqs.max()), acknowledge=False)
+        self.sc.set_list_step_freq(round(step), acknowledge=False)
+        self.sc.set_list_dwell_time(self.dwell_units, acknowledge=False)
+        self.sc.set_list_cycle_count(0, acknowledge=False)
+        self.sc.set_list_mode(sss_mode=1, sweep_dir=int(steps[0] < 0), tri_waveform=0,
+                              hw_trigger=int(self.trigger == 'hw'), step_on_hw_trig=1, return_to_start=1,
+                              trig_out_enable=1, trig_out_on_cycle=0)
+        self.sc.set_rf_mode(1, acknowledge=False)
+        if not self.sc.list_mode_running():
+            print(self.sc.name + self.sc.address + ' : list mode is not running, using set_frequency per point')
+            self.sc.set_rf_mode(0, acknowledge=False)
+            self.plan = None
+            return False
+
+        self.plan = freqs
+        self.index = 0
+        self._freq = freqs[0]
+        return True
+
+    def release_list(self, restore=True):
+        """ back to single tone, at the last frequency of the list if restore """
+        if self.plan is not None:
+            self.plan = None
+            self.sc.set_rf_mode(0, acknowledge=False)
+            if restore:
+                self.sc.set_frequency = self._freq
+
+    def advance(self):
+        if self.trigger == 'sw':
+            self.sc.list_soft_trigger(acknowledge=False)
+        self.index = (self.index + 1) % len(self.plan)
+        self._freq = self.plan[self.index]
+        sleep(self.get_dwell_time())
+
+    @property
+    def frequency(self):
+        return self._freq
+
+    @frequency.setter
+    def frequency(self, freq):
+        if self.plan is not None:
+            if np.isclose(freq, self.plan[self.index], rtol=0, atol=1):
+                return
+            if np.isclose(freq, self.plan[(self.index + 1) % len(self.plan)], rtol=0, atol=1):
+                self.advance()
+                return
+            # off the plan
+            self.release_list(restore=False)
+        self.sc.set_frequency = freq
+        self._freq = freq
+
+    def ramp_to_frequency(self, frequency, duration=None):
+        """ the PLL is settled after the dwell time, no fixed 0.5 s wait """
+        self.frequency = frequency
+        sleep(self.get_dwell_time() if duration is None else duration)
+
+
 if __name__ == '__main__':
     sc = SignalCore(name="SignalCore",address="10003053")
     # sc.set_clock_reference(ext_ref=False)
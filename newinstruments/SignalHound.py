@@ -1,74 +1,670 @@
 import sys
 sys.path.append(r'F:\Niyaz\newinstruments\api')
 
+import threading
 from time import sleep
-import sadevice.sa_api as sad
+import numpy as np
+
+try:
+    import sadevice.sa_api as sad
+except Exception as e:
+    print(e)
+    print("Warning Signal Hound API import failed")
+    sad = None
 
 GHz = 1e9
 MHz = 1e6
 kHz = 1e3
 
+
+def plan_sweeps(freqs, window, max_span, min_span=250*kHz) -> list:
+    """
+    Fewest sweeps of at most max_span covering every frequency +- window (greedy over the
+    sorted frequencies, which is optimal for equal length intervals).
+    :return: list of (center, span, indices into freqs)
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    order = np.argsort(freqs)
+    plan = []
+    first = 0
+    for k in range(1, len(order) + 1):
+        if k == len(order) or freqs[order[k]] - freqs[order[first]] + 2 * window > max_span:
+            low = freqs[order[first]] - window
+            high = freqs[order[k - 1]] + window
+            plan.append(((low + high) / 2, max(high - low, min_span), order[first:k]))
+            first = k
+    return plan
+
+
+def peak_above(threshold, f_low=-np.inf, f_high=np.inf):
+    """ stop condition for sweep_progressive: a bin between f_low and f_high above threshold dBm """
+    def condition(freqs, spectrum, start, stop):
+        segment = (freqs[start:stop] >= f_low) & (freqs[start:stop] <= f_high)
+        return bool(np.any(spectrum[start:stop][segment] > threshold))
+    return condition
+
+
+def roi_covered(f_high):
+    """ stop condition for sweep_progressive: the sweep (low to high frequency) has passed f_high """
+    def condition(freqs, spectrum, start, stop):
+        return freqs[stop - 1] >= f_high
+    return condition
+
+
+class SweepReader():
+
+    def __init__(self, api, handle, dtype='float64'):
+        """
+        Reads the sweeps of the initiated configuration into preallocated min / max buffers.
+        The geometry (length, start, bin size) and the frequency axis are only queried / built
+        in configure(), call it after every sa_initiate.
+        :param dtype: 'float64' or 'float32' (sa_get_sweep_32f, half the memory traffic)
+        """
+        self.api = api
+        self.handle = handle
+        self.dtype = np.dtype(dtype)
+        self.sweep_length = 0
+        self.start_freq = None
+        self.bin_size = None
+        self.freqs = None
+        self.sweep_min = None
+        self.sweep_max = None
+        self.num_sweeps = 0
+
+    def configure(self) -> None:
+        query = self.api.sa_query_sweep_info(self.handle)
+        self.sweep_length = query["sweep_length"]
+        self.start_freq = query["start_freq"]
+        self.bin_size = query["bin_size"]
+        self.freqs = self.start_freq + self.bin_size * np.arange(self.sweep_length)
+        if self.sweep_max is None or len(self.sweep_max) != self.sweep_length:
+            self.sweep_min = np.zeros(self.sweep_length, dtype=self.dtype)
+            self.sweep_max = np.zeros(self.sweep_length, dtype=self.dtype)
+
+    def read(self, copy=True) -> np.ndarray:
+        """
+        :param copy: False returns the max buffer itself, overwritten by the next read
+        :return: max detector sweep
+        """
+        if self.dtype == np.float32:
+            self.api.sa_get_sweep_32f_into(self.handle, self.sweep_min, self.sweep_max)
+        else:
+            self.api.sa_get_sweep_64f_into(self.handle, self.sweep_min, self.sweep_max)
+        self.num_sweeps += 1
+        return self.sweep_max.copy() if copy else self.sweep_max
+
+    def read_partial(self) -> tuple:
+        """
+        next part of the sweep in progress, written into the max buffer in place
+        :return: start, stop indices of the new part (stop == sweep_length completes the sweep)
+        """
+        if self.dtype == np.float32:
+            result = self.api.sa_get_partial_sweep_32f_into(self.handle, self.sweep_min, self.sweep_max)
+        else:
+            result = self.api.sa_get_partial_sweep_64f_into(self.handle, self.sweep_min, self.sweep_max)
+        if result["stop"] == self.sweep_length:
+            self.num_sweeps += 1
+        return result["start"], result["stop"]
+
+
+class IQStream():
+
+    def __init__(self, sa, center_freq, consumers=(), decimation=1, bandwidth=250e3, level=0,
+                 block_size=4096, ring_blocks=64):
+        """
+        Streaming IQ capture. A reader thread pulls block_size complex64 samples per call into a
+        preallocated ring of ring_blocks blocks, a second thread hands every new block to the
+        consumers (BandPower, Demodulator, IQDecimator, IQCapture or anything with
+        start(sample_rate) and process(block, t0)). Sample loss reported by the device is
+        counted in sample_loss, blocks overwritten before the consumers got to them (skipped or
+        torn while copied out) are dropped and counted in ring_overruns. After either, t0 continues
+        from the device timestamp, the gap is recorded in gaps and consumers with a gap(t0) method
+        are told before the next block (phase is not continuous across a gap).
+
+            with sa.iq_stream(4.1*GHz, [power, demod]) as stream:
+                sleep(2)
+
+        :param decimation: power of two, sample rate is 486.1 kS/s / decimation
+        :param bandwidth: IQ filter bandwidth in Hz
+        """
+        self.sa = sa
+        self.center_freq = center_freq
+        self.consumers = list(consumers)
+        self.decimation = decimation
+        self.bandwidth = bandwidth
+        self.level = level
+        self.block_size = int(block_size)
+        self.ring_blocks = int(ring_blocks)
+        self.ring = np.zeros((self.ring_blocks, self.block_size), dtype=np.complex64)
+        self.ring_t0 = np.zeros(self.ring_blocks)             # time of the first sample per slot
+        self.ring_gap = np.zeros(self.ring_blocks, dtype=bool)  # samples lost before the slot
+        self.sample_rate = None
+        self.blocks_read = 0
+        self.blocks_processed = 0
+        self.sample_loss = 0
+        self.ring_overruns = 0
+        self.gaps = []                  # t0 of the first block after each gap
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        api = self.sa.api
+        handle = self.sa.handle
+        api.sa_config_center_span(handle, self.center_freq, self.bandwidth)
+        api.sa_config_level(handle, self.level)
+        api.sa_config_IQ(handle, self.decimation, self.bandwidth)
+        api.sa_initiate(handle, api.SA_IQ, 0)
+        # the sweep settings have to be sent again afterwards
+        self.sa.reset_config()
+        self.sample_rate = api.sa_query_stream_info(handle)["samples_per_second"]
+        for consumer in self.consumers:
+            consumer.start(self.sample_rate)
+
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._read, name='IQStream reader', daemon=True),
+                         threading.Thread(target=self._process, name='IQStream consumers', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.sa.api.sa_abort(self.sa.handle)
+
+    def _read(self):
+        api = self.sa.api
+        purge = 1
+        t_first = None
+        t0 = 0.0
+        while not self._stop.is_set():
+            slot = self.blocks_read % self.ring_blocks
+            result = api.sa_get_IQ_data_unpacked_into(self.sa.handle, self.ring[slot], self.block_size, purge)
+            purge = 0
+            # device timestamp of the first sample of the block
+            timestamp = result["sec"] + result["milli"] / 1000
+            if t_first is None:
+                t_first = timestamp
+            gap = bool(result["sample_loss"])
+            if gap:
+                self.sample_loss += 1
+                t0 = max(t0, timestamp - t_first)
+                print('IQStream: sample loss before block %d' % self.blocks_read)
+            self.ring_t0[slot] = t0
+            self.ring_gap[slot] = gap
+            t0 += self.block_size / self.sample_rate
+            with self._cond:
+                self.blocks_read += 1
+                self._cond.notify()
+
+    def _process(self):
+        # the reader fills slot blocks_read % ring_blocks before it counts it, so block index is
+        # only intact while blocks_read - index < ring_blocks. Blocks are copied out and checked
+        # again afterwards, the reader may have wrapped onto the slot during the copy.
+        block = np.zeros(self.block_size, dtype=np.complex64)
+        dropped = False
+        while True:
+            with self._cond:
+                while self.blocks_processed == self.blocks_read and not self._stop.is_set():
+                    self._cond.wait()
+                if self.blocks_processed == self.blocks_read:
+                    return
+                index = self.blocks_processed
+            if self.blocks_read - index >= self.ring_blocks:
+                # the reader went round the ring, skip to the oldest block still intact
+                skipped = self.blocks_read - index - self.ring_blocks + 1
+                self.ring_overruns += skipped
+                self.blocks_processed += skipped
+                dropped = True
+                print('IQStream: consumers too slow, %d blocks dropped' % skipped)
+                continue
+            slot = index % self.ring_blocks
+            block[:] = self.ring[slot]
+            t0 = self.ring_t0[slot]
+            gap = self.ring_gap[slot]
+            self.blocks_processed += 1
+            if self.blocks_read - index >= self.ring_blocks:
+                # torn: overwritten while it was copied
+                self.ring_overruns += 1
+                dropped = True
+                print('IQStream: consumers too slow, block %d dropped' % index)
+                continue
+            if gap or dropped:
+                self.gaps.append(t0)
+                for consumer in self.consumers:
+                    if hasattr(consumer, 'gap'):
+                        consumer.gap(t0)
+                dropped = False
+            for consumer in self.consumers:
+                consumer.process(block, t0)
+
+
+class BandPower():
+
+    def __init__(self, offset=0.0, bandwidth=None):
+        """
+        power per IQ block in dBm (samples are sqrt(mW)), optionally only in a band
+        :param offset: band center relative to the IQ center frequency in Hz
+        :param bandwidth: band width in Hz, None for the whole IQ bandwidth (no FFT)
+        """
+        self.offset = offset
+        self.bandwidth = bandwidth
+        self.times = []
+        self.values = []
+        self._mask = None
+
+    def start(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._mask = None
+
+    def process(self, block, t0):
+        if self.bandwidth is None:
+            power = np.mean(block.real**2 + block.imag**2)
+        else:
+            if self._mask is None or len(self._mask) != len(block):
+                freqs = np.fft.fftfreq(len(block), 1 / self.sample_rate)
+                self._mask = np.abs(freqs - self.offset) <= self.bandwidth / 2
+            spectrum = np.fft.fft(block)[self._mask]
+            power = np.sum(spectrum.real**2 + spectrum.imag**2) / len(block)**2
+        self.times.append(t0)
+        self.values.append(10 * np.log10(max(power, 1e-30)))
+
+    def get_data(self) -> tuple:
+        return np.array(self.times), np.array(self.values)
+
+
+class Demodulator():
+
+    def __init__(self, offset=0.0, points_per_block=1):
+        """
+        amplitude (sqrt(mW)) and phase (rad) of a tone at offset Hz from the IQ center frequency,
+        averaged over block_size / points_per_block samples, phase continuous across blocks.
+        A gap in the stream is a nan point.
+        """
+        self.offset = offset
+        self.points_per_block = int(points_per_block)
+        self.times = []
+        self.values = []
+
+    def start(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._lo = None
+
+    def process(self, block, t0):
+        n = len(block)
+        if self._lo is None or len(self._lo) != n:
+            self._lo = np.exp(-2j * np.pi * self.offset * np.arange(n) / self.sample_rate).astype(np.complex64)
+        # phase of the local oscillator at the first sample of the block
+        lo_phase = np.exp(-2j * np.pi * self.offset * t0)
+        mixed = (block * self._lo * lo_phase).reshape((self.points_per_block, -1)).mean(axis=1)
+        self.times.extend(t0 + (np.arange(self.points_per_block) + 0.5) * n / self.points_per_block / self.sample_rate)
+        self.values.extend(mixed)
+
+    def gap(self, t0):
+        self.times.append(t0)
+        self.values.append(np.nan)
+
+    def get_data(self) -> tuple:
+        """ :return: times, amplitudes, phases """
+        values = np.array(self.values)
+        return np.array(self.times), np.abs(values), np.angle(values)
+
+
+class IQDecimator():
+
+    def __init__(self, factor):
+        """
+        boxcar averaged IQ waveform, factor samples per point, remainder kept for the next block
+        (dropped at a gap)
+        """
+        self.factor = int(factor)
+        self._chunks = []
+        self._times = []
+        self._rest = np.zeros(0, dtype=np.complex64)
+
+    def start(self, sample_rate):
+        self._input_rate = sample_rate
+        self.sample_rate = sample_rate / self.factor
+
+    def gap(self, t0):
+        self._rest = np.zeros(0, dtype=np.complex64)
+
+    def process(self, block, t0):
+        start = t0 - len(self._rest) / self._input_rate
+        data = np.concatenate((self._rest, block))
+        num = len(data) // self.factor * self.factor
+        self._rest = data[num:]
+        if num:
+            self._chunks.append(data[:num].reshape((-1, self.factor)).mean(axis=1))
+            self._times.append(start + np.arange(num // self.factor) / self.sample_rate)
+
+    def get_data(self) -> tuple:
+        """ :return: times (of the first sample of each point), complex waveform """
+        if not self._chunks:
+            return np.zeros(0), np.zeros(0, dtype=np.complex64)
+        return np.concatenate(self._times), np.concatenate(self._chunks)
+
+
+class IQCapture():
+
+    def __init__(self, max_samples):
+        """ keeps the first max_samples raw IQ samples, gaps holds the sample index after each gap """
+        self.data = np.zeros(int(max_samples), dtype=np.complex64)
+        self.num_samples = 0
+        self.gaps = []
+
+    def start(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.num_samples = 0
+        self.gaps = []
+
+    def gap(self, t0):
+        self.gaps.append(self.num_samples)
+
+    def process(self, block, t0):
+        num = min(len(block), len(self.data) - self.num_samples)
+        self.data[self.num_samples:self.num_samples + num] = block[:num]
+        self.num_samples += num
+
+    def get_data(self) -> np.ndarray:
+        return self.data[:self.num_samples]
+
+
 class SignalHoundSA124B():
 
-    def __init__(self, RBW=50e3, VBW=50e3):
-        self.handle = sad.sa_open_device()["handle"]
+    def __init__(self, RBW=50e3, VBW=50e3, api=None, dtype='float64'):
+        """
+        :param api: sa_api module (default) or simInstruments.SimSA124B
+        :param dtype: sweep buffer type, see SweepReader
+        """
+        self.api = sad if api is None else api
+        self.handle = self.api.sa_open_device()["handle"]
         self.rbw = RBW
         self.vbw = VBW
+        self.reader = SweepReader(self.api, self.handle, dtype)
+        self.num_initiates = 0
+        self._applied = {}              # shadow of the settings sent to the device, see configure_sweep
+        self.tg_attached = False
+        self.tg_freqs = None
+        self._tg_settings = None
+        self.tg_thru = None             # configure_tg settings the stored through was taken with
+        self._tg_warned = None
+
+    def reset_config(self) -> None:
+        """ forget the applied settings (after a preset or changes made outside this driver) """
+        self._applied = {}
+
+    def _apply_settings(self, settings) -> bool:
+        # sends the (name, args, config function) settings that differ from the applied ones
+        changed = False
+        for name, args, config in settings:
+            if self._applied.get(name) != args:
+                config(self.handle, *args)
+                self._applied[name] = args
+                changed = True
+        return changed
 
-    def get_spectrum(self, center_freq=4*GHz, span=1*GHz, level=0) -> tuple:
-        
-        # Configure
-        sad.sa_config_center_span(self.handle, center_freq, span)
-        sad.sa_config_level(self.handle, level)
-        sad.sa_config_sweep_coupling(self.handle, self.rbw, self.vbw, "reject") #was both 250e3
-        sad.sa_config_acquisition(self.handle, sad.SA_MIN_MAX, sad.SA_LOG_SCALE)
+    def configure_sweep(self, center_freq, span, level=0, rbw=None, vbw=None) -> bool:
+        """
+        Sends only the settings that differ from the applied ones (center / span, level, RBW / VBW,
+        detector). The api applies settings on sa_initiate, so the sweep is re-initiated only
+        if something changed (or the device is in another mode).
+        :param rbw, vbw: default self.rbw, self.vbw (vbw = rbw if only rbw is given)
+        :return: True if the device was reconfigured
+        """
+        api = self.api
+        vbw = (self.vbw if rbw is None else rbw) if vbw is None else vbw
+        rbw = self.rbw if rbw is None else rbw
+        settings = [
+            ('center_span', (center_freq, span), api.sa_config_center_span),
+            ('level', (level,), api.sa_config_level),
+            ('coupling', (rbw, vbw, "reject"), api.sa_config_sweep_coupling),
+            ('acquisition', (api.SA_MIN_MAX, api.SA_LOG_SCALE), api.sa_config_acquisition)
+        ]
+        changed = self._apply_settings(settings)
+        if not changed and self._applied.get('mode') == api.SA_SWEEPING:
+            return False
 
         # Initialize
-        sad.sa_initiate(self.handle, sad.SA_SWEEPING, 0)
-        query = sad.sa_query_sweep_info(self.handle)
-        sweep_num = query["sweep_length"]
-        start_freq = query["start_freq"]
-        bin_size = query["bin_size"]
-        freqs = [start_freq + i * bin_size for i in range(sweep_num)]
+        api.sa_initiate(self.handle, api.SA_SWEEPING, 0)
+        self._applied['mode'] = api.SA_SWEEPING
+        self.num_initiates += 1
+        self.reader.configure()
+        return True
 
-        # Get data
-        spectrum = sad.sa_get_sweep_64f(self.handle)["max"]
+    def get_spectrum(self, center_freq=4*GHz, span=1*GHz, level=0, copy=True) -> tuple:
+        """
+        :param copy: False returns the reader buffer (overwritten by the next sweep)
+        :return: frequency axis (shared until the next reconfiguration), max detector sweep in dBm
+        """
+        self.configure_sweep(center_freq, span, level)
+        return self.reader.freqs, self.reader.read(copy)
+
+    def get_sweep(self, copy=True) -> np.ndarray:
+        """ next sweep of the current configuration """
+        return self.reader.read(copy)
+
+    def get_power_at_freqs(self, freqs, rbw=None, window=None, level=0, max_span=200*MHz,
+                           return_freqs=False):
+        """
+        Peak power near each of several frequencies (harmonics, sidebands, several drives) from
+        as few sweeps as possible, see plan_sweeps. Keep max_span moderate at small RBW, the
+        sweep time grows with span / RBW.
+        :param rbw: default self.rbw
+        :param window: peak search +- window around each frequency, default the RBW
+        :param return_freqs: also return the frequency of each peak
+        :return: powers in dBm in the order of freqs (and peak frequencies)
+        """
+        freqs = np.asarray(freqs, dtype=float)
+        rbw = self.rbw if rbw is None else rbw
+        window = rbw if window is None else window
+        powers = np.full(len(freqs), np.nan)
+        peak_freqs = np.full(len(freqs), np.nan)
+        for center, span, indices in plan_sweeps(freqs, window, max_span):
+            self.configure_sweep(center, span, level, rbw)
+            spectrum = self.reader.read(copy=False)
+            reader = self.reader
+            # bins within +- window of every tone, one row per tone
+            first = np.ceil((freqs[indices] - window - reader.start_freq) / reader.bin_size).astype(int)
+            width = max(int(2 * window / reader.bin_size), 0) + 1
+            bins = np.clip(first[:, None] + np.arange(width), 0, reader.sweep_length - 1)
+            peaks = np.argmax(spectrum[bins], axis=1)
+            powers[indices] = spectrum[bins[np.arange(len(indices)), peaks]]
+            peak_freqs[indices] = reader.freqs[bins[np.arange(len(indices)), peaks]]
+        if return_freqs:
+            return powers, peak_freqs
+        return powers
+
+    def sweep_progressive(self, center_freq=4*GHz, span=1*GHz, level=0, stop_when=None):
+        """
+        Generator over the parts of one sweep as the device produces them, yields
+        (start, stop, freqs[start:stop], spectrum[start:stop]). The spectrum is the reader max
+        buffer (self.reader.sweep_max), filled in place, parts not swept yet are nan.
+        Ends when the sweep is complete, when stop_when(freqs, spectrum, start, stop) is true
+        (see peak_above, roi_covered) or when the caller breaks out of the loop. A sweep ended
+        early is dropped by the device on the next configure_sweep (re-initiate).
+
+            for start, stop, f, p in sa.sweep_progressive(6*GHz, 4*GHz, stop_when=peak_above(-50)):
+                plot(f, p)
+        """
+        self.configure_sweep(center_freq, span, level)
+        reader = self.reader
+        reader.sweep_max[:] = np.nan
+        stop = 0
+        try:
+            while stop < reader.sweep_length:
+                start, stop = reader.read_partial()
+                yield start, stop, reader.freqs[start:stop], reader.sweep_max[start:stop]
+                if stop_when is not None and stop_when(reader.freqs, reader.sweep_max, start, stop):
+                    break
+        finally:
+            if stop < reader.sweep_length:
+                self._applied['mode'] = None
+
+    def get_spectrum_until(self, center_freq=4*GHz, span=1*GHz, level=0, stop_when=None) -> tuple:
+        """
+        sweep_progressive run to the end or to stop_when
+        :return: frequency axis, spectrum (nan where not swept), number of bins swept
+        """
+        stop = 0
+        for start, stop, freqs, spectrum in self.sweep_progressive(center_freq, span, level, stop_when):
+            pass
+        return self.reader.freqs, self.reader.sweep_max.copy(), stop
+
+    # Tracking generator (TG124A) scalar network analysis
+    # configure_tg, connect the through, store_tg_thru, connect the DUT, then read_data gives
+    # S21 in dB relative to the through, as E5071_2.read_data. read_data_freq / read_data_y1
+    # make it an experiment readout next to the vna (see experiment.add_tg_readouts).
+    # The through stays valid across re-initiates (e.g. after spectrum sweeps on the same SA)
+    # as long as the TG settings are the ones it was stored with.
+
+    def configure_tg(self, start_freq=4*GHz, stop_freq=5*GHz, num_points=1601, level=0,
+                     high_dynamic_range=True, passive_device=True) -> bool:
+        """
+        TG sweep through the configuration shadow, other TG settings than the ones of the
+        stored through need a new store_tg_thru
+        :param num_points: suggested sweep size, read_data resamples to exactly num_points
+        :return: True if the device was reconfigured
+        """
+        api = self.api
+        if not self.tg_attached:
+            api.sa_attach_tg(self.handle)
+            self.tg_attached = True
+        settings = [
+            ('center_span', ((start_freq + stop_freq) / 2, stop_freq - start_freq), api.sa_config_center_span),
+            ('level', (level,), api.sa_config_level),
+            ('tg_sweep', (int(num_points), high_dynamic_range, passive_device), api.sa_config_tg_sweep)
+        ]
+        self._tg_settings = (start_freq, stop_freq, num_points, level, high_dynamic_range, passive_device)
+        changed = self._apply_settings(settings)
+        if not changed and self._applied.get('mode') == api.SA_TG_SWEEP:
+            return False
+
+        api.sa_initiate(self.handle, api.SA_TG_SWEEP, 0)
+        self._applied['mode'] = api.SA_TG_SWEEP
+        self.num_initiates += 1
+        self.reader.configure()
+        if self.reader.sweep_length == num_points:
+            self.tg_freqs = self.reader.freqs.copy()
+        else:
+            self.tg_freqs = np.linspace(start_freq, stop_freq, int(num_points))
+        return True
 
-        return freqs, spectrum
+    def store_tg_thru(self, pad_20db=False) -> None:
+        """
+        Sweeps with the through connected and stores it as the 0 dB reference. With
+        high_dynamic_range also store the through with a 20 dB pad: store_tg_thru(),
+        insert the pad, store_tg_thru(pad_20db=True).
+        """
+        api = self.api
+        if self._applied.get('mode') != api.SA_TG_SWEEP:
+            print('configure_tg first')
+            return
+        self.reader.read(copy=False)
+        api.sa_store_tg_thru(self.handle, api.TG_THRU_20DB if pad_20db else api.TG_THRU_0DB)
+        self.tg_thru = self._tg_settings
+
+    def set_tg_output(self, frequency, amplitude) -> dict:
+        """
+        fixed frequency TG output (stops a TG sweep)
+        :return: frequency and amplitude read back from the TG
+        """
+        api = self.api
+        if not self.tg_attached:
+            api.sa_attach_tg(self.handle)
+            self.tg_attached = True
+        if self._applied.get('mode') not in [None, api.SA_IDLE]:
+            api.sa_abort(self.handle)
+            self._applied['mode'] = api.SA_IDLE
+        api.sa_set_tg(self.handle, frequency, amplitude)
+        readback = api.sa_get_tg_freq_ampl(self.handle)
+        return {'frequency': readback["frequency"], 'amplitude': readback["amplitude"]}
+
+    def read_data(self, channel=1) -> np.ndarray:
+        """
+        One TG sweep (re-initiated with the last configure_tg settings if the device was used otherwise)
+        :param channel: unused, as in E5071_2.read_data
+        :return: np.vstack((fpts, S21 in dB))
+        """
+        if self._applied.get('mode') != self.api.SA_TG_SWEEP:
+            if self._tg_settings is None:
+                print('configure_tg first')
+                return None
+            self.configure_tg(*self._tg_settings)
+        if self.tg_thru != self._tg_settings and self._tg_warned != self._tg_settings:
+            # raw sweeps are fine (e.g. checking the levels before storing the through), say it once
+            print('Warning: no TG through stored for these settings, S21 is not normalized')
+            self._tg_warned = self._tg_settings
+        sweep = self.reader.read(copy=False)
+        if len(sweep) == len(self.tg_freqs):
+            s21 = sweep.astype(float)
+        else:
+            s21 = np.interp(self.tg_freqs, self.reader.freqs, sweep)
+        return np.vstack((self.tg_freqs, s21))
+
+    def read_data_freq(self, channel=1) -> np.ndarray:
+        """ frequency axis of the TG sweep (no sweep) """
+        return self.tg_freqs
+
+    def read_data_y1(self, channel=1) -> np.ndarray:
+        """ S21 in dB of a new TG sweep """
+        return self.read_data(channel)[1, :]
+
+    def iq_stream(self, center_freq, consumers=(), decimation=1, bandwidth=250e3, level=0,
+                  block_size=4096, ring_blocks=64) -> IQStream:
+        """
+        streaming IQ capture at center_freq, see IQStream (start it or use it in a with block)
+        """
+        return IQStream(self, center_freq, consumers, decimation, bandwidth, level, block_size, ring_blocks)
 
     @property
     def set_freq_for_power(self):
-        pass
+        center_span = self._applied.get('center_span')
+        return None if center_span is None else center_span[0]
 
     @set_freq_for_power.setter
     def set_freq_for_power(self, center_freq=4.0*GHz) -> None:
         span = 250*kHz
         level = 0
-        sad.sa_config_center_span(self.handle, center_freq, span)
-        sad.sa_config_level(self.handle, level)
-        sad.sa_config_sweep_coupling(self.handle, self.rbw, self.vbw, "reject")
-        sad.sa_config_acquisition(self.handle, sad.SA_MIN_MAX, sad.SA_LOG_SCALE)
-        
-        # Initialize
-        sad.sa_initiate(self.handle, sad.SA_SWEEPING, 0)
+        self.configure_sweep(center_freq, span, level)
 
     @property
     def get_power_at_freq(self) -> float:
         # Get data
-        spectrum = sad.sa_get_sweep_64f(self.handle)["max"]
-        max_power = max(spectrum)
+        spectrum = self.reader.read(copy=False)
+        max_power = float(np.max(spectrum))
         return max_power
     
     @get_power_at_freq.setter
     def get_power_at_freq(self):
         pass
 
-    def ramp_to_frequency(self, frequency=4.0*GHz, duration=0.5):
-        self.set_freq_for_power = frequency
-        sleep(duration)
+    def ramp_to_frequency(self, frequency=4.0*GHz, duration=None):
+        """
+        :param duration: None waits for the first complete sweep at the new frequency (only if it
+                         changed), a number keeps the fixed wait in seconds
+        """
+        span = 250*kHz
+        level = 0
+        changed = self.configure_sweep(frequency, span, level)
+        if duration is not None:
+            sleep(duration)
+        elif changed:
+            self.reader.read(copy=False)
 
     def close_device(self):
-        sad.sa_close_device(self.handle)
+        self.api.sa_close_device(self.handle)
         print("Closing Device")
 
 if __name__ == "__main__":
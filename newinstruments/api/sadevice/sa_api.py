@@ -58,6 +58,10 @@ SA_AUDIO_USB = 2
 SA_AUDIO_LSB = 3
 SA_AUDIO_CW = 4
 
+# TG thru
+TG_THRU_0DB = 1
+TG_THRU_20DB = 2
+
 
 # --------------------------------- Mappings ----------------------------------
 
@@ -411,6 +415,20 @@ def sa_get_sweep_64f(device):
         "max": sweep_max
     }
 
+@error_check
+def sa_get_sweep_32f_into(device, sweep_min, sweep_max):
+    # fills preallocated float32 arrays of sweep_length, no sweep info query, no allocation
+    return {
+        "status": saGetSweep_32f(device, sweep_min, sweep_max)
+    }
+
+@error_check
+def sa_get_sweep_64f_into(device, sweep_min, sweep_max):
+    # fills preallocated float64 arrays of sweep_length, no sweep info query, no allocation
+    return {
+        "status": saGetSweep_64f(device, sweep_min, sweep_max)
+    }
+
 @error_check
 def sa_get_partial_sweep_32f(device):
     sweep_length = sa_query_sweep_info(device)["sweep_length"]
@@ -443,6 +461,30 @@ def sa_get_partial_sweep_64f(device):
         "stop": stop.value
     }
 
+@error_check
+def sa_get_partial_sweep_32f_into(device, sweep_min, sweep_max):
+    # fills the [start, stop) part of preallocated float32 buffers
+    start = c_int(-1)
+    stop = c_int(-1)
+    status = saGetPartialSweep_32f(device, sweep_min, sweep_max, byref(start), byref(stop))
+    return {
+        "status": status,
+        "start": start.value,
+        "stop": stop.value
+    }
+
+@error_check
+def sa_get_partial_sweep_64f_into(device, sweep_min, sweep_max):
+    # fills the [start, stop) part of preallocated float64 buffers
+    start = c_int(-1)
+    stop = c_int(-1)
+    status = saGetPartialSweep_64f(device, sweep_min, sweep_max, byref(start), byref(stop))
+    return {
+        "status": status,
+        "start": start.value,
+        "stop": stop.value
+    }
+
 @error_check
 def sa_get_real_time_frame(device):
     sweep_length = sa_query_sweep_info(device)["sweep_length"]
@@ -499,6 +541,22 @@ def sa_get_IQ_data_unpacked(device, iq_count, purge):
         "milli": milli.value
     }
 
+@error_check
+def sa_get_IQ_data_unpacked_into(device, iq_data, iq_count, purge):
+    # fills a preallocated complex64 array (e.g. a ring buffer slot) with iq_count samples
+    data_remaining = c_int(-1)
+    sample_loss = c_int(-1)
+    sec = c_int(-1)
+    milli = c_int(-1)
+    status = saGetIQDataUnpacked(device, iq_data, iq_count, purge, byref(data_remaining), byref(sample_loss), byref(sec), byref(milli))
+    return {
+        "status": status,
+        "data_remaining": data_remaining.value,
+        "sample_loss": sample_loss.value,
+        "sec": sec.value,
+        "milli": milli.value
+    }
+
 @error_check
 def sa_get_audio(device):
     audio = numpy.zeros(SA_NUM_AUDIO_SAMPLES).astype(numpy.float32)
@@ -3,16 +3,19 @@ from numpy import random
 
 class demoInstrument():
 
-    def __init__(self, address: str, printMessages: bool):
+    def __init__(self, address: str, printMessages: bool, latency: float = 0.0):
         self.address = address
         self.printMessages = printMessages
+        self.latency = latency      # seconds each set/get takes, emulates the bus
 
     @property
     def voltage(self) -> float:
+        sleep(self.latency)
         return random.rand()
 
     @voltage.setter
     def voltage(self, value: float) -> None:
+        sleep(self.latency)
         if self.printMessages:
             print(f'the instrument at address {self.address} is set to {value}')
 
@@ -22,6 +25,7 @@ class demoInstrument():
 
     @property
     def read(self) -> float:
+        sleep(self.latency)
         return random.rand() + 1.0
 
 if __name__ == "__main__":
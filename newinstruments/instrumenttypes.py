@@ -122,6 +122,14 @@ class VisaInstrument(Instrument):
         # todo: implement timeout, reference SocketInstrument.read
         if self.enabled: return self.instrument.read()
 
+    def read_raw(self, timeout=None):
+        # raw bytes, e.g. binary block transfers
+        if self.enabled: return self.instrument.read_raw()
+
+    def read_stb(self):
+        # serial poll, does not go through the instrument's input queue
+        if self.enabled: return self.instrument.read_stb()
+
     def close(self):
         if self.enabled: self.instrument.close()
 
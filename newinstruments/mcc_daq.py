@@ -33,6 +33,33 @@ from mcculw.device_info import DaqDeviceInfo
 
 import numpy as np
 
+# scan buffer types: ul allocation function, sample ctype
+BUFFER_TYPES = {
+    'scaled': ('scaled_win_buf_alloc', c_double),
+    '16 bit': ('win_buf_alloc', c_ushort),
+    '32 bit': ('win_buf_alloc_32', c_ulong)
+}
+
+
+def buffer_as_array(ctypes_array, count):
+    """
+    numpy view on a scan buffer (no copy), only valid until the buffer is freed
+    :param ctypes_array: memhandle cast to POINTER(c_ushort / c_ulong / c_double)
+    """
+    return np.ctypeslib.as_array(ctypes_array, shape=(count,))
+
+
+def counts_to_volts(counts, range_min, range_max, resolution):
+    """
+    vectorized ul.to_eng_units: range_min + counts * (range_max - range_min) / 2**resolution,
+    rounded to single precision like to_eng_units up to 16 bits (to_eng_units_32 is double)
+    """
+    volts = range_min + counts * ((range_max - range_min) / 2 ** resolution)
+    if resolution <= 16:
+        volts = volts.astype(np.float32)
+    return volts.astype(np.float64)
+
+
 class mcc_daq:
     
     def __init__(self, sampling_rate = 100, measurement_time = 1, voltage_range = 0, status = True):
@@ -40,6 +67,10 @@ class mcc_daq:
         self.measurement_time = measurement_time
         self.voltage_range = voltage_range     # 0 - 10 VOLTS, 1 - 2.5 VOLTS, 2 - 0.5 VOLTS
         self.status = status
+        self._converters = {}                  # (range, resolution): counts -> volts, see get_converter
+        self.overruns = 0                      # stream: buffer overruns / points per channel lost
+        self.samples_lost = 0
+        self._session = None                   # open DaqScanSession, see session()
     
     def device_detect(self):
         try:
@@ -62,175 +93,96 @@ class mcc_daq:
         print('\nActive DAQ device: ', self.daq_dev_info.product_name, ' (',
               self.daq_dev_info.unique_id, ')\n', sep='')
     
-    def scan(self):
-        points_per_channel = int(self.measurement_time * self.sampling_rate)
-        memhandle = None
-        ai_info = self.daq_dev_info.get_ai_info()
-        low_chan = 0
-        high_chan = min(3, ai_info.num_chans - 1)
-        num_chans = high_chan - low_chan + 1
-        total_count = points_per_channel * num_chans
+    def get_converter(self, ai_range, resolution):
+        """
+        counts -> volts function for a range, numerically identical to ul.to_eng_units
+        (to_eng_units_32 above 16 bits). counts_to_volts is checked once against the library,
+        if they differ a lookup table built with the library is used instead (up to 16 bits)
+        """
+        key = (int(ai_range), resolution)
+        if key in self._converters:
+            return self._converters[key]
 
-        ai_range = ai_info.supported_ranges[self.voltage_range]
-        scan_options = ScanOptions.FOREGROUND
-        
-        if ScanOptions.SCALEDATA in ai_info.supported_scan_options:
-            # If the hardware supports the SCALEDATA option, it is easiest to
-            # use it.
-            scan_options |= ScanOptions.SCALEDATA
+        to_eng = ul.to_eng_units if resolution <= 16 else ul.to_eng_units_32
+        full_scale = 2 ** resolution
+        test = np.unique(np.concatenate(([0, 1, full_scale // 2, full_scale - 1],
+                                         np.random.randint(0, full_scale, 256))))
+        expected = np.array([to_eng(self.board_num, ai_range, int(count)) for count in test])
+
+        def converter(counts):
+            return counts_to_volts(counts, ai_range.range_min, ai_range.range_max, resolution)
+
+        if not np.array_equal(converter(test), expected):
+            if resolution <= 16:
+                print('to_eng_units differs from the ideal transfer function, using a lookup table')
+                table = np.array([to_eng(self.board_num, ai_range, count) for count in range(full_scale)])
+                converter = table.take
+            else:
+                print('Warning: vectorized conversion differs from to_eng_units_32 by up to %.3g V'
+                      % np.max(np.abs(converter(test) - expected)))
+
+        self._converters[key] = converter
+        return converter
+
+    def buffer_to_volts(self, ctypes_array, points_per_channel, num_chans, ai_range, resolution, scaled=False):
+        """
+        converts a scan buffer in one vectorized operation
+        :param scaled: buffer holds SCALEDATA volts already
+        :return: (points, channels) array, a copy, so the buffer can be freed afterwards
+        """
+        raw = buffer_as_array(ctypes_array, points_per_channel * num_chans).reshape((points_per_channel, num_chans))
+        if scaled:
+            return raw.copy()
+        return self.get_converter(ai_range, resolution)(raw)
+
+    def session(self):
+        """
+        scan session keeping the AI info, trigger thresholds and scan buffers between captures,
+        scan / stream calls made inside the with block reuse it
+
+            with daq.session():
+                for shot in range(100):
+                    tlist, data = daq.scan_trigger_ch0()
+        """
+        return DaqScanSession(self)
+
+    def _session_call(self, method, *args):
+        # runs a scan in the open session, or in a temporary one (buffers freed right after)
+        if self._session is not None:
+            return getattr(self._session, method)(*args)
+        with DaqScanSession(self) as session:
+            return getattr(session, method)(*args)
+
+    def scan(self):
+        return self._session_call('scan')
 
-            memhandle = ul.scaled_win_buf_alloc(total_count)
-            # Convert the memhandle to a ctypes array.
-            # Use the memhandle_as_ctypes_array_scaled method for scaled
-            # buffers.
-            ctypes_array = cast(memhandle, POINTER(c_double))
-        elif ai_info.resolution <= 16:
-             # Use the win_buf_alloc method for devices with a resolution <= 16
-            memhandle = ul.win_buf_alloc(total_count)
-            # Convert the memhandle to a ctypes array.
-            # Use the memhandle_as_ctypes_array method for devices with a
-            # resolution <= 16.
-            ctypes_array = cast(memhandle, POINTER(c_ushort))
-        else:
-            # Use the win_buf_alloc_32 method for devices with a resolution > 16
-            memhandle = ul.win_buf_alloc_32(total_count)
-            # Convert the memhandle to a ctypes array.
-            # Use the memhandle_as_ctypes_array_32 method for devices with a
-            # resolution > 16
-            ctypes_array = cast(memhandle, POINTER(c_ulong))
-        
-        # Check if the buffer was successfully allocated
-        if not memhandle:
-            raise Exception('Failed to allocate memory')
-        
-        ul.a_in_scan(
-            self.board_num, low_chan, high_chan, total_count,
-            self.sampling_rate, ai_range, memhandle, scan_options)
-        if self.status:
-            print('Scan completed successfully.')
-        
-        data = np.zeros((points_per_channel,num_chans))
-        tlist = np.linspace(0,self.measurement_time,num = points_per_channel,endpoint = True)
-        
-        # Print the data
-        data_index = 0
-        for i in range(points_per_channel):
-            for j in range(num_chans):
-                eng_value = ul.to_eng_units(self.board_num, ai_range, ctypes_array[data_index])
-                data[i,j] = eng_value
-                data_index += 1
-        if self.status:
-            print('Data copied from buffer - complete.')
-        
-        if memhandle:
-            # Free the buffer in a finally block to prevent  a memory leak.
-            ul.win_buf_free(memhandle)
-        
-        return tlist, data
-    
     def scan_exttrigger(self):
-        points_per_channel = int(self.measurement_time * self.sampling_rate)
-        memhandle = None
-        ai_info = self.daq_dev_info.get_ai_info()
-        low_chan = 0
-        high_chan = min(3, ai_info.num_chans - 1)
-        num_chans = high_chan - low_chan + 1
-        total_count = points_per_channel * num_chans
+        return self._session_call('scan_exttrigger')
 
-        ai_range = ai_info.supported_ranges[self.voltage_range]
-        scan_options = ScanOptions.CONTINUOUS | ScanOptions.BACKGROUND | ScanOptions.EXTTRIGGER
-        memhandle = ul.win_buf_alloc(total_count)
-        ctypes_array = cast(memhandle, POINTER(c_ushort))
-        
-        # Check if the buffer was successfully allocated
-        if not memhandle:
-            raise Exception('Failed to allocate memory')
-            
-        if self.status:
-            print('Waiting for a trigger...')
-        
-        ul.a_in_scan(
-            self.board_num, low_chan, high_chan, total_count,
-            self.sampling_rate, ai_range, memhandle, scan_options)
-        
-        status, curr_count, curr_index = ul.get_status(self.board_num, FunctionType.AIFUNCTION)
-        
-        while status != Status.IDLE and curr_count < total_count:
-            status, curr_count, curr_index = ul.get_status(self.board_num, FunctionType.AIFUNCTION)
-            
-        ul.stop_background(self.board_num, FunctionType.AIFUNCTION)
-        
-        if self.status:
-            print('Scan completed successfully.')
-        
-        data = np.zeros((points_per_channel,num_chans))
-        tlist = np.linspace(0,self.measurement_time,num = points_per_channel,endpoint = True)
-        
-        # Print the data
-        data_index = 0
-        for i in range(points_per_channel):
-            for j in range(num_chans):
-                eng_value = ul.to_eng_units(self.board_num, ai_range, ctypes_array[data_index])
-                data[i,j] = eng_value
-                data_index += 1
-        if self.status:
-            print('Data copied from buffer - complete.')
-        
-        if memhandle:
-            # Free the buffer in a finally block to prevent  a memory leak.
-            ul.win_buf_free(memhandle)
-        
-        return tlist, data
-    
     def scan_trigger_ch0(self):
-        points_per_channel = int(self.measurement_time * self.sampling_rate)
-        memhandle = None
-        ai_info = self.daq_dev_info.get_ai_info()
-        low_chan = 0
-        high_chan = min(3, ai_info.num_chans - 1)
-        num_chans = high_chan - low_chan + 1
-        total_count = points_per_channel * num_chans
-        
-        trig_type = TrigType.TRIG_ABOVE
-        low_threshold_volts = 0.1
-        high_threshold_volts = 0.3
+        return self._session_call('scan_trigger_ch0')
+
+    def stream(self, chunk_time=0.5, duration=None, sinks=(), trigger=False, poll_interval=None):
+        """
+        Continuous background scan read in half-buffers while the board fills the other half,
+        see DaqScanSession.stream
+        """
+        if self._session is not None:
+            yield from self._session.stream(chunk_time, duration, sinks, trigger, poll_interval)
+        else:
+            with DaqScanSession(self) as session:
+                yield from session.stream(chunk_time, duration, sinks, trigger, poll_interval)
+
+    def record(self, duration, sinks, chunk_time=0.5, trigger=False):
+        """
+        runs stream for duration without keeping the data, only the sinks get it
+        :return: number of points per channel recorded
+        """
+        num_points = 0
+        for chunk in self.stream(chunk_time=chunk_time, duration=duration, sinks=sinks, trigger=trigger):
+            num_points += len(chunk)
+        return num_points
 
-        ai_range = ai_info.supported_ranges[self.voltage_range]
-        scan_options = ScanOptions.EXTTRIGGER
-        
-        memhandle = ul.win_buf_alloc(total_count)
-        ctypes_array = cast(memhandle, POINTER(c_ushort))
-        
-        # Check if the buffer was successfully allocated
-        if not memhandle:
-            raise Exception('Failed to allocate memory')
-        
-        low_threshold, high_threshold = self.get_threshold_counts(ai_range, low_threshold_volts, high_threshold_volts)
-        ul.set_trigger(self.board_num, trig_type, low_threshold, high_threshold)
-        ul.a_in_scan(self.board_num, low_chan, high_chan, total_count, self.sampling_rate, ai_range, memhandle, scan_options)
-        
-        if self.status:
-            print('Scan completed successfully.')
-        
-        data = np.zeros((points_per_channel,num_chans))
-        tlist = np.linspace(0,self.measurement_time,num = points_per_channel,endpoint = True)
-        
-        # Print the data
-        data_index = 0
-        for i in range(points_per_channel):
-            for j in range(num_chans):
-                eng_value = ul.to_eng_units(self.board_num, ai_range, ctypes_array[data_index])
-                data[i,j] = eng_value
-                data_index += 1
-        if self.status:
-            print('Data copied from buffer - complete.')
-        
-        if memhandle:
-            # Free the buffer in a finally block to prevent  a memory leak.
-            ul.win_buf_free(memhandle)
-        
-        return tlist, data
-    
     def get_threshold_counts(self, ai_range, low_threshold_volts, high_threshold_volts):
         
         ai_info = self.daq_dev_info.get_ai_info()
@@ -271,5 +223,340 @@ class mcc_daq:
         range_max = voltage_range.range_max
         return int((full_scale_count / (range_max - range_min) * (volts - range_min)))
 
+class DaqScanSession():
+
+    def __init__(self, daq):
+        """
+        Keeps what the scans of an mcc_daq need between captures: AI info, channels and range
+        (voltage_range as set when the session opens), trigger threshold counts and a pool of
+        scan buffers per (buffer type, size). Buffers are reused by the next scan of the same
+        size and freed on close(), called when the with block exits.
+        :param daq: mcc_daq after device_detect()
+        """
+        self.daq = daq
+        self.board_num = daq.board_num
+        self.ai_info = daq.daq_dev_info.get_ai_info()
+        self.low_chan = 0
+        self.high_chan = min(3, self.ai_info.num_chans - 1)
+        self.num_chans = self.high_chan - self.low_chan + 1
+        self.ai_range = self.ai_info.supported_ranges[daq.voltage_range]
+        self.scaled = ScanOptions.SCALEDATA in self.ai_info.supported_scan_options
+        self.raw_type = '16 bit' if self.ai_info.resolution <= 16 else '32 bit'
+
+        self._thresholds = {}
+        self._free = {}             # (buffer type, count): [memhandle, ...]
+        self._buffers = {}          # memhandle: (buffer type, count)
+
+    def __enter__(self):
+        if self.daq._session is None:
+            self.daq._session = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_buffer(self, count, buffer_type):
+        """
+        :param buffer_type: 'scaled' (c_double volts), '16 bit' (c_ushort) or '32 bit' (c_ulong counts)
+        :return: memhandle, ctypes array on it, hand it back with release_buffer
+        """
+        alloc, ctype = BUFFER_TYPES[buffer_type]
+        free = self._free.setdefault((buffer_type, count), [])
+        if free:
+            memhandle = free.pop()
+        else:
+            memhandle = getattr(ul, alloc)(count)
+            if not memhandle:
+                raise Exception('Failed to allocate memory')
+            self._buffers[memhandle] = (buffer_type, count)
+        return memhandle, cast(memhandle, POINTER(ctype))
+
+    def release_buffer(self, memhandle):
+        self._free[self._buffers[memhandle]].append(memhandle)
+
+    def threshold_counts(self, low_threshold_volts, high_threshold_volts):
+        key = (low_threshold_volts, high_threshold_volts)
+        if key not in self._thresholds:
+            self._thresholds[key] = self.daq.get_threshold_counts(self.ai_range, low_threshold_volts,
+                                                                  high_threshold_volts)
+        return self._thresholds[key]
+
+    def close(self):
+        """ frees every buffer of the pool """
+        for memhandle in self._buffers:
+            ul.win_buf_free(memhandle)
+        self._buffers = {}
+        self._free = {}
+        if self.daq._session is self:
+            self.daq._session = None
+
+    def scan(self):
+        daq = self.daq
+        points_per_channel = int(daq.measurement_time * daq.sampling_rate)
+        total_count = points_per_channel * self.num_chans
+
+        scan_options = ScanOptions.FOREGROUND
+        if self.scaled:
+            # If the hardware supports the SCALEDATA option, it is easiest to
+            # use it.
+            scan_options |= ScanOptions.SCALEDATA
+            memhandle, ctypes_array = self.get_buffer(total_count, 'scaled')
+        else:
+            memhandle, ctypes_array = self.get_buffer(total_count, self.raw_type)
+
+        try:
+            ul.a_in_scan(
+                self.board_num, self.low_chan, self.high_chan, total_count,
+                daq.sampling_rate, self.ai_range, memhandle, scan_options)
+            if daq.status:
+                print('Scan completed successfully.')
+
+            tlist = np.linspace(0,daq.measurement_time,num = points_per_channel,endpoint = True)
+            data = daq.buffer_to_volts(ctypes_array, points_per_channel, self.num_chans, self.ai_range,
+                                       self.ai_info.resolution, scaled=self.scaled)
+            if daq.status:
+                print('Data copied from buffer - complete.')
+        finally:
+            self.release_buffer(memhandle)
+
+        return tlist, data
+
+    def scan_exttrigger(self):
+        daq = self.daq
+        points_per_channel = int(daq.measurement_time * daq.sampling_rate)
+        total_count = points_per_channel * self.num_chans
+
+        # finite background scan: the board stops at total_count, nothing overwrites the trigger onset
+        scan_options = ScanOptions.BACKGROUND | ScanOptions.EXTTRIGGER
+        memhandle, ctypes_array = self.get_buffer(total_count, self.raw_type)
+
+        if daq.status:
+            print('Waiting for a trigger...')
+
+        try:
+            ul.a_in_scan(
+                self.board_num, self.low_chan, self.high_chan, total_count,
+                daq.sampling_rate, self.ai_range, memhandle, scan_options)
+            try:
+                status, curr_count, curr_index = ul.get_status(self.board_num, FunctionType.AIFUNCTION)
+
+                while status != Status.IDLE and curr_count < total_count:
+                    # never sleep past the expected end of the scan
+                    time_left = (total_count - curr_count) / self.num_chans / daq.sampling_rate
+                    sleep(max(min(0.01, daq.measurement_time / 100, time_left), 1e-4))
+                    status, curr_count, curr_index = ul.get_status(self.board_num, FunctionType.AIFUNCTION)
+            finally:
+                ul.stop_background(self.board_num, FunctionType.AIFUNCTION)
+
+            if daq.status:
+                print('Scan completed successfully.')
+
+            tlist = np.linspace(0,daq.measurement_time,num = points_per_channel,endpoint = True)
+            data = daq.buffer_to_volts(ctypes_array, points_per_channel, self.num_chans, self.ai_range,
+                                       self.ai_info.resolution)
+            if daq.status:
+                print('Data copied from buffer - complete.')
+        finally:
+            self.release_buffer(memhandle)
+
+        return tlist, data
+
+    def scan_trigger_ch0(self):
+        daq = self.daq
+        points_per_channel = int(daq.measurement_time * daq.sampling_rate)
+        total_count = points_per_channel * self.num_chans
+
+        trig_type = TrigType.TRIG_ABOVE
+        low_threshold_volts = 0.1
+        high_threshold_volts = 0.3
+
+        scan_options = ScanOptions.EXTTRIGGER
+        memhandle, ctypes_array = self.get_buffer(total_count, self.raw_type)
+
+        try:
+            low_threshold, high_threshold = self.threshold_counts(low_threshold_volts, high_threshold_volts)
+            ul.set_trigger(self.board_num, trig_type, low_threshold, high_threshold)
+            ul.a_in_scan(self.board_num, self.low_chan, self.high_chan, total_count, daq.sampling_rate,
+                         self.ai_range, memhandle, scan_options)
+
+            if daq.status:
+                print('Scan completed successfully.')
+
+            tlist = np.linspace(0,daq.measurement_time,num = points_per_channel,endpoint = True)
+            data = daq.buffer_to_volts(ctypes_array, points_per_channel, self.num_chans, self.ai_range,
+                                       self.ai_info.resolution)
+            if daq.status:
+                print('Data copied from buffer - complete.')
+        finally:
+            self.release_buffer(memhandle)
+
+        return tlist, data
+
+    def stream(self, chunk_time=0.5, duration=None, sinks=(), trigger=False, poll_interval=None):
+        """
+        Continuous background scan read in half-buffers while the board fills the other half.
+        Generator of (points, channels) volt arrays of chunk_time each, memory use does not grow
+        with the recording length. Stops after duration (None: until the generator is closed),
+        the scan is stopped and the buffer freed when the generator ends or is closed.
+        Lost samples (buffer overwritten before it was read) are counted in daq.overruns and printed.
+
+            for chunk in session.stream(duration=60, sinks=[FileSink('shots.bin'), avg]):
+                ...
+
+        :param sinks: objects with write(chunk) (and optionally close()), e.g. FileSink,
+                      RunningAverage, Decimator, closed when the stream ends
+        :param trigger: wait for the external trigger to start (EXTTRIGGER)
+        :param poll_interval: seconds between ul.get_status polls, chunk_time / 4 by default
+        """
+        daq = self.daq
+        num_chans = self.num_chans
+        convert = daq.get_converter(self.ai_range, self.ai_info.resolution)
+
+        chunk_points = max(int(chunk_time * daq.sampling_rate), 1)
+        chunk_count = chunk_points * num_chans
+        total_count = 2 * chunk_count
+        max_count = None if duration is None else int(duration * daq.sampling_rate) * num_chans
+        if poll_interval is None:
+            poll_interval = max(chunk_time / 4, 1e-3)
+
+        scan_options = ScanOptions.CONTINUOUS | ScanOptions.BACKGROUND
+        if trigger:
+            scan_options |= ScanOptions.EXTTRIGGER
+        memhandle, ctypes_array = self.get_buffer(total_count, self.raw_type)
+
+        daq.overruns = 0
+        daq.samples_lost = 0
+        samples_read = 0
+        running = False
+        try:
+            ring = buffer_as_array(ctypes_array, total_count)
+            ul.a_in_scan(self.board_num, self.low_chan, self.high_chan, total_count,
+                         daq.sampling_rate, self.ai_range, memhandle, scan_options)
+            running = True
+            while max_count is None or samples_read < max_count:
+                status, curr_count, curr_index = ul.get_status(self.board_num, FunctionType.AIFUNCTION)
+                if curr_count - samples_read < chunk_count:
+                    if status == Status.IDLE:
+                        print('DAQ scan stopped after %d samples' % curr_count)
+                        break
+                    sleep(poll_interval)
+                    continue
+
+                start = samples_read % total_count
+                chunk = convert(ring[start:start + chunk_count].reshape((chunk_points, num_chans)))
+
+                # the board may have wrapped around onto this half while it was copied
+                status, curr_count, curr_index = ul.get_status(self.board_num, FunctionType.AIFUNCTION)
+                if curr_count > samples_read + total_count:
+                    skip_to = (curr_count // chunk_count) * chunk_count
+                    daq.overruns += 1
+                    daq.samples_lost += (skip_to - samples_read) // num_chans
+                    print('DAQ buffer overrun: %d points per channel lost (%d overruns), increase chunk_time'
+                          % (daq.samples_lost, daq.overruns))
+                    samples_read = skip_to
+                    continue
+
+                samples_read += chunk_count
+                if max_count is not None and samples_read > max_count:
+                    chunk = chunk[:chunk_points - (samples_read - max_count) // num_chans]
+                    samples_read = max_count
+                for sink in sinks:
+                    sink.write(chunk)
+                yield chunk
+        finally:
+            if running:
+                ul.stop_background(self.board_num, FunctionType.AIFUNCTION)
+            self.release_buffer(memhandle)
+            for sink in sinks:
+                if hasattr(sink, 'close'):
+                    sink.close()
+            if daq.status:
+                print('Streamed %d points per channel, %d overruns' % (samples_read // num_chans, daq.overruns))
+
+
+class FileSink():
+
+    def __init__(self, filepath, dtype='float32'):
+        """
+        appends the streamed chunks to a raw binary file, read it back with read_stream_file
+        :param dtype: 'float32' halves the file size (~1 uV resolution on 10 V)
+        """
+        self.filepath = filepath
+        self.dtype = np.dtype(dtype)
+        self.num_points = 0
+        self._file = open(filepath, 'ab')
+
+    def write(self, chunk):
+        np.ascontiguousarray(chunk, dtype=self.dtype).tofile(self._file)
+        self.num_points += len(chunk)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_stream_file(filepath, num_chans, dtype='float32'):
+    """ memmap of a FileSink file as (points, channels) """
+    return np.memmap(filepath, dtype=dtype, mode='r').reshape((-1, num_chans))
+
+
+class RunningAverage():
+
+    def __init__(self):
+        """ mean and standard deviation per channel over everything streamed """
+        self.num_points = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def write(self, chunk):
+        self.num_points += len(chunk)
+        self._sum = self._sum + chunk.sum(axis=0)
+        self._sum_sq = self._sum_sq + (chunk**2).sum(axis=0)
+
+    @property
+    def mean(self):
+        return self._sum / max(self.num_points, 1)
+
+    @property
+    def std(self):
+        return np.sqrt(np.maximum(self._sum_sq / max(self.num_points, 1) - self.mean**2, 0))
+
+
+class Decimator():
+
+    def __init__(self, factor, sink=None):
+        """
+        averages every factor points (boxcar), points left over at the end of a chunk are kept
+        for the next one
+        :param sink: gets the decimated chunks, if None they are collected (get_data)
+        """
+        self.factor = int(factor)
+        self.sink = sink
+        self._rest = None
+        self._chunks = []
+
+    def write(self, chunk):
+        if self._rest is not None:
+            chunk = np.concatenate((self._rest, chunk))
+        num = len(chunk) // self.factor * self.factor
+        self._rest = chunk[num:].copy()
+        if num == 0:
+            return
+        decimated = chunk[:num].reshape((-1, self.factor, chunk.shape[1])).mean(axis=1)
+        if self.sink is None:
+            self._chunks.append(decimated)
+        else:
+            self.sink.write(decimated)
+
+    def close(self):
+        if self.sink is not None and hasattr(self.sink, 'close'):
+            self.sink.close()
+
+    def get_data(self):
+        if not self._chunks:
+            return np.zeros((0, 0))
+        return np.concatenate(self._chunks)
+
+
 if __name__ == '__main__':
     run_example()
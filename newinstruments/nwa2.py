@@ -15,14 +15,92 @@ import os.path
 from matplotlib import pyplot as plt
 
 
+def parse_binblock(raw, dtype='<f8'):
+    """
+    Parses an IEEE-488.2 definite length block (#<n><length><data>) without copying the data
+    :param raw: bytes as returned by read_raw
+    :param dtype: numpy dtype including byte order, '<f8' for REAL,64 with FORM:BORD SWAP
+    :return: read-only np.ndarray view on raw
+    """
+    start = raw.find(b'#')
+    if start < 0:
+        raise ValueError('response is not an IEEE-488.2 block')
+    ndigits = int(raw[start + 1:start + 2])
+    offset = start + 2 + ndigits
+    if ndigits == 0:
+        # indefinite length block, data runs up to the terminating newline
+        offset = start + 2
+        length = len(raw) - offset - (1 if raw.endswith(b'\n') else 0)
+    else:
+        length = int(raw[start + 2:offset])
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(raw, dtype=dtype, count=length // itemsize, offset=offset)
+
+
+def segments_around(centers, span, points, ifbw=None):
+    """
+    Segment list covering a window of width span around every resonance, overlapping
+    windows are merged
+    :param centers: resonance frequencies in Hz
+    :param span: window width in Hz
+    :param points: points per window
+    :param ifbw: IF bandwidth of the windows, None keeps the channel IFBW
+    :return: [(start, stop, points, ifbw), ...] for E5071_2.set_segments
+    """
+    windows = sorted((c - span / 2, c + span / 2) for c in centers)
+    merged = []
+    for start, stop in windows:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+            merged[-1][2] += 1
+        else:
+            merged.append([start, stop, 1])
+    return [(start, stop, int(points * num), ifbw) for start, stop, num in merged]
+
+
+def segment_slices(segments):
+    """
+    Index ranges of every segment in the frequency axis of a segment sweep
+    """
+    slices = []
+    start = 0
+    for seg in segments:
+        slices.append(slice(start, start + int(seg[2])))
+        start += int(seg[2])
+    return slices
+
+
+def parse_ascii(raw):
+    """
+    Parses a comma separated ascii response (bytes or str) into a float64 array
+    """
+    if isinstance(raw, bytes):
+        raw = raw.decode()
+    return np.array(raw.strip().split(','), dtype=np.float64)
+
+
 class E5071_2(VisaInstrument):
     MAXSWEEPPTS = 1601
     default_port = 5025
+    DATA_FORMATS = {'ASC': None, 'REAL,32': 'f4', 'REAL,64': 'f8'}
 
     def __init__(self, name = 'E5071', address = 'GPIB0::2::INSTR', enabled=True, timeout=None):
 
         VisaInstrument.__init__(self, name, address, enabled, timeout=2e5)
         self.query_sleep = 0.1
+        # trace transfer format, see set_data_format
+        self.data_format = 'REAL,64'
+        self.byte_order = 'SWAP'
+        # configuration cache used by read_data, see get_cached
+        self._state = {}
+        self._data_format_applied = False
+        # traces of the current sweep per channel, see get_snapshot
+        self._snapshot = {}
+        # set by setup_single_sweep
+        self.single_sweep_average = False
+        self._trigger_state = None       # trigger source / continuous / averaging to restore
+        # last table loaded by set_segments
+        self.segments = None
 
     def get_id(self):
         #Identification query that will tell you about the device it is connected to
@@ -46,23 +124,27 @@ class E5071_2(VisaInstrument):
 
     def set_start_frequency(self, freq, channel=1):
         self.write(":SENS%d:FREQ:START %f" % (channel, freq))
+        self.invalidate('fpoints')
 
     def get_start_frequency(self, channel=1):
         return float(self.query(":SENS%d:FREQ:START?" % channel))
 
     def set_stop_frequency(self, freq, channel=1):
         self.write(":SENS%d:FREQ:STOP %f" % (channel, freq))
+        self.invalidate('fpoints')
 
     def get_stop_frequency(self, channel=1):
         return float(self.query(":SENS%d:FREQ:STOP?" % channel))
 
     def set_center_frequency(self, freq, channel=1):
         self.write(":SENS%d:FREQ:CENTer %f" % (channel, freq))
+        self.invalidate('fpoints')
 
     def get_center_frequency(self, channel=1):
         return float(self.query(":SENS%d:FREQ:CENTer?" % channel))
 
     def set_span(self, span, channel=1):
+        self.invalidate('fpoints')
         return self.write(":SENS%d:FREQ:SPAN %f" % (channel, span))
 
     def get_span(self, channel=1):
@@ -101,6 +183,7 @@ class E5071_2(VisaInstrument):
         return ans
 
     def clear_averages(self, channel=1):
+        self.new_sweep()
         self.write(":SENS%d:average:clear" % channel)
 
     def set_ifbw(self, bw, channel=1):
@@ -124,6 +207,7 @@ class E5071_2(VisaInstrument):
         Send a single trigger to all channels.
         :return: None
         """
+        self.new_sweep()
         if channel == None:
             self.write(':TRIG:SCOP ALL')
             self.write(':INIT:IMM')
@@ -148,20 +232,107 @@ class E5071_2(VisaInstrument):
         else:
             self.write(':TRIG:AVER OFF')
 
+    def setup_single_sweep(self, average=False, channel=1):
+        """
+        Sets the trigger source to BUS with continuous initiation, so that each :TRIG:SING
+        (trigger_bus_single) runs exactly one sweep (or one full averaging cycle if average=True).
+        *OPC / *OPC? only track a :TRIG:SING sent with the BUS source.
+        Used together with acquire_sweep instead of fixed sleeps. The trigger settings found are
+        put back by release_single_sweep.
+        :param average: bool, one trigger completes the whole averaging count
+        :param channel: channel number
+        :return: None
+        """
+        if self._trigger_state is None:
+            self._trigger_state = (self.get_trigger_source(), self.get_trigger_continuous(),
+                                   self.get_trigger_average_mode())
+        self.set_trigger_source('BUS')
+        self.set_trigger_continuous(True)
+        self.set_trigger_average_mode(average)
+        self.write('*CLS')
+        self.write('*ESE 1')
+        self.single_sweep_average = average
+
+    def release_single_sweep(self):
+        """
+        Restores the trigger source, continuous initiation and trigger averaging that
+        setup_single_sweep found (internal trigger, continuous sweeping if it was not called)
+        :return: None
+        """
+        source, continuous, average = self._trigger_state or ('INT', True, False)
+        self._trigger_state = None
+        self.set_trigger_average_mode(average)
+        self.set_trigger_source(source)
+        self.set_trigger_continuous(continuous)
+
+    def trigger_bus_single(self):
+        """
+        Triggers one sweep with the BUS trigger source (see setup_single_sweep), *OPC / *OPC?
+        complete when it is done.
+        :return: None
+        """
+        self.new_sweep()
+        self.write(':TRIG:SING')
+
+    def wait_for_completion(self, timeout=60, method='stb', poll_interval=0.01):
+        """
+        Waits until all pending operations (e.g. a triggered sweep) are done.
+        method='stb' sends *OPC and polls the status byte (ESB bit) with serial polls, which leaves
+        the bus free between polls. method='opc' blocks on *OPC? with the VISA timeout set to timeout.
+        :param timeout: seconds before a TimeoutError is raised
+        :return: waited time in seconds
+        """
+        t0 = time.perf_counter()
+        if method == 'opc':
+            old_timeout = self.instrument.timeout
+            self.instrument.timeout = timeout * 1000
+            try:
+                self.write('*OPC?')
+                self.read()
+            except Exception as err:
+                raise TimeoutError('VNA operation did not complete within %.1f s (%s)' % (timeout, err))
+            finally:
+                self.instrument.timeout = old_timeout
+        else:
+            self.write('*OPC')
+            while not int(self.read_stb()) & 32:
+                if time.perf_counter() - t0 > timeout:
+                    raise TimeoutError('VNA operation did not complete within %.1f s' % timeout)
+                time.sleep(poll_interval)
+            self.write('*CLS')
+        return time.perf_counter() - t0
+
+    def acquire_sweep(self, channel=1, timeout=60, method='stb'):
+        """
+        Triggers one sweep with :TRIG:SING (or one averaging cycle, see setup_single_sweep) and
+        returns as soon as the instrument reports it complete. The next readout transfers the new trace.
+        :param channel: channel number
+        :param timeout: seconds before a TimeoutError is raised
+        :param method: 'stb' or 'opc', see wait_for_completion
+        :return: sweep time in seconds
+        """
+        t0 = time.perf_counter()
+        if self.single_sweep_average:
+            self.clear_averages(channel)
+        self.trigger_bus_single()
+        self.wait_for_completion(timeout=timeout, method=method)
+        return time.perf_counter() - t0
+
     def get_trigger_average_mode(self):
         """
         Returns the trigger averaging mode. If True, the machine operates in a way where it keeps averaging
         a trace until averaging is complete, with only a SINGLE trigger necessary.
         :return: bool
         """
-        return bool(self.query(':TRIG:AVER?'))
+        return self.query(':TRIG:AVER?').strip() in ['1', 'ON']
 
     def set_trigger_source(self, source):
         """
         Sets the trigger source to one of the following:
-        IMMediate (internal source sends continuous trig signals), 
-        MANual (sends one trig signal when manually triggered), 
-        EXTernal (external rear panel source)
+        INTernal (internal source sends continuous trig signals),
+        MANual (sends one trig signal when manually triggered),
+        EXTernal (external rear panel source),
+        BUS (:TRIG:SING or *TRG, see setup_single_sweep)
         :param source: string
         :return: None
         """
@@ -279,6 +450,7 @@ class E5071_2(VisaInstrument):
         return float(self.query(":SOURCE%d:POWER?" % channel))
 
     def set_output(self, state=True):
+        self.new_sweep()
         if state==True or str(state).upper() == 'ON':
             self.write(":OUTPUT ON")
         elif state == False or str(state).upper() == 'OFF':
@@ -296,10 +468,12 @@ class E5071_2(VisaInstrument):
         with any name of choosing
         """
         self.write(':CALC%d:PAR:DEF %s, %s' % (channel, measure_name, mode))
+        self.invalidate('measure_defs', 'current_measure')
 
     def set_measure(self, measure_name, channel):
         #set measurement based on defined name
         self.write('CALC%d:PAR:SEL %s' % (channel, measure_name))
+        self.invalidate('current_measure')
 
     def get_current_measure(self, channel):
         if channel==None:
@@ -323,6 +497,7 @@ class E5071_2(VisaInstrument):
             self.write('CALC:PAR:DEL:ALL')
         else:
             self.write(':CALC%d:PAR:DEL %s' % (channel,measure_name))
+        self.invalidate('measure_defs', 'current_measure')
 
     def create_meas_in_window(self, channel, measure_name):
         #creating window for measurement
@@ -330,6 +505,7 @@ class E5071_2(VisaInstrument):
 
         #putting measurement setup in window
         self.write('DISP:WIND%d:TRAC%d:FEED %s' % (channel, channel, measure_name))
+        self.invalidate('current_measure')
 
     def close_window(self, channel):
         self.write('DISP:WIND%d:STATE OFF' % channel)
@@ -403,6 +579,7 @@ class E5071_2(VisaInstrument):
         :return: None
         """
         self.write(":SENSe%d:SWEep:POINts %f" % (channel, numpts))
+        self.invalidate('sweep_points', 'fpoints')
 
     def get_sweep_points(self, channel=1):
         """
@@ -420,6 +597,7 @@ class E5071_2(VisaInstrument):
         """
         if sweep_type.upper() in ["LIN", "LOG", "SEGM", "POW"]:
             self.write("SENS%d:SWE:TYPE %s" % (channel, sweep_type.upper()))
+            self.invalidate('sweep_type', 'fpoints')
         else:
             print("sweep_type must be one of LIN (linear frequency), LOG (logarithmic frequency), SEGM (segmented sweep) or POW (power sweep)")
 
@@ -427,6 +605,51 @@ class E5071_2(VisaInstrument):
         answer = self.query("SENS%d:SWE:TYPE?" % (channel))
         return answer.strip()
 
+    def set_segments(self, segments, channel=1):
+        """
+        Loads a segment table and switches to segment sweep. Every segment has its own start,
+        stop, points and (optional) IF bandwidth, the frequency axis is the concatenation of the
+        segments (see segments_around for windows around several resonances)
+        :param segments: list of (start, stop, points) or (start, stop, points, ifbw)
+        :param channel: channel number
+        :return: None
+        """
+        segments = [tuple(seg) + (None,) * (4 - len(seg)) for seg in segments]
+        per_segment_ifbw = any(seg[3] is not None for seg in segments)
+        if per_segment_ifbw and not all(seg[3] is not None for seg in segments):
+            ifbw = self.get_ifbw(channel)
+            segments = [seg if seg[3] is not None else seg[:3] + (ifbw,) for seg in segments]
+
+        num_points = sum(int(seg[2]) for seg in segments)
+        if num_points > self.MAXSWEEPPTS:
+            print('Warning: %d points in the segment table, the limit is %d' % (num_points, self.MAXSWEEPPTS))
+
+        # <buf>,<stim>,<ifbw>,<pow>,<del>,<time>,<segm>, then <start>,<stop>,<nop>[,<ifbw>] per segment
+        values = [5, 0, int(per_segment_ifbw), 0, 0, 0, len(segments)]
+        for start, stop, points, ifbw in segments:
+            values += [start, stop, int(points)] + ([ifbw] if per_segment_ifbw else [])
+        # 12 significant digits, %g would round GHz frequencies to ~10 kHz
+        self.write(":SENS%d:SEGM:DATA %s" % (channel, ','.join('%.12g' % v for v in values)))
+        self.write("SENS%d:SWE:TYPE SEGM" % channel)
+        self.segments = segments
+        self.invalidate('sweep_type', 'sweep_points', 'fpoints')
+
+    def get_segments(self, channel=1):
+        """
+        Reads the segment table back
+        :return: list of (start, stop, points, ifbw), ifbw is None without per-segment IFBW
+        """
+        values = parse_ascii(self.query(":SENS%d:SEGM:DATA?" % channel))
+        flags = [int(v) for v in values[1:6]]
+        num_segments = int(values[6])
+        # start, stop, nop plus one value per enabled setting (ifbw, power, delay, time)
+        size = 3 + sum(flags[1:])
+        segments = []
+        for k in range(num_segments):
+            seg = values[7 + k * size: 7 + (k + 1) * size]
+            segments.append((float(seg[0]), float(seg[1]), int(seg[2]), float(seg[3]) if flags[1] else None))
+        return segments
+
     def set_sweep_generation(self, channel, generation):
         self.write("SENS%d:SWE:GEN %s" % (channel, generation))
 
@@ -505,6 +728,94 @@ class E5071_2(VisaInstrument):
         self.create_meas_in_window(channel, measure_name)
 
     
+    # Data transfer format
+
+    def set_data_format(self, data_format='REAL,64', byte_order='SWAP'):
+        """
+        Sets the format used to transfer trace and frequency data.
+        Binary blocks are ~2-3x smaller than ascii and are parsed without a copy.
+        :param data_format: 'REAL,64', 'REAL,32' or 'ASC' (ascii fallback)
+        :param byte_order: 'SWAP' (little-endian, native on PCs) or 'NORM' (big-endian)
+        :return: None
+        """
+        data_format = data_format.upper().replace(' ', '')
+        if data_format not in self.DATA_FORMATS:
+            print('data_format must be one of ' + ', '.join(self.DATA_FORMATS))
+            return
+        self.data_format = data_format
+        self.byte_order = 'NORM' if byte_order.upper().startswith('NORM') else 'SWAP'
+        self.apply_data_format()
+
+    def get_data_format(self):
+        return self.query(':FORM:DATA?').strip()
+
+    def apply_data_format(self):
+        # sends the transfer format to the instrument
+        self.write(':FORM:DATA %s' % self.data_format)
+        if self.data_format != 'ASC':
+            self.write(':FORM:BORD %s' % self.byte_order)
+        self._data_format_applied = True
+
+    def get_data_dtype(self):
+        # numpy dtype of binary block values for the current transfer format
+        size = self.DATA_FORMATS[self.data_format]
+        if size is None:
+            return np.dtype(np.float64)
+        return np.dtype(('<' if self.byte_order == 'SWAP' else '>') + size)
+
+    def read_values(self, timeout=None):
+        """
+        Reads the response of a data query, binary blocks are detected by their leading '#',
+        anything else is parsed as ascii
+        :return: np.ndarray
+        """
+        raw = self.read_raw(timeout)
+        if raw[:1] == b'#':
+            return parse_binblock(raw, self.get_data_dtype())
+        return parse_ascii(raw)
+
+
+    # Cached configuration state
+    # read_data needs the measurement definition, sweep points/type and the frequency axis,
+    # they are queried once and kept until one of the setters above changes them.
+    # Call refresh() after changing settings from the front panel.
+
+    def get_cached(self, key, channel=1):
+        """
+        Returns a configuration value from the cache, querying the instrument only on a miss
+        :param key: 'measure_defs', 'current_measure', 'sweep_points', 'sweep_type', 'fpoints' or 'format'
+        """
+        if (key, channel) not in self._state:
+            getters = {
+                'measure_defs': self.get_measure_defs,
+                'current_measure': self.get_current_measure,
+                'sweep_points': self.get_sweep_points,
+                'sweep_type': self.get_sweep_type,
+                'fpoints': self.get_fpoints,
+                'format': self.get_format
+            }
+            self._state[(key, channel)] = getters[key](channel)
+        return self._state[(key, channel)]
+
+    def invalidate(self, *keys):
+        # drops cached values (all channels), no keys drops everything
+        self.new_sweep()
+        if not keys:
+            self._state = {}
+        else:
+            self._state = {k: v for k, v in self._state.items() if k[0] not in keys}
+
+    def refresh(self, channel=1):
+        """
+        Re-reads the whole configuration from the instrument, e.g. after the front panel was touched
+        """
+        self.invalidate()
+        self._data_format_applied = False
+        for key in ['measure_defs', 'current_measure', 'sweep_points', 'sweep_type', 'format', 'fpoints']:
+            self.get_cached(key, channel)
+        self.apply_data_format()
+
+
     # File operations
         
     def save_file(self, fname):
@@ -516,6 +827,7 @@ class E5071_2(VisaInstrument):
         {MLOGarithmic|PHASe|GDELay| SLINear|SLOGarithmic|SCOMplex|SMITh|SADMittance|PLINear|PLOGarithmic|POLar|MLINear|SWR|REAL| IMAGinary|UPHase|PPHase}
         """
         self.write(":CALC%d:FORM %s" % (channel, trace_format))
+        self.invalidate('format')
 
     def get_format(self, channel=1):
         """
@@ -529,8 +841,9 @@ class E5071_2(VisaInstrument):
         This command gives the frequency points of current configuration
         https://mcs-testequipment.com/content/files/Ceyear-3656-Series-Programming-Manual.pdf motherfuvkre
         """
-        answer = self.query('SENS:X?')
-        return np.fromstring(answer, dtype=np.float64, sep=',')
+        self.write('SENS:X?')
+        time.sleep(self.query_sleep)
+        return self.read_values()
 
     def read_data(self, channel=1, timeout=None, sweep_type=None):
         """
@@ -540,49 +853,87 @@ class E5071_2(VisaInstrument):
         :return: np.vstack((fpts, data))
         """
         #self.get_operation_completion()
-        measure_def = self.get_measure_defs(channel).strip()
-        currmeas = self.get_current_measure(channel).strip()
+        measure_def = self.get_cached('measure_defs', channel).strip()
+        currmeas = self.get_cached('current_measure', channel).strip()
         if measure_def != '"NO CATALOG"' and  currmeas != '""':
-            self.write(":FORM:DATA ASC") # sets to ASCii formatting
+            if not self._data_format_applied:
+                self.apply_data_format() # binary blocks unless set_data_format('ASC')
             self.write(":CALC%d:DATA? FDATA" % channel)
             time.sleep(self.query_sleep)
 
             if timeout is None:
                 timeout = self.timeout
 
-            data_temp = self.read(timeout=timeout)
-            data_str = ''.join([ss for ss in data_temp])
-            data = np.fromstring(data_str, dtype=float, sep=',')
-            sweep_points = int(self.get_sweep_points())
-            sweep_type = self.get_sweep_type(channel=channel) if sweep_type is None else sweep_type
+            data = self.read_values(timeout=timeout)
+            sweep_type = self.get_cached('sweep_type', channel) if sweep_type is None else sweep_type
 
-            fpts = self.get_fpoints()
+            fpts = self.get_cached('fpoints', channel)
             # print(len(fpts), len(data))
 
-            if len(data) == 2 * sweep_points:
+            # segment sweeps: the axis is non-uniform and the number of points is the sum of the segments
+            if len(data) == 2 * len(fpts):
                 data = data.reshape((-1, 2))
                 data = data.transpose()
                 return np.vstack((fpts, data))
             else:
                 return np.vstack((fpts, data))
         else:
+            # don't keep a missing definition, it may be created from the front panel
+            self.invalidate('measure_defs', 'current_measure')
             print('no measure definition')
 
-    def read_data_y1(self):
+    # Per-sweep acquisition snapshot
+    # the vna_freq / vna_y1 / vna_y2 readouts of one loop iteration share a single read_data transfer.
+    # The snapshot is dropped when the next sweep is armed (new_sweep, set_output, trigger_single,
+    # clear_averages) or when the configuration changes.
+
+    def new_sweep(self):
+        """
+        Marks the start of a new sweep, the next readout transfers a fresh trace
+        :return: None
+        """
+        self._snapshot = {}
+
+    def get_snapshot(self, channel=1):
+        """
+        Returns the trace of the current sweep, reading it from the instrument only once
+        :param channel: channel number
+        :return: np.vstack((fpts, data)) as in read_data
+        """
+        if channel not in self._snapshot:
+            dat = self.read_data(channel)
+            if dat is None:
+                return None
+            self._snapshot[channel] = dat
+        return self._snapshot[channel]
+
+    def read_data_freq(self, channel=1):
+        """
+        Frequency axis of the current sweep
+        :param channel: channel number
+        :return: np.ndarray
+        """
+        dat = self.get_snapshot(channel)
+        return dat[0,:]
+
+    def read_data_y1(self, channel=1):
         """
         Read current NWA Data, output depends on format, for mag phase, use set_format('SLOG')
         :param channel: channel number
-        :param timeout: optional, query timeout in ms.
-        :return: np.vstack((fpts, data))
+        :return: first data row of the current sweep
         """
-        dat = self.read_data()
+        dat = self.get_snapshot(channel)
         return dat[1,:]
     
-    def read_data_y2(self):
-        form = self.get_format().strip()
-        print(form)
+    def read_data_y2(self, channel=1):
+        """
+        Second data row of the current sweep, only for two-value formats (SMIT, POL, SADM)
+        :param channel: channel number
+        :return: np.ndarray or None
+        """
+        form = self.get_cached('format', channel).strip()
         if form in ['SMIT', 'POL', 'SADM']:
-            dat = self.read_data()
+            dat = self.get_snapshot(channel)
             return dat[2,:]
         else:
             print('Not a valid format for this function')
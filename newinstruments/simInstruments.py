@@ -0,0 +1,786 @@
+"""
+Simulated instruments for running the experiment code without the cryostat.
+
+SimE5071Resource answers the SCPI subset used by nwa2.E5071_2 like a pyvisa
+resource (write / read / read_raw), including ascii and binary (REAL,32 /
+REAL,64) trace transfers. Bus time is emulated with a fixed per-command
+latency plus a transfer rate in bytes per second. Sweeps take sweep_time
+seconds (times the averaging count with :TRIG:AVER ON). As on the E5071C,
+*OPC? and the ESB bit (*OPC) only wait for a :TRIG:SING sent with the BUS
+trigger source, :INIT:IMM sweeps are not tracked.
+
+    vna = E5071_2(address='GPIB0::2::INSTR', enabled=False)
+    attach_resource(vna, SimE5071Resource(sweep_points=1601))
+
+SimSource and SimLockin stand in for the pymeasure YokogawaGS200 / SR844
+objects used in the control and readout dictionaries (same attribute and
+method names). The lock-in follows the voltages of the sources it listens to
+through a first order low pass with its time_constant, so settling can be
+exercised. SimBlueForsLogs writes log folders in the BlueFors format that
+newinstruments.BlueFors reads.
+
+SimSA124B stands in for the sadevice.sa_api module (same function names,
+constants and return dicts) with one simulated analyzer, and is passed to
+SignalHound.SignalHoundSA124B(api=...).
+"""
+
+import os
+import re
+import time
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+
+
+def attach_resource(instrument, resource):
+    """
+    Plugs a simulated resource into a VisaInstrument created with enabled=False
+    """
+    instrument.instrument = resource
+    instrument.protocol = 'VISA'
+    instrument.enabled = True
+    return instrument
+
+
+class SimE5071Resource():
+
+    # formats returning two values per point that are both meaningful
+    COMPLEX_FORMATS = ['SMIT', 'SMITH', 'POL', 'POLAR', 'SADM', 'SADMITTANCE', 'SCOM', 'SCOMPLEX']
+
+    def __init__(self, sweep_points=201, start_freq=4e9, stop_freq=6e9, trace_format='MLOG',
+                 latency=0.0, bytes_per_sec=None, res_freq=None, res_width=1e6, sweep_time=0.05):
+        """
+        :param latency: seconds added to every write and every read
+        :param bytes_per_sec: emulated bus throughput for responses, None for unlimited
+        :param res_freq: resonance frequency (or list of them) of the simulated trace, center of the span if None
+        :param sweep_time: duration of one sweep in seconds
+        """
+        self.sweep_points = int(sweep_points)
+        self.start_freq = float(start_freq)
+        self.stop_freq = float(stop_freq)
+        self.trace_format = trace_format
+        self.latency = latency
+        self.bytes_per_sec = bytes_per_sec
+        self.res_freq = res_freq
+        self.res_width = res_width
+
+        self.data_format = 'ASC'
+        self.byte_order = 'NORM'
+        self.measure_name = 'MeaS21'
+        self.measure_type = 'S21'
+        self.sweep_type = 'LIN'
+        self.segments = []
+        self.segment_data = [5, 0, 0, 0, 0, 0, 0]
+        self.output = False
+        self.timeout = 2e5
+        self.sweep_time = sweep_time
+        self.averages = 1
+        self.average_state = False
+        self.trigger_average = False
+        self.continuous = True
+        self.trigger_source = 'INT'
+        self.errors = []              # rejected commands
+        self.ese = 0
+        self.esr = 0
+        self._sweep_done_at = 0.0
+        self._opc_done_at = 0.0       # end of the last :TRIG:SING (BUS), what *OPC tracks
+        self._opc_pending = False
+
+        self.num_writes = 0
+        self.num_reads = 0
+        self.bytes_read = 0
+        self._response = b''
+
+    # pyvisa resource interface
+
+    def write(self, cmd):
+        self.num_writes += 1
+        self._wait(0)
+        cmd = cmd.strip()
+        if cmd.endswith('?') or '?' in cmd.split(' ')[0]:
+            self._response = self.respond(cmd)
+        else:
+            self.configure(cmd)
+
+    def read_raw(self):
+        response, self._response = self._response, b''
+        self.num_reads += 1
+        self.bytes_read += len(response)
+        self._wait(len(response))
+        return response
+
+    def read(self):
+        return self.read_raw().decode().rstrip('\n')
+
+    def query(self, cmd):
+        self.write(cmd)
+        return self.read()
+
+    def read_stb(self):
+        self._wait(0)
+        self._update_esr()
+        return 32 if self.esr & self.ese else 0
+
+    def close(self):
+        pass
+
+    def _update_esr(self):
+        if self._opc_pending and time.perf_counter() >= self._opc_done_at:
+            self.esr |= 1
+            self._opc_pending = False
+
+    def trigger(self):
+        num = self.averages if (self.trigger_average and self.average_state) else 1
+        self._sweep_done_at = time.perf_counter() + self.sweep_time * num
+
+    def _wait(self, nbytes):
+        delay = self.latency
+        if self.bytes_per_sec:
+            delay += nbytes / self.bytes_per_sec
+        if delay > 0:
+            time.sleep(delay)
+
+    # simulated state
+
+    def get_freqs(self):
+        if self.sweep_type.startswith('SEGM') and self.segments:
+            return np.concatenate([np.linspace(start, stop, int(points)) for start, stop, points in self.segments])
+        return np.linspace(self.start_freq, self.stop_freq, self.sweep_points)
+
+    def get_trace(self):
+        """
+        Complex S21 of Lorentzian dips (one per res_freq), returned as the two FDATA values per point
+        """
+        f = self.get_freqs()
+        f0 = 0.5 * (self.start_freq + self.stop_freq) if self.res_freq is None else self.res_freq
+        s21 = np.ones(len(f), dtype=complex)
+        for center in np.atleast_1d(f0):
+            s21 *= 1 - 0.8 / (1 + 2j * (f - center) / self.res_width)
+        form = self.trace_format.upper()
+        if form in self.COMPLEX_FORMATS:
+            return np.column_stack((s21.real, s21.imag)).ravel()
+        if form.startswith('MLOG'):
+            y = 20 * np.log10(np.abs(s21))
+        elif form.startswith('PHAS') or form.startswith('UPH'):
+            y = np.degrees(np.angle(s21))
+        else:
+            y = np.abs(s21)
+        return np.column_stack((y, np.zeros_like(y))).ravel()
+
+    def encode_values(self, values):
+        """
+        Encodes values with the current :FORM:DATA / :FORM:BORD setting
+        """
+        if self.data_format == 'ASC':
+            return (','.join('%+.15E' % v for v in values) + '\n').encode()
+        size = 4 if self.data_format == 'REAL,32' else 8
+        dtype = ('<' if self.byte_order == 'SWAP' else '>') + 'f%d' % size
+        payload = np.asarray(values, dtype=dtype).tobytes()
+        length = str(len(payload))
+        return b'#' + str(len(length)).encode() + length.encode() + payload + b'\n'
+
+    def configure(self, cmd):
+        head, _, arg = cmd.partition(' ')
+        head = head.upper().lstrip(':')
+        arg = arg.strip()
+        if head == 'FORM:DATA':
+            self.data_format = arg.upper().replace(' ', '')
+        elif head == 'FORM:BORD':
+            self.byte_order = 'SWAP' if arg.upper().startswith('SWAP') else 'NORM'
+        elif re.match(r'SENSE?\d*:SWE(EP)?:POIN(TS)?$', head):
+            self.sweep_points = int(float(arg))
+        elif re.match(r'SENSE?\d*:FREQ:STAR(T)?$', head):
+            self.start_freq = float(arg)
+        elif re.match(r'SENSE?\d*:FREQ:STOP$', head):
+            self.stop_freq = float(arg)
+        elif re.match(r'SENSE?\d*:FREQ:SPAN$', head):
+            center = 0.5 * (self.start_freq + self.stop_freq)
+            self.start_freq, self.stop_freq = center - float(arg) / 2, center + float(arg) / 2
+        elif re.match(r'SENSE?\d*:FREQ:CENT(ER)?$', head):
+            span = self.stop_freq - self.start_freq
+            self.start_freq, self.stop_freq = float(arg) - span / 2, float(arg) + span / 2
+        elif re.match(r'SENSE?\d*:SWE:TYPE$', head):
+            self.sweep_type = arg.upper()
+        elif re.match(r'SENSE?\d*:SEGM:DATA$', head):
+            values = [float(v) for v in arg.split(',')]
+            size = 3 + sum(int(v) for v in values[2:6])
+            self.segment_data = values
+            self.segments = [values[7 + k * size: 10 + k * size] for k in range(int(values[6]))]
+        elif re.match(r'CALC\d*:FORM$', head):
+            self.trace_format = arg.upper()
+        elif re.match(r'CALC\d*:PAR:DEF$', head):
+            name, _, mtype = arg.partition(',')
+            self.measure_name, self.measure_type = name.strip(), mtype.strip()
+        elif head == 'CALC:PAR:DEL:ALL':
+            self.measure_name = None
+        elif head == 'OUTPUT':
+            self.output = arg.upper() in ['ON', '1']
+        elif re.match(r'INIT\d*:IMM$', head):
+            self.trigger()
+        elif re.match(r'TRIG(:SEQ)?:SING$', head):
+            if self.trigger_source == 'BUS':
+                self.trigger()
+                self._opc_done_at = self._sweep_done_at
+            else:
+                self.errors.append('-211,"Trigger ignored"')
+        elif re.match(r'TRIG(:SEQ)?:SOUR$', head):
+            source = arg.upper()[:3]
+            if source in ['INT', 'EXT', 'MAN', 'BUS']:
+                self.trigger_source = source
+            else:
+                self.errors.append('-224,"Illegal parameter value"')
+        elif head == 'INIT:CONT':
+            self.continuous = arg.upper() in ['ON', '1']
+        elif head == 'TRIG:AVER':
+            self.trigger_average = arg.upper() in ['ON', '1']
+        elif re.match(r'SENSE?\d*:AVER(AGE)?:COUN(T)?$', head):
+            self.averages = int(float(arg))
+        elif re.match(r'SENSE?\d*:AVER(AGE)?:STAT(E)?$', head):
+            self.average_state = arg.upper() in ['ON', '1']
+        elif re.match(r'SENSE?\d*:SWE:TIME$', head):
+            self.sweep_time = float(arg)
+        elif head == '*CLS':
+            self.esr = 0
+            self._opc_pending = False
+        elif head == '*ESE':
+            self.ese = int(arg)
+        elif head == '*OPC':
+            self._opc_pending = True
+
+    def respond(self, cmd):
+        head = cmd.split(' ')[0].upper().lstrip(':')
+        if head == '*IDN?':
+            return b'SIMULATED,E5071,0,0\n'
+        if head == '*OPC?':
+            remaining = self._opc_done_at - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            return b'+1\n'
+        if re.match(r'SENSE?\d*:SWE:TIME\?$', head):
+            return b'%+.15E\n' % self.sweep_time
+        if head == 'FORM:DATA?':
+            return (self.data_format + '\n').encode()
+        if re.match(r'CALC\d*:DATA\?$', head):
+            return self.encode_values(self.get_trace())
+        if head == 'SENS:X?' or re.match(r'SENSE?\d*:FREQ:DATA\?$', head):
+            return self.encode_values(self.get_freqs())
+        if re.match(r'SENSE?\d*:SWE(EP)?:POIN(TS)?\?$', head):
+            return b'%d\n' % self.sweep_points
+        if re.match(r'SENSE?\d*:SEGM:DATA\?$', head):
+            return (','.join('%+.15E' % v for v in self.segment_data) + '\n').encode()
+        if re.match(r'SENSE?\d*:SWE:TYPE\?$', head):
+            return (self.sweep_type + '\n').encode()
+        if re.match(r'SENSE?\d*:FREQ:STAR(T)?\?$', head):
+            return b'%+.15E\n' % self.start_freq
+        if re.match(r'SENSE?\d*:FREQ:STOP\?$', head):
+            return b'%+.15E\n' % self.stop_freq
+        if re.match(r'CALC\d*:FORM\?$', head):
+            return (self.trace_format + '\n').encode()
+        if re.match(r'CALC\d*:PAR:CAT\?$', head):
+            if self.measure_name is None:
+                return b'"NO CATALOG"\n'
+            return ('"%s,%s"\n' % (self.measure_name, self.measure_type)).encode()
+        if re.match(r'CALC\d*:PAR:SEL\?$', head):
+            return ('"%s"\n' % (self.measure_name or '')).encode()
+        if head == 'OUTPUT?':
+            return b'1\n' if self.output else b'0\n'
+        if re.match(r'TRIG(:SEQ)?:SOUR\?$', head):
+            return (self.trigger_source + '\n').encode()
+        if head == 'TRIG:AVER?':
+            return b'1\n' if self.trigger_average else b'0\n'
+        if head == 'INIT:CONT?':
+            return b'1\n' if self.continuous else b'0\n'
+        return b'0\n'
+
+
+class SimSource():
+
+    def __init__(self, address='GPIB1::1::INSTR', latency=0.0, ramp_scale=1.0):
+        """
+        YokogawaGS200-like voltage source
+        :param latency: seconds every set / get of source_voltage takes
+        :param ramp_scale: multiplies the pause between ramp steps, 0 makes ramps instantaneous
+        """
+        self.address = address
+        self.latency = latency
+        self.ramp_scale = ramp_scale
+        self.source_enabled = True
+        self.listeners = []
+        self.num_sets = 0
+        self._voltage = 0.0
+
+    @property
+    def source_voltage(self) -> float:
+        time.sleep(self.latency)
+        return self._voltage
+
+    @source_voltage.setter
+    def source_voltage(self, value: float) -> None:
+        time.sleep(self.latency)
+        self._voltage = float(value)
+        self.num_sets += 1
+        for listener in self.listeners:
+            listener.input_changed()
+
+    def ramp_to_voltage(self, target_voltage, steps=30, pause=20e-3):
+        voltages = np.linspace(self._voltage, target_voltage, int(steps))
+        for voltage in voltages:
+            self.source_voltage = voltage
+            time.sleep(pause * self.ramp_scale)
+        self.source_voltage = target_voltage
+
+
+class SimLockin():
+
+    def __init__(self, address='GPIB1::11::INSTR', sources=(), gain=1e-3, noise=1e-7, time_constant=0.1,
+                 latency=0.0, phase=30.0):
+        """
+        SR844-like lock-in, the signal is gain * sum of the source voltages (plus noise),
+        seen through a first order low pass
+        :param sources: SimSource objects the signal depends on
+        :param latency: seconds every attribute read takes
+        :param phase: signal phase in degrees, splits the signal between x and y
+        """
+        self.address = address
+        self.sources = list(sources)
+        self.gain = gain
+        self.noise = noise
+        self.time_constant = time_constant
+        self.latency = latency
+        self.phase = phase
+        self.sensitivity = 1.0
+        self.frequency = 1e6
+        self.num_reads = 0
+        self._lock = threading.Lock()
+        self._target = self.get_input()
+        self._start = self._target
+        self._t_change = time.perf_counter()
+        for source in self.sources:
+            source.listeners.append(self)
+
+    def get_input(self) -> float:
+        return self.gain * sum(source._voltage for source in self.sources)
+
+    def _filtered(self, now) -> float:
+        tc = max(self.time_constant, 1e-9)
+        return self._target + (self._start - self._target) * np.exp(-(now - self._t_change) / tc)
+
+    def input_changed(self) -> None:
+        with self._lock:
+            now = time.perf_counter()
+            self._start = self._filtered(now)
+            self._target = self.get_input()
+            self._t_change = now
+
+    def _read(self) -> float:
+        time.sleep(self.latency)
+        self.num_reads += 1
+        with self._lock:
+            value = self._filtered(time.perf_counter())
+        return value + self.noise * np.random.randn()
+
+    @property
+    def magnitude(self) -> float:
+        return abs(self._read())
+
+    @property
+    def x(self) -> float:
+        return self._read() * np.cos(np.radians(self.phase))
+
+    @property
+    def y(self) -> float:
+        return self._read() * np.sin(np.radians(self.phase))
+
+    @property
+    def theta(self) -> float:
+        time.sleep(self.latency)
+        return self.phase
+
+
+class SimBlueForsLogs():
+
+    # maxigauge channel names as written by the BlueFors control software
+    GAUGES = ['CH1', 'CH2', 'CH3', 'CH4', 'CH5', 'CH6']
+
+    def __init__(self, folder_path, temperatures=None, pressures=None, noise=1e-3):
+        """
+        Writes BlueFors style log folders (one folder yy-mm-dd per day) into folder_path
+        :param temperatures: {channel: temperature in K}, defaults to a cold fridge
+        :param pressures: six pressures in mbar
+        :param noise: relative noise of the logged values
+        """
+        self.folder_path = folder_path
+        self.temperatures = {1: 45.0, 2: 3.2, 5: 0.85, 6: 0.012} if temperatures is None else temperatures
+        self.pressures = [1.5e-2, 2.1e-1, 5.0e-3, 4.1e2, 6.3e2, 8.5e2] if pressures is None else pressures
+        self.noise = noise
+        os.makedirs(folder_path, exist_ok=True)
+
+    def get_folder(self, when) -> str:
+        folder = os.path.join(self.folder_path, when.strftime('%y-%m-%d'))
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def temperature_line(self, when, channel) -> str:
+        value = self.temperatures[channel] * (1 + self.noise * np.random.randn())
+        return when.strftime(' %d-%m-%y,%H:%M:%S') + ',%.6E\n' % value
+
+    def pressure_line(self, when) -> str:
+        fields = [when.strftime('%d-%m-%y,%H:%M:%S')]
+        for name, pressure in zip(self.GAUGES, self.pressures):
+            value = pressure * (1 + self.noise * np.random.randn())
+            fields += [name, '       ', '1', '%.2E' % value, '0', '1']
+        return ','.join(fields) + ',\n'
+
+    def append(self, when=None) -> None:
+        """
+        Appends one line to every log file of the day of `when` (now by default)
+        """
+        when = datetime.now() if when is None else when
+        folder = self.get_folder(when)
+        day = when.strftime('%y-%m-%d')
+        for channel in self.temperatures:
+            with open(os.path.join(folder, 'CH%d T %s.log' % (channel, day)), 'a') as f:
+                f.write(self.temperature_line(when, channel))
+        with open(os.path.join(folder, 'maxigauge %s.log' % day), 'a') as f:
+            f.write(self.pressure_line(when))
+
+    def write_history(self, start, num_lines, interval=60.0) -> None:
+        """
+        Writes num_lines samples every interval seconds from start on, across day folders
+        """
+        lines = {}
+        for k in range(num_lines):
+            when = start + timedelta(seconds=k * interval)
+            folder = self.get_folder(when)
+            day = when.strftime('%y-%m-%d')
+            for channel in self.temperatures:
+                path = os.path.join(folder, 'CH%d T %s.log' % (channel, day))
+                lines.setdefault(path, []).append(self.temperature_line(when, channel))
+            path = os.path.join(folder, 'maxigauge %s.log' % day)
+            lines.setdefault(path, []).append(self.pressure_line(when))
+        for path, content in lines.items():
+            with open(path, 'a') as f:
+                f.writelines(content)
+
+
+class SimSA124B():
+
+    SA_IDLE = -1
+    SA_SWEEPING = 0
+    SA_REAL_TIME = 1
+    SA_IQ = 2
+    SA_AUDIO = 3
+    SA_TG_SWEEP = 4
+    SA_MIN_MAX = 0
+    SA_AVERAGE = 1
+    SA_LOG_SCALE = 0
+    SA_LIN_SCALE = 1
+    SA_IQ_SAMPLE_RATE = 486111.111
+    TG_THRU_0DB = 1
+    TG_THRU_20DB = 2
+
+    def __init__(self, tones=None, noise_floor=-100.0, latency=0.0, initiate_time=0.05,
+                 sweep_rate=10e9, min_sweep_time=0.01, iq_buffer_time=0.5, partial_step=20e6,
+                 resonators=None, tg_point_time=0.5e-3):
+        """
+        Signal Hound SA124B behind the sa_api function names. The spectrum is a noise floor with
+        tones shaped by the RBW filter.
+        :param tones: list of (frequency, dBm)
+        :param latency: seconds every api call takes (USB round trip)
+        :param initiate_time: extra seconds sa_initiate takes
+        :param sweep_rate: Hz swept per second, a sweep takes max(span / sweep_rate, min_sweep_time)
+        :param iq_buffer_time: seconds of IQ data the device holds before samples are lost
+        :param partial_step: Hz of sweep a partial sweep read waits for at least
+        :param resonators: notches of the DUT seen by the tracking generator, list of (f0, Q, depth dB)
+        :param tg_point_time: seconds per TG sweep point
+        """
+        self.tones = [(4e9, -30.0)] if tones is None else list(tones)
+        self.noise_floor = noise_floor
+        self.latency = latency
+        self.initiate_time = initiate_time
+        self.sweep_rate = sweep_rate
+        self.min_sweep_time = min_sweep_time
+        self.iq_buffer_time = iq_buffer_time
+        self.partial_step = partial_step
+        self.resonators = [(4.5e9, 1e4, 20.0)] if resonators is None else list(resonators)
+        self.tg_point_time = tg_point_time
+        self.tg_level = -10.0
+        self.tg_attached = False
+        self.tg_sweep_size = 1601
+        self.tg_dut = True            # False: the through is connected instead of the DUT
+        self.tg_freq = 0.0
+        self._tg_thru = None
+        self._tg_thru_key = None      # sweep points the through was stored on
+
+        self.center = 4e9
+        self.span = 1e6
+        self.ref_level = 0.0
+        self.rbw = 250e3
+        self.vbw = 250e3
+        self.decimation = 1
+        self.iq_bandwidth = 250e3
+        self.mode = self.SA_IDLE
+        self.calls = {}
+        self._sweep = None            # geometry of the initiated sweep
+        self._t_initiate = 0.0
+        self._num_read = 0
+        self._iq_read = 0             # samples handed out since sa_initiate
+        self._partial = 0             # bins of the sweep in progress handed out
+        self._partial_trace = None
+
+    def _call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        time.sleep(self.latency)
+
+    # ----- configuration
+
+    def sa_open_device(self):
+        self._call('sa_open_device')
+        return {'status': 0, 'handle': 0}
+
+    def sa_close_device(self, device):
+        self._call('sa_close_device')
+        return {'status': 0}
+
+    def sa_config_center_span(self, device, center, span):
+        self._call('sa_config_center_span')
+        self.center, self.span = float(center), float(span)
+        return {'status': 0}
+
+    def sa_config_level(self, device, ref):
+        self._call('sa_config_level')
+        self.ref_level = float(ref)
+        return {'status': 0}
+
+    def sa_config_sweep_coupling(self, device, rbw, vbw, reject):
+        self._call('sa_config_sweep_coupling')
+        self.rbw, self.vbw = float(rbw), float(vbw)
+        return {'status': 0}
+
+    def sa_config_acquisition(self, device, detector, scale):
+        self._call('sa_config_acquisition')
+        return {'status': 0}
+
+    def sa_config_IQ(self, device, decimation, bandwidth):
+        self._call('sa_config_IQ')
+        self.decimation = int(decimation)
+        self.iq_bandwidth = float(bandwidth)
+        return {'status': 0}
+
+    def sa_initiate(self, device, mode, flag):
+        self._call('sa_initiate')
+        time.sleep(self.initiate_time)
+        self.mode = mode
+        if mode == self.SA_TG_SWEEP:
+            self._sweep = {
+                'sweep_length': self.tg_sweep_size,
+                'start_freq': self.center - self.span / 2,
+                'bin_size': self.span / (self.tg_sweep_size - 1),
+                'sweep_time': self.tg_sweep_size * self.tg_point_time
+            }
+            # the stored through survives a re-initiate on the same sweep points
+            if self._tg_thru_key != self._get_tg_key():
+                self._tg_thru = None
+        else:
+            bin_size = self.rbw / 3
+            sweep_length = int(round(self.span / bin_size)) + 1
+            self._sweep = {
+                'sweep_length': sweep_length,
+                'start_freq': self.center - self.span / 2,
+                'bin_size': bin_size,
+                'sweep_time': max(self.span / self.sweep_rate, self.min_sweep_time)
+            }
+        self._t_initiate = time.perf_counter()
+        self._num_read = 0
+        self._iq_read = 0
+        self._partial = 0
+        return {'status': 0}
+
+    def sa_abort(self, device):
+        self._call('sa_abort')
+        self.mode = self.SA_IDLE
+        return {'status': 0}
+
+    def sa_query_sweep_info(self, device):
+        self._call('sa_query_sweep_info')
+        return {'status': 0, 'sweep_length': self._sweep['sweep_length'],
+                'start_freq': self._sweep['start_freq'], 'bin_size': self._sweep['bin_size']}
+
+    def sa_query_stream_info(self, device):
+        self._call('sa_query_stream_info')
+        return {'status': 0, 'return_len': 4096,
+                'bandwidth': min(self.iq_bandwidth, self.SA_IQ_SAMPLE_RATE / self.decimation),
+                'samples_per_second': self.SA_IQ_SAMPLE_RATE / self.decimation}
+
+    # ----- sweeps
+
+    def get_freqs(self) -> np.ndarray:
+        return self._sweep['start_freq'] + self._sweep['bin_size'] * np.arange(self._sweep['sweep_length'])
+
+    def get_trace(self) -> np.ndarray:
+        if self.mode == self.SA_TG_SWEEP:
+            return self.get_tg_trace()
+        freqs = self.get_freqs()
+        sigma = self.rbw / 2.355
+        power = 10 ** ((self.noise_floor + np.random.randn(len(freqs))) / 10)
+        for freq, dbm in self.tones:
+            power += 10 ** (dbm / 10) * np.exp(-0.5 * ((freqs - freq) / sigma) ** 2)
+        return 10 * np.log10(power)
+
+    def _wait_sweep(self):
+        # sweeps run back to back from sa_initiate on, every get returns the next one
+        self._num_read += 1
+        ready = self._t_initiate + self._num_read * self._sweep['sweep_time']
+        delay = ready - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # reader fell behind, the next sweep starts now
+            self._t_initiate -= delay
+
+    def sa_get_sweep_64f(self, device):
+        length = self.sa_query_sweep_info(device)['sweep_length']
+        sweep_min = np.zeros(length)
+        sweep_max = np.zeros(length)
+        self.sa_get_sweep_64f_into(device, sweep_min, sweep_max)
+        return {'status': 0, 'min': sweep_min, 'max': sweep_max}
+
+    def sa_get_sweep_32f_into(self, device, sweep_min, sweep_max):
+        return self.sa_get_sweep_64f_into(device, sweep_min, sweep_max)
+
+    def sa_get_sweep_64f_into(self, device, sweep_min, sweep_max):
+        self._call('sa_get_sweep')
+        self._wait_sweep()
+        trace = self.get_trace()
+        sweep_min[:] = trace
+        sweep_max[:] = trace
+        return {'status': 0}
+
+    def sa_get_partial_sweep_32f_into(self, device, sweep_min, sweep_max):
+        return self.sa_get_partial_sweep_64f_into(device, sweep_min, sweep_max)
+
+    def sa_get_partial_sweep_64f_into(self, device, sweep_min, sweep_max):
+        # the sweep in progress fills linearly in time, a read returns at least partial_step of new bins
+        self._call('sa_get_partial_sweep')
+        length = self._sweep['sweep_length']
+        sweep_time = self._sweep['sweep_time']
+        if self._partial == 0:
+            self._partial_trace = self.get_trace()
+            behind = time.perf_counter() - (self._t_initiate + (self._num_read + 1) * sweep_time)
+            if behind > 0:
+                # reader fell behind, the last complete sweep is returned at once
+                self._t_initiate += behind
+        sweep_start = self._t_initiate + self._num_read * sweep_time
+        step = int(np.ceil(self.partial_step / self._sweep['bin_size']))
+        target = min(self._partial + step, length)
+        ready = sweep_start + sweep_time * target / length
+        delay = ready - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        done = int((time.perf_counter() - sweep_start) / sweep_time * length)
+        start, stop = self._partial, min(max(done, target), length)
+        sweep_min[start:stop] = self._partial_trace[start:stop]
+        sweep_max[start:stop] = self._partial_trace[start:stop]
+        self._partial = stop
+        if stop == length:
+            self._partial = 0
+            self._num_read += 1
+        return {'status': 0, 'start': start, 'stop': stop}
+
+    # ----- IQ streaming
+
+    def get_iq(self, start, count) -> np.ndarray:
+        """ samples start ... start + count since sa_initiate, amplitudes in sqrt(mW) """
+        rate = self.SA_IQ_SAMPLE_RATE / self.decimation
+        t = (start + np.arange(count)) / rate
+        noise = np.sqrt(10 ** (self.noise_floor / 10) / 2)
+        iq = noise * (np.random.randn(count) + 1j * np.random.randn(count))
+        for freq, dbm in self.tones:
+            offset = freq - self.center
+            if abs(offset) <= min(self.iq_bandwidth, rate) / 2:
+                iq += np.sqrt(10 ** (dbm / 10)) * np.exp(2j * np.pi * offset * t)
+        return iq
+
+    def sa_get_IQ_data_unpacked_into(self, device, iq_data, iq_count, purge):
+        self._call('sa_get_IQ_data')
+        rate = self.SA_IQ_SAMPLE_RATE / self.decimation
+        available = int((time.perf_counter() - self._t_initiate) * rate) - self._iq_read
+        sample_loss = 0
+        if purge:
+            self._iq_read += available
+            available = 0
+        elif available > self.iq_buffer_time * rate:
+            # the device buffer overflowed, the oldest samples are gone
+            self._iq_read += available - int(self.iq_buffer_time * rate)
+            available = int(self.iq_buffer_time * rate)
+            sample_loss = 1
+        if available < iq_count:
+            time.sleep((iq_count - available) / rate)
+            available = iq_count
+        # timestamp of the first sample
+        t = self._t_initiate + self._iq_read / rate
+        iq_data[:iq_count] = self.get_iq(self._iq_read, iq_count)
+        self._iq_read += iq_count
+        return {'status': 0, 'data_remaining': available - iq_count, 'sample_loss': sample_loss,
+                'sec': int(t), 'milli': int(t * 1000) % 1000}
+
+    def sa_get_IQ_data_unpacked(self, device, iq_count, purge):
+        iq_data = np.zeros(iq_count, dtype=np.complex64)
+        result = self.sa_get_IQ_data_unpacked_into(device, iq_data, iq_count, purge)
+        result['iq_data'] = iq_data
+        return result
+
+    # ----- tracking generator
+
+    def sa_attach_tg(self, device):
+        self._call('sa_attach_tg')
+        self.tg_attached = True
+        return {'status': 0}
+
+    def sa_is_tg_attached(self, device):
+        self._call('sa_is_tg_attached')
+        return {'status': 0, 'attached': int(self.tg_attached)}
+
+    def sa_config_tg_sweep(self, device, sweep_size, high_dynamic_range, passive_device):
+        self._call('sa_config_tg_sweep')
+        self.tg_sweep_size = int(sweep_size)
+        return {'status': 0}
+
+    def sa_store_tg_thru(self, device, flag):
+        self._call('sa_store_tg_thru')
+        if flag == self.TG_THRU_0DB:
+            self._tg_thru = self.get_path_loss(self.get_freqs())
+            self._tg_thru_key = self._get_tg_key()
+        return {'status': 0}
+
+    def sa_set_tg(self, device, frequency, amplitude):
+        self._call('sa_set_tg')
+        self.tg_freq, self.tg_level = float(frequency), float(amplitude)
+        return {'status': 0}
+
+    def sa_get_tg_freq_ampl(self, device):
+        self._call('sa_get_tg_freq_ampl')
+        return {'status': 0, 'frequency': self.tg_freq, 'amplitude': self.tg_level}
+
+    def _get_tg_key(self):
+        return self.center, self.span, self.tg_sweep_size
+
+    def get_path_loss(self, freqs) -> np.ndarray:
+        """ cables and attenuators between TG and analyzer in dB, 3 dB + 2 dB / GHz """
+        return -3.0 - 2.0 * freqs / 1e9
+
+    def get_s21(self, freqs) -> np.ndarray:
+        """ DUT transmission in dB, Lorentzian notches """
+        s21 = np.ones(len(freqs), dtype=complex)
+        for f0, q, depth in self.resonators:
+            s21 *= 1 - (1 - 10 ** (-depth / 20)) / (1 + 2j * q * (freqs / f0 - 1))
+        return 20 * np.log10(np.abs(s21))
+
+    def get_tg_trace(self) -> np.ndarray:
+        freqs = self.get_freqs()
+        trace = self.tg_level + self.get_path_loss(freqs) + 0.05 * np.random.randn(len(freqs))
+        if self.tg_dut:
+            trace += self.get_s21(freqs)
+        if self._tg_thru is not None:
+            trace -= self.tg_level + self._tg_thru
+        return trace
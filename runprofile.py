@@ -0,0 +1,235 @@
+"""
+Run-time profile store and estimator.
+
+While an experiment runs, a RunTimer records how long every operation took:
+setting a control ('set:Vch'), ramps ('ramp:Vch'), settle waits, each
+readout ('read:Vx'), vna sweeps together with their points / averages / IF
+bandwidth, database writes and the remaining loop overhead. RunProfile keeps
+the last samples of every operation in a json file next to the notebook and
+predicts the duration of a plan from them, with an uncertainty. Operations
+that were never measured fall back to typical values (with a 50 % error).
+
+    profile = RunProfile('run_profile.json')
+    terms = [profile.term('read:Vx', 200), profile.vna_term(200, points=1601, averages=1, ifbw=1e3)]
+    seconds, sigma = combine(terms)
+"""
+
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+# typical seconds per operation (looked up by full name, then by the part before ':'),
+# used until the operation has been measured
+DEFAULT_TIMES = {
+    'set': 0.02,
+    'ramp': 0.7,
+    'read': 0.02,
+    'settle point': 0.3,
+    'settle ramp': 5.0,
+    'vna reset': 0.2,
+    'vna output': 0.01,
+    'db write': 2e-5,
+    'overhead': 0.01
+}
+
+# E5071 default IF bandwidth, used when the vna controls do not set one
+DEFAULT_IFBW = 70e3
+
+
+def default_time(op) -> float:
+    if op in DEFAULT_TIMES:
+        return DEFAULT_TIMES[op]
+    return DEFAULT_TIMES.get(op.split(':')[0], 0.0)
+
+
+def vna_prior(points, averages=1, ifbw=None) -> float:
+    # sweep time ~ points / IFBW plus a trigger overhead, once per average
+    ifbw = DEFAULT_IFBW if not ifbw else ifbw
+    return averages * (0.01 + 1.1 * points / ifbw)
+
+
+def combine(terms) -> tuple:
+    """
+    Adds up (count, mean, std, num_samples) terms.
+    The scatter of single operations averages out over count repetitions, the error of the
+    mean (std / sqrt(num_samples)) does not; unmeasured terms are fully systematic.
+    :return: total seconds, 1 sigma in seconds
+    """
+    total = 0.0
+    var = 0.0
+    for count, mean, std, num in terms:
+        total += count * mean
+        if num > 0:
+            var += count * std**2 + (count * std / np.sqrt(num))**2
+        else:
+            var += (count * std)**2
+    return total, np.sqrt(var)
+
+
+def format_duration(seconds) -> str:
+    if seconds > 3600:
+        return f'{round(seconds / 3600, 1)} hours'
+    elif seconds > 60:
+        return f'{round(seconds / 60, 1)} mins'
+    return f'{round(seconds)} sec'
+
+
+class RunTimer():
+
+    def __init__(self):
+        """ collects the operation timings of one run """
+        self.samples = {}
+        self.vna_sweeps = []
+        self.io_time = 0.0
+        self.t_start = time.perf_counter()
+
+    def add(self, op, seconds) -> None:
+        self.samples.setdefault(op, []).append(seconds)
+
+    @contextmanager
+    def time(self, op):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.add(op, dt)
+            if op.split(':')[0] in ['set', 'read']:
+                self.io_time += dt
+
+    def add_io(self, io) -> None:
+        """
+        Takes the per-operation times of an instrument_io.BusExecutor (labelled operations)
+        """
+        for op, values in io.op_times.items():
+            self.samples.setdefault(op, []).extend(values)
+        self.io_time += io.wall_time
+
+    def add_vna_sweep(self, seconds, points, averages=1, ifbw=None) -> None:
+        self.vna_sweeps.append([int(points), int(averages), ifbw, seconds])
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t_start
+
+    def finish(self, num_points) -> None:
+        """
+        Stores the time not covered by any recorded operation as 'overhead' per loop point.
+        set: / read: operations can overlap (executor threads), their wall time is io_time
+        """
+        covered = self.io_time + sum(entry[3] for entry in self.vna_sweeps)
+        for op, values in self.samples.items():
+            if op.split(':')[0] not in ['set', 'read']:
+                covered += sum(values)
+        self.add('overhead', max(self.elapsed() - covered, 0.0) / max(num_points, 1))
+
+
+class RunProfile():
+
+    def __init__(self, filepath='run_profile.json', max_samples=500):
+        """
+        :param filepath: json file holding the samples, created on the first save
+        :param max_samples: samples kept per operation (the most recent ones)
+        """
+        self.filepath = filepath
+        self.max_samples = max_samples
+        self.samples = {}
+        self.vna_sweeps = []
+        self.runs = []
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.filepath):
+            return
+        with open(self.filepath) as f:
+            data = json.load(f)
+        self.samples = data.get('samples', {})
+        self.vna_sweeps = data.get('vna sweeps', [])
+        self.runs = data.get('runs', [])
+
+    def save(self) -> None:
+        data = {'samples': self.samples, 'vna sweeps': self.vna_sweeps, 'runs': self.runs}
+        tmp = self.filepath + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.filepath)
+
+    def record(self, op, values) -> None:
+        samples = self.samples.setdefault(op, [])
+        samples.extend(float(v) for v in values)
+        del samples[:-self.max_samples]
+
+    def record_timer(self, timer: RunTimer) -> None:
+        for op, values in timer.samples.items():
+            self.record(op, values)
+        self.vna_sweeps.extend(timer.vna_sweeps)
+        del self.vna_sweeps[:-self.max_samples]
+
+    def record_run(self, name, exp_type, predicted, sigma, actual) -> None:
+        self.runs.append({
+            'name': name,
+            'type': exp_type,
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'predicted': predicted,
+            'sigma': sigma,
+            'actual': actual
+        })
+
+    def stats(self, op, default=None) -> tuple:
+        """
+        :return: mean, std, number of samples (default value with a 50 % error if never measured)
+        """
+        values = self.samples.get(op, [])
+        if values:
+            return float(np.mean(values)), float(np.std(values, ddof=1)) if len(values) > 1 else 0.0, len(values)
+        mean = default_time(op) if default is None else default
+        return mean, 0.5 * mean, 0
+
+    def term(self, op, count, default=None) -> tuple:
+        mean, std, num = self.stats(op, default)
+        return count, mean, std, num
+
+    def batch_term(self, ops, count, concurrent=True) -> tuple:
+        """
+        One batch of operations per loop point as run by instrument_io.BusExecutor: operations
+        on one bus add up, buses run in parallel so the slowest bus sets the time
+        :param ops: list of (op name, bus name)
+        """
+        buses = {}
+        for op, bus in ops:
+            buses.setdefault(bus if concurrent else 'all', []).append(self.stats(op))
+        if not buses:
+            return count, 0.0, 0.0, 0
+        slowest = max(buses.values(), key=lambda stats: sum(s[0] for s in stats))
+        mean = sum(s[0] for s in slowest)
+        std = np.sqrt(sum(s[1]**2 for s in slowest))
+        return count, mean, std, min(s[2] for s in slowest)
+
+    def predict_vna_sweep(self, points, averages=1, ifbw=None) -> tuple:
+        """
+        Time of one (averaged) sweep. With enough varied samples t = c0 + c1 * averages + c2 * averages * points / ifbw
+        is fitted, with a few samples the prior is rescaled by the measured / prior ratio.
+        :return: mean, std, number of samples
+        """
+        prior = vna_prior(points, averages, ifbw)
+        if not self.vna_sweeps:
+            return prior, 0.5 * prior, 0
+
+        data = np.array([[p, a, DEFAULT_IFBW if not bw else bw, t] for p, a, bw, t in self.vna_sweeps], dtype=float)
+        p, a, bw, t = data.T
+        basis = np.column_stack((np.ones_like(t), a, a * p / bw))
+        if len(t) > 6 and np.linalg.matrix_rank(basis) == 3:
+            coef, _, _, _ = np.linalg.lstsq(basis, t, rcond=None)
+            std = np.std(basis @ coef - t, ddof=3)
+            x = np.array([1.0, averages, averages * points / (DEFAULT_IFBW if not ifbw else ifbw)])
+            return max(float(x @ coef), 0.0), float(std), len(t)
+
+        ratio = t / np.array([vna_prior(*row) for row in data[:, :3]])
+        std = np.std(ratio, ddof=1) if len(t) > 1 else 0.2
+        return prior * float(np.mean(ratio)), prior * float(std), len(t)
+
+    def vna_term(self, count, points, averages=1, ifbw=None) -> tuple:
+        mean, std, num = self.predict_vna_sweep(points, averages, ifbw)
+        return count, mean, std, num
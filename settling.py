@@ -0,0 +1,132 @@
+"""
+Adaptive settling detection for sweep loops.
+
+Instead of always sleeping the worst case (3 * tconst after setting a point,
+5 s after a ramp) a Settler polls a readout, e.g. the lock-in Vx, and returns
+as soon as the signal has settled:
+
+    method='consecutive'   the last num_consecutive samples agree within tolerance
+    method='expfit'        y(t) = y_inf + A exp(-t / tau) fitted to the samples, settled
+                           once the fit residual is below tolerance and the predicted
+                           remaining step |A exp(-t / tau)| is below tolerance
+
+max_wait is a hard cap, the point is taken after max_wait whatever the signal does.
+Every decision is kept in Settler.log so the settle times can be audited.
+"""
+
+import csv
+import time
+import numpy as np
+
+
+class Settler():
+
+    def __init__(self, read, max_wait, poll_interval=0.05, min_wait=0.0, abs_tol=0.0, rel_tol=0.01,
+                 num_consecutive=3, method='consecutive', fit_residual=None):
+        """
+        :param read: callable returning the polled value
+        :param max_wait: safety cap in seconds
+        :param poll_interval: seconds between samples
+        :param min_wait: never settle earlier than this
+        :param abs_tol: absolute tolerance, the tolerance used is max(abs_tol, rel_tol * |value|)
+        :param rel_tol: relative tolerance
+        :param num_consecutive: samples that must agree ('consecutive') / minimum samples for a fit ('expfit')
+        :param method: 'consecutive' or 'expfit'
+        :param fit_residual: rms residual threshold of the fit, defaults to the tolerance
+        """
+        if method not in ['consecutive', 'expfit']:
+            raise ValueError("method must be 'consecutive' or 'expfit'")
+        self.read = read
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.min_wait = min_wait
+        self.abs_tol = abs_tol
+        self.rel_tol = rel_tol
+        self.num_consecutive = max(int(num_consecutive), 2)
+        self.method = method
+        self.fit_residual = fit_residual
+        self.log = []
+
+    def tolerance(self, value) -> float:
+        return max(self.abs_tol, self.rel_tol * abs(value))
+
+    def is_settled(self, times, values) -> bool:
+        n = self.num_consecutive
+        if len(values) < n:
+            return False
+        if self.method == 'consecutive':
+            last = values[-n:]
+            return max(last) - min(last) <= self.tolerance(np.mean(last))
+
+        y_inf, amp, tau, rms = fit_exponential(np.asarray(times), np.asarray(values))
+        tol = self.tolerance(y_inf)
+        residual = tol if self.fit_residual is None else self.fit_residual
+        return rms <= residual and abs(amp) * np.exp(-times[-1] / tau) <= tol
+
+    def wait(self, label=None, max_wait=None) -> float:
+        """
+        Polls until settled or until the cap is reached
+        :param label: stored with the log entry, e.g. (step index, sweep index)
+        :param max_wait: overrides the cap for this call
+        :return: settle time in seconds
+        """
+        cap = self.max_wait if max_wait is None else max_wait
+        t0 = time.perf_counter()
+        times, values = [], []
+        reason = 'max wait'
+        while True:
+            t = time.perf_counter() - t0
+            times.append(t)
+            values.append(float(self.read()))
+            if t >= self.min_wait and self.is_settled(times, values):
+                reason = self.method
+                break
+            remaining = cap - (time.perf_counter() - t0)
+            if remaining <= 0:
+                break
+            time.sleep(min(self.poll_interval, remaining))
+
+        settle_time = time.perf_counter() - t0
+        self.log.append({
+            'label': label,
+            'settle time': settle_time,
+            'max wait': cap,
+            'samples': len(values),
+            'reason': reason,
+            'value': values[-1]
+        })
+        return settle_time
+
+    def summary(self) -> str:
+        if not self.log:
+            return 'settling: no points'
+        settle = np.array([entry['settle time'] for entry in self.log])
+        cap = np.array([entry['max wait'] for entry in self.log])
+        capped = sum(entry['reason'] == 'max wait' for entry in self.log)
+        return (f'settling: {len(settle)} points, mean {settle.mean():.3f} s (max wait {cap.mean():.3f} s), '
+                f'{capped} hit the cap, saved {cap.sum() - settle.sum():.1f} s')
+
+    def save_log(self, filepath) -> None:
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['label', 'settle time', 'max wait', 'samples', 'reason', 'value'])
+            for entry in self.log:
+                writer.writerow([entry['label'], f"{entry['settle time']:.4f}", f"{entry['max wait']:.4f}",
+                                 entry['samples'], entry['reason'], entry['value']])
+
+
+def fit_exponential(t, y, num_tau=40):
+    """
+    Least squares fit of y = y_inf + A exp(-t / tau). For each tau on a log grid the problem
+    is linear in (y_inf, A), the tau with the smallest residual is kept.
+    :return: y_inf, A, tau, rms residual
+    """
+    span = max(t[-1] - t[0], 1e-6)
+    best = (y[-1], 0.0, span, np.inf)
+    for tau in np.logspace(np.log10(span / 50), np.log10(span * 10), num_tau):
+        basis = np.column_stack((np.ones_like(t), np.exp(-t / tau)))
+        coef, _, _, _ = np.linalg.lstsq(basis, y, rcond=None)
+        rms = np.sqrt(np.mean((basis @ coef - y) ** 2))
+        if rms < best[3]:
+            best = (coef[0], coef[1], tau, rms)
+    return best
@@ -0,0 +1,240 @@
+"""
+Buffered SQLite writer for experiment sweep loops.
+
+Rows handed to SQLBufferedWriter.write are queued and committed by a
+background thread in executemany transactions, either every `flush_rows`
+rows or every `flush_time` seconds, whichever comes first. The acquisition
+loop never waits on the disk; it only waits in flush() / close().
+
+The table itself is still created by helpers.database2.Create_DB, the
+writer only opens its own connection to the same file and appends rows.
+"""
+
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class SQLBufferedWriter():
+
+    def __init__(self, filepath: str, table='table_data', flush_rows=1000, flush_time=2.0, wal=True):
+        """
+        :param filepath: path of the sqlite database file (table must already exist)
+        :param table: table the rows are appended to
+        :param flush_rows: number of queued rows that triggers a transaction
+        :param flush_time: max time in seconds a row stays queued before it is committed
+        :param wal: put the database in WAL journal mode
+        """
+        self.filepath = filepath
+        self.table = table
+        self.flush_rows = int(flush_rows)
+        self.flush_time = flush_time
+        self.wal = wal
+
+        self.rows_written = 0
+        self.write_time = 0.0
+        self.num_transactions = 0
+
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = None
+        self._t_start = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        if self._thread is None:
+            self._t_start = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name='SQLBufferedWriter', daemon=True)
+            self._thread.start()
+        return self
+
+    def write(self, row, table=None) -> None:
+        """ queue a single row, returns immediately """
+        self._check_error()
+        self._queue.put((table or self.table, tuple(row)))
+
+    def write_many(self, rows, table=None) -> None:
+        """ queue an iterable of rows (e.g. one full VNA trace), returns immediately """
+        self._check_error()
+        table = table or self.table
+        self._queue.put([(table, tuple(row)) for row in rows])
+
+    def execute(self, statement: str) -> None:
+        """ queue a statement (e.g. CREATE TABLE), executed in order with the rows """
+        self._check_error()
+        self._queue.put(statement)
+
+    def flush(self, timeout=None) -> None:
+        """ blocks until every row queued so far is committed """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+        self._check_error()
+
+    def close(self) -> None:
+        """ commits the remaining rows and stops the writer thread """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check_error()
+
+    def get_rows_per_sec(self) -> float:
+        """ rows committed per second of time spent inside sqlite """
+        if self.write_time == 0:
+            return 0.0
+        return self.rows_written / self.write_time
+
+    def get_stats(self) -> dict:
+        elapsed = 0.0 if self._t_start is None else time.perf_counter() - self._t_start
+        return {
+            'rows': self.rows_written,
+            'transactions': self.num_transactions,
+            'write time': self.write_time,
+            'elapsed': elapsed,
+            'rows/s': self.get_rows_per_sec()
+        }
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _connect(self):
+        conn = sqlite3.connect(self.filepath, timeout=30)
+        if self.wal:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _commit(self, conn, items):
+        if not items:
+            return
+        t0 = time.perf_counter()
+        num_rows = 0
+        # group consecutive rows of the same table and length, one statement per group
+        with conn:
+            start = 0
+            for i in range(1, len(items) + 1):
+                first = items[start]
+                if isinstance(first, str):
+                    conn.execute(first)
+                    start = i
+                elif (i == len(items) or isinstance(items[i], str) or items[i][0] != first[0]
+                        or len(items[i][1]) != len(first[1])):
+                    placeholders = ','.join(['?'] * len(first[1]))
+                    conn.executemany('INSERT INTO %s VALUES (%s)' % (first[0], placeholders),
+                                     [row for _, row in items[start:i]])
+                    num_rows += i - start
+                    start = i
+        self.write_time += time.perf_counter() - t0
+        self.rows_written += num_rows
+        self.num_transactions += 1
+
+    def _run(self):
+        conn = None
+        pending = []
+        waiting = []
+        stop = False
+        try:
+            conn = self._connect()
+            deadline = None
+            while not stop:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = False
+
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiting.append(item)
+                elif isinstance(item, list):
+                    pending.extend(item)
+                elif item is not False:
+                    # (table, row) or a statement
+                    pending.append(item)
+
+                if pending and deadline is None:
+                    deadline = time.monotonic() + self.flush_time
+
+                if stop or waiting or len(pending) >= self.flush_rows or item is False:
+                    self._commit(conn, pending)
+                    pending = []
+                    deadline = None
+                    for event in waiting:
+                        event.set()
+                    waiting = []
+        except Exception as err:
+            self._error = err
+            print('SQLBufferedWriter stopped: {}. {} queued rows were not written.'.format(err, len(pending)))
+        finally:
+            for event in waiting:
+                event.set()
+            if conn is not None:
+                conn.close()
+            if self._error is not None:
+                # keep draining so that flush() / close() callers never hang
+                while not stop:
+                    item = self._queue.get()
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        item.set()
+
+
+def benchmark_rows_per_sec(num_rows=6000, num_cols=5, flush_rows=1000):
+    """
+    Compares the per-row path (one INSERT + commit per row, as sql_sweep_write does)
+    with the buffered writer on a temporary database. Returns rows/s for both.
+    """
+    rows = [tuple(float(i * num_cols + k) for k in range(num_cols)) for i in range(num_rows)]
+    columns = ','.join(['c%d REAL' % k for k in range(num_cols)])
+    placeholders = ','.join(['?'] * num_cols)
+    result = {}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'per_row.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE table_data (%s)' % columns)
+        conn.commit()
+        t0 = time.perf_counter()
+        for row in rows:
+            conn.execute('INSERT INTO table_data VALUES (%s)' % placeholders, row)
+            conn.commit()
+        result['per-row rows/s'] = num_rows / (time.perf_counter() - t0)
+        conn.close()
+
+        path = os.path.join(tmpdir, 'buffered.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE table_data (%s)' % columns)
+        conn.commit()
+        conn.close()
+        writer = SQLBufferedWriter(path, flush_rows=flush_rows).start()
+        t0 = time.perf_counter()
+        for row in rows:
+            writer.write(row)
+        result['enqueue rows/s'] = num_rows / (time.perf_counter() - t0)
+        writer.close()
+        result['buffered rows/s'] = num_rows / (time.perf_counter() - t0)
+
+    result['speedup'] = result['buffered rows/s'] / result['per-row rows/s']
+    return result
+
+
+if __name__ == '__main__':
+    for n in [201, 1601, 6000]:
+        res = benchmark_rows_per_sec(num_rows=n)
+        print(f"{n} rows: per-row {res['per-row rows/s']:,.0f} rows/s / "
+              f"buffered {res['buffered rows/s']:,.0f} rows/s / x{res['speedup']:.1f}")
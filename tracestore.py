@@ -0,0 +1,113 @@
+"""
+Trace-as-blob storage for VNA sweeps.
+
+Instead of one table_data row per frequency point, every VNA acquisition is
+one row of the vna_traces table:
+
+    idx_sweep, idx_step, axis_id, dtype, npts, <scalar readouts>, <trace blobs>
+
+The traces (vna_y1, vna_y2, ...) are stored as contiguous float32 / float64
+blobs and the frequency axis is stored once per run in vna_axes (a new
+axis row is only added if the axis changes). Rows go through the same
+SQLBufferedWriter as the rest of the data.
+
+read_traces returns the traces as numpy views on the blobs, no parsing.
+"""
+
+import re
+import sqlite3
+import numpy as np
+
+
+def column_name(key: str) -> str:
+    # readout keys become column names
+    return re.sub(r'\W', '_', key)
+
+
+class TraceBlobWriter():
+
+    def __init__(self, writer, scalar_keys, trace_keys, dtype='float64'):
+        """
+        :param writer: started sqlwriter.SQLBufferedWriter of the run
+        :param scalar_keys: names of the scalar readouts stored with each trace, e.g. ['Vx', 'Vy']
+        :param trace_keys: names of the array readouts, e.g. ['vna_y1', 'vna_y2']
+        :param dtype: 'float64' or 'float32'
+        """
+        self.writer = writer
+        self.scalar_keys = list(scalar_keys)
+        self.trace_keys = list(trace_keys)
+        self.dtype = np.dtype(dtype)
+        self.num_traces = 0
+        self._axis = None
+        self._axis_id = -1
+
+        scalars = ''.join(', %s REAL' % column_name(k) for k in self.scalar_keys)
+        traces = ''.join(', %s BLOB' % column_name(k) for k in self.trace_keys)
+        writer.execute('CREATE TABLE IF NOT EXISTS vna_axes '
+                       '(axis_id INTEGER PRIMARY KEY, dtype TEXT, npts INTEGER, freq BLOB)')
+        writer.execute('CREATE TABLE IF NOT EXISTS vna_traces '
+                       '(idx_sweep INTEGER, idx_step INTEGER, axis_id INTEGER, dtype TEXT, npts INTEGER'
+                       + scalars + traces + ')')
+
+    def write(self, idx_sweep, idx_step, freq, traces, scalars=()) -> None:
+        """
+        Queues one acquisition
+        :param freq: frequency axis, only stored when it differs from the previous one
+        :param traces: arrays in the order of trace_keys (None for a missing trace)
+        :param scalars: values in the order of scalar_keys
+        """
+        freq = np.ascontiguousarray(freq, dtype=np.float64)
+        if self._axis is None or len(freq) != len(self._axis) or not np.array_equal(freq, self._axis):
+            self._axis = freq.copy()
+            self._axis_id += 1
+            self.writer.write((self._axis_id, 'float64', len(freq), freq.tobytes()), table='vna_axes')
+
+        blobs = [None if y is None else np.ascontiguousarray(y, dtype=self.dtype).tobytes() for y in traces]
+        row = [int(idx_sweep), int(idx_step), self._axis_id, self.dtype.str, len(freq)]
+        row += [float(v) for v in scalars] + blobs
+        self.writer.write(row, table='vna_traces')
+        self.num_traces += 1
+
+
+def read_traces(filepath, stack=False) -> dict:
+    """
+    Reads the vna_traces / vna_axes tables of a database
+    :param stack: False returns per-trace np.frombuffer views (no copy), True stacks them into
+                  2D arrays (one copy) when all traces have the same length, the frequency axis
+                  stays 1D if it never changed
+    :return: dict with 'idx_sweep', 'idx_step', 'axis_id', the scalar columns as arrays,
+             'axes' {axis_id: freq view}, 'freq' (list of axis views per trace) and one
+             list / 2D array per trace column
+    """
+    conn = sqlite3.connect(filepath)
+    try:
+        axes = {}
+        for axis_id, dtype, npts, blob in conn.execute('SELECT axis_id, dtype, npts, freq FROM vna_axes'):
+            axes[axis_id] = np.frombuffer(blob, dtype=dtype, count=npts)
+
+        cursor = conn.execute('SELECT * FROM vna_traces ORDER BY rowid')
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    data = {'axes': axes}
+    fixed = ['idx_sweep', 'idx_step', 'axis_id', 'dtype', 'npts']
+    for k, name in enumerate(columns):
+        values = [row[k] for row in rows]
+        if name in ['dtype', 'npts']:
+            continue
+        if name in fixed or not any(isinstance(v, bytes) for v in values):
+            data[name] = np.array(values)
+        else:
+            data[name] = [None if blob is None else np.frombuffer(blob, dtype=row[3], count=row[4])
+                          for blob, row in zip(values, rows)]
+    data['freq'] = [axes[a] for a in data.get('axis_id', [])]
+
+    if stack and rows and len(set(row[4] for row in rows)) == 1:
+        for name in columns:
+            if isinstance(data.get(name), list) and all(v is not None for v in data[name]):
+                data[name] = np.vstack(data[name])
+        # a single axis for the whole run stays a 1D view
+        data['freq'] = data['freq'][0] if len(axes) == 1 else np.vstack(data['freq'])
+    return data